@@ -1,11 +1,61 @@
 """Autonomous Control - Takes control of system/applications when requested"""
+import os
 import json
 import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 DATA_DIR = Path(__file__).parent / "data"
 CONTROL_LOG = DATA_DIR / "control_sessions.json"
 ACTIVE_SESSION = DATA_DIR / "active_session.json"
+TRIGGERS_FILE = DATA_DIR / "control_triggers.json"
+AUDIT_LOG = DATA_DIR / "control_audit.ndjson"
+
+# Never picked as the target of a "top_cpu"/"top_memory" action
+PROTECTED_PROCESSES = {"systemd", "init", "launchd", "kernel_task", "sshd", "explorer.exe", "winlogon.exe",
+                       "csrss.exe", "services.exe", "lsass.exe", "smss.exe", "wininit.exe", "dwm.exe"}
+# Interval over which per-process CPU usage is measured for "top_cpu"
+CPU_SAMPLE_SECONDS = 0.5
+
+DEFAULT_TRIGGERS = {
+    "dry_run": True,
+    "max_concurrent": 2,
+    "triggers": [
+        {
+            "id": "cpu_hog_renice",
+            "event": "metric",
+            "condition": "cpu_usage > 90",
+            "debounce": 60,
+            "cooldown": 300,
+            "pipeline": [{"action": "renice", "target": "top_cpu", "niceness": 10}]
+        },
+        {
+            "id": "cpu_anomaly_renice",
+            "event": "anomaly",
+            "match": {"fields": "cpu_percent"},
+            "cooldown": 600,
+            "pipeline": [{"action": "renice", "target": "top_cpu", "niceness": 5}]
+        },
+        {
+            "id": "memory_critical_stop",
+            "event": "alert",
+            "match": {"type": "memory", "level": "critical"},
+            "debounce": 90,
+            "cooldown": 900,
+            "enabled": False,
+            "pipeline": [{"action": "stop_process", "target": "top_memory"}]
+        },
+        {
+            "id": "disk_full_cleanup",
+            "event": "metric",
+            "condition": "disk_usage > 95",
+            "cooldown": 3600,
+            "pipeline": [{"action": "clean_temp_files", "older_than_days": 7}]
+        }
+    ]
+}
 
 def get_autonomous_control():
     """Get status of autonomous control system"""
@@ -27,6 +77,7 @@ def get_autonomous_control():
             "active_session": active_session,
             "capabilities": capabilities,
             "recent_sessions": history,
+            "trigger_engine": _control_engine.get_status() if _control_engine else {"running": False},
             "safety_features": _get_safety_features()
         }
     except Exception as e:
@@ -114,5 +165,317 @@ def _get_safety_features():
             "description": "Log all autonomous actions for review",
             "enabled": True,
             "log_level": "detailed"
+        },
+        "trigger_limits": {
+            "description": "Triggers are debounced, rate limited by cooldowns and run in a bounded pool",
+            "dry_run_default": DEFAULT_TRIGGERS["dry_run"],
+            "audit_log": str(AUDIT_LOG)
         }
-    }
\ No newline at end of file
+    }
+
+class Trigger:
+    """One configured trigger: which event it listens to and when it fires.
+
+    `condition` is a decision-engine condition evaluated against the event's
+    numeric values; `match` requires payload keys to equal (or, for list and
+    dict payload values, contain) the given values. The trigger fires once
+    its match has held for `debounce` seconds, at most every `cooldown`
+    seconds, and never while its previous pipeline is still running.
+    """
+
+    def __init__(self, spec):
+        from .decision_engine import compile_condition
+        self.id = spec["id"]
+        self.event = spec.get("event", "metric")
+        self.predicate = compile_condition(spec["condition"]) if spec.get("condition") else None
+        self.match = spec.get("match", {})
+        self.debounce = float(spec.get("debounce", 0))
+        self.cooldown = float(spec.get("cooldown", 300))
+        self.pipeline = spec.get("pipeline", [])
+        self.enabled = spec.get("enabled", True)
+        unknown = [step.get("action") for step in self.pipeline if step.get("action") not in ACTIONS]
+        if unknown:
+            raise ValueError(f"Unknown actions in trigger {self.id}: {unknown}")
+        self.since = None
+        self.last_match = None
+        self.last_fired = None
+        self.running = False
+        self.stats = {"matches": 0, "fired": 0, "cooldown_suppressed": 0, "throttled": 0, "failures": 0}
+
+    def matches(self, payload, snapshot):
+        for key, expected in self.match.items():
+            actual = payload.get(key)
+            if isinstance(actual, (list, dict, set)):
+                if expected not in actual:
+                    return False
+            elif actual != expected:
+                return False
+        return self.predicate is None or self.predicate.evaluate(snapshot)
+
+class TriggerEngine:
+    """Runs action pipelines in response to metric, alert and anomaly events"""
+
+    def __init__(self, config):
+        self.dry_run = config.get("dry_run", True)
+        self.triggers = []
+        self.errors = []
+        for spec in config.get("triggers", []):
+            try:
+                self.triggers.append(Trigger(spec))
+            except (KeyError, ValueError) as e:
+                self.errors.append({"trigger": spec.get("id"), "error": str(e)})
+        self.max_concurrent = max(1, int(config.get("max_concurrent", 2)))
+        self.slots = threading.BoundedSemaphore(self.max_concurrent)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.last_sample = None
+        self.running = False
+
+    def start(self):
+        if not self.running:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="control")
+            self.running = True
+
+    def stop(self):
+        self.running = False
+        if self.executor:
+            self.executor.shutdown(wait=False)
+
+    def handle_event(self, event_type, payload):
+        """Event listener: update trigger state and launch pipelines that are due"""
+        from .decision_engine import MetricSnapshot, load_metric_window
+        timestamp = payload.get("timestamp")
+        if timestamp is None:
+            timestamp = time.time()
+        values = {k: v for k, v in payload.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+        if event_type == "metric":
+            try:
+                import psutil
+                values["disk_usage"] = psutil.disk_usage("/").percent
+            except Exception:
+                pass
+        snapshot = MetricSnapshot(values, timestamp, load_metric_window)
+
+        due = []
+        with self.lock:
+            if event_type == "metric":
+                # Alert/anomaly triggers that saw nothing for the previous sample have cleared
+                for trigger in self.triggers:
+                    if trigger.event != "metric" and trigger.last_match is not None and \
+                            self.last_sample is not None and trigger.last_match < self.last_sample:
+                        trigger.since = None
+                self.last_sample = timestamp
+
+            for trigger in self.triggers:
+                if not trigger.enabled or trigger.event != event_type:
+                    continue
+                if not trigger.matches(payload, snapshot):
+                    trigger.since = None
+                    continue
+                trigger.stats["matches"] += 1
+                trigger.last_match = timestamp
+                if trigger.since is None:
+                    trigger.since = timestamp
+                if timestamp - trigger.since < trigger.debounce or trigger.running:
+                    continue
+                if trigger.last_fired is not None and timestamp - trigger.last_fired < trigger.cooldown:
+                    trigger.stats["cooldown_suppressed"] += 1
+                    continue
+                if not self.slots.acquire(blocking=False):
+                    # Pool is busy; the trigger stays armed and retries on the next event
+                    trigger.stats["throttled"] += 1
+                    continue
+                trigger.running = True
+                trigger.last_fired = timestamp
+                trigger.stats["fired"] += 1
+                due.append(trigger)
+
+        for trigger in due:
+            event = {"type": event_type, "timestamp": timestamp, "payload": payload}
+            if self.executor is None:
+                self._run_pipeline(trigger, event)
+            else:
+                self.executor.submit(self._run_pipeline, trigger, event)
+        return [trigger.id for trigger in due]
+
+    def _run_pipeline(self, trigger, event):
+        """Run a trigger's steps in order, stopping at the first failed step"""
+        try:
+            for step in trigger.pipeline:
+                started = time.perf_counter()
+                params = {k: v for k, v in step.items() if k not in ("action", "continue_on_error")}
+                if self.dry_run:
+                    result = {"dry_run": True, "would_run": step["action"], "target": _describe_target(params)}
+                else:
+                    try:
+                        result = ACTIONS[step["action"]](**params)
+                    except Exception as e:
+                        result = {"error": str(e)}
+                _write_audit({
+                    "timestamp": time.time(),
+                    "trigger": trigger.id,
+                    "event": event["type"],
+                    "event_timestamp": event["timestamp"],
+                    "latency_ms": round((time.time() - event["timestamp"]) * 1000, 1),
+                    "action": step["action"],
+                    "params": params,
+                    "dry_run": self.dry_run,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "result": result
+                })
+                if "error" in result:
+                    trigger.stats["failures"] += 1
+                    if not step.get("continue_on_error"):
+                        break
+        finally:
+            trigger.running = False
+            self.slots.release()
+
+    def get_status(self):
+        return {
+            "running": self.running,
+            "dry_run": self.dry_run,
+            "max_concurrent": self.max_concurrent,
+            "trigger_errors": self.errors,
+            "triggers": [{
+                "id": t.id,
+                "event": t.event,
+                "enabled": t.enabled,
+                "armed_since": t.since,
+                "last_fired": t.last_fired,
+                "running": t.running,
+                **t.stats
+            } for t in self.triggers],
+            "recent_actions": _read_audit_tail()
+        }
+
+def _pick_process(target):
+    """Resolve "top_cpu"/"top_memory" to the busiest unprotected process.
+
+    A process's first cpu_percent() call only primes its counters and
+    returns 0.0, so CPU usage is measured over CPU_SAMPLE_SECONDS.
+    """
+    import psutil
+    candidates = []
+    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'memory_percent']):
+        info = proc.info
+        # pid/ppid 2 are the Linux kernel thread daemon and its threads
+        if info['pid'] in (0, 1, 2, os.getpid()) or info['ppid'] == 2 or \
+                (info['name'] or "").lower() in PROTECTED_PROCESSES:
+            continue
+        candidates.append((proc, info))
+
+    if target == "top_memory":
+        key = "memory_percent"
+    else:
+        key = "cpu_percent"
+        for proc, _ in candidates:
+            try:
+                proc.cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        time.sleep(CPU_SAMPLE_SECONDS)
+        for proc, info in candidates:
+            try:
+                info[key] = proc.cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                info[key] = None
+
+    best = None
+    for _, info in candidates:
+        if info.get(key) is not None and (best is None or info[key] > best[key]):
+            best = info
+    return best
+
+def _describe_target(params):
+    target = params.get("target")
+    if target in ("top_cpu", "top_memory"):
+        proc = _pick_process(target)
+        return {"pid": proc["pid"], "name": proc["name"]} if proc else None
+    return {k: params[k] for k in ("pid", "name", "directory") if k in params} or None
+
+def _resolve_process(target=None, pid=None, name=None):
+    if target in ("top_cpu", "top_memory"):
+        proc = _pick_process(target)
+        if proc is None:
+            raise ValueError(f"No process found for target {target}")
+        return proc["pid"], None
+    return pid, name
+
+def _action_renice(target=None, pid=None, name=None, niceness=10):
+    from ..system_control.process_control import renice_process
+    pid, name = _resolve_process(target, pid, name)
+    return renice_process(pid=pid, name=name, niceness=niceness)
+
+def _action_stop_process(target=None, pid=None, name=None, force=False):
+    from ..system_control.process_control import kill_process
+    pid, name = _resolve_process(target, pid, name)
+    return kill_process(pid=pid, name=name, force=force)
+
+def _action_clean_temp_files(directory=None, older_than_days=7, file_patterns=None):
+    from ..files.file_delete import cleanup_temp_files
+    return cleanup_temp_files(directory or tempfile.gettempdir(), older_than_days, file_patterns)
+
+ACTIONS = {
+    "renice": _action_renice,
+    "stop_process": _action_stop_process,
+    "clean_temp_files": _action_clean_temp_files,
+}
+
+_audit_lock = threading.Lock()
+
+def _write_audit(entry):
+    """Append one action record to the audit log"""
+    with _audit_lock:
+        with open(AUDIT_LOG, 'a') as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+def _read_audit_tail(limit=10, chunk_bytes=65536):
+    """Last audit records, reading only the end of the log"""
+    if not AUDIT_LOG.exists():
+        return []
+    with open(AUDIT_LOG, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - chunk_bytes))
+        lines = f.read().splitlines()[-limit:]
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+def _load_triggers():
+    """Load trigger configuration, creating the defaults on first use"""
+    if TRIGGERS_FILE.exists():
+        with open(TRIGGERS_FILE, 'r') as f:
+            return json.load(f)
+    with open(TRIGGERS_FILE, 'w') as f:
+        json.dump(DEFAULT_TRIGGERS, f, indent=2)
+    return DEFAULT_TRIGGERS
+
+_control_engine = None
+
+def start_control_engine():
+    """Subscribe the trigger engine to the background monitor's event stream"""
+    global _control_engine
+    try:
+        from ..service.background_monitor import subscribe, start_service
+        DATA_DIR.mkdir(exist_ok=True)
+        if _control_engine is None or not _control_engine.running:
+            _control_engine = TriggerEngine(_load_triggers())
+            _control_engine.start()
+            subscribe(_control_engine.handle_event)
+        start_service()
+        return _control_engine.get_status()
+    except Exception as e:
+        return {"error": str(e)}
+
+def stop_control_engine():
+    """Unsubscribe and stop the trigger engine"""
+    from ..service.background_monitor import unsubscribe
+    if _control_engine is not None:
+        unsubscribe(_control_engine.handle_event)
+        _control_engine.stop()
+    return True
\ No newline at end of file
@@ -1,29 +1,50 @@
 """Decision Engine - Makes decisions based on analysis and predictions"""
 import json
+import re
 import time
+import operator
+import threading
+import numpy as np
 from pathlib import Path
 
 DATA_DIR = Path(__file__).parent / "data"
 DECISIONS_FILE = DATA_DIR / "decisions.json"
 RULES_FILE = DATA_DIR / "decision_rules.json"
 
+# Rule vocabulary -> metric store field
+METRIC_ALIASES = {
+    "cpu_usage": "cpu_percent",
+    "memory_usage": "memory_percent",
+    "process_count": "active_processes",
+}
+
+COMPARISONS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+               "==": operator.eq, "!=": operator.ne}
+AGGREGATES = {"avg": np.mean, "min": np.min, "max": np.max, "sum": np.sum, "count": len}
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d+)?)([smhd])\b|(\d+(?:\.\d+)?)|(>=|<=|==|!=|>|<)|([()])|([A-Za-z_][\w.]*))")
+
+_engine_lock = threading.Lock()
+_engine = {"engine": None, "mtime": None}
+
 def get_decision_engine():
     """Make decisions based on current system state and predictions"""
     try:
         if not DATA_DIR.exists():
             DATA_DIR.mkdir(exist_ok=True)
         
-        # Load decision rules
-        rules = _load_decision_rules()
+        # Load decision rules (compiled once per rules file change)
+        engine = _get_rule_engine()
         
         # Make decisions based on current state
-        decisions = _make_decisions(rules)
+        decisions = _make_decisions(engine)
         
         # Save decisions
         decision_data = {
             "decisions": decisions,
             "timestamp": time.time(),
-            "rules_applied": len(rules),
+            "rules_applied": len(engine.rules),
             "decision_count": len(decisions)
         }
         
@@ -34,7 +55,9 @@ def get_decision_engine():
             "status": "active",
             "decisions": decisions,
             "decision_count": len(decisions),
-            "rules_loaded": len(rules),
+            "rules_loaded": len(engine.rules),
+            "rule_errors": engine.errors,
+            "rule_engine": engine.get_stats(),
             "last_decision_time": decision_data["timestamp"]
         }
     except Exception as e:
@@ -91,47 +114,315 @@ def _load_decision_rules():
         
         return default_rules
 
-def _make_decisions(rules):
-    """Make decisions based on rules and current state"""
+class Comparison:
+    """`metric op threshold`, or `agg(metric) over window op threshold`.
+
+    Without an operator the metric's truthiness is used (flags such as
+    `low_activity_period`). Missing metrics never match.
+    """
+
+    def __init__(self, metric, op=None, threshold=None, aggregate=None, window=None):
+        self.metric = METRIC_ALIASES.get(metric, metric)
+        self.op = COMPARISONS[op] if op else None
+        self.threshold = threshold
+        self.aggregate = aggregate
+        self.window = window
+        self.metrics = {self.metric}
+        self.windowed = {self.metric} if window else set()
+
+    def evaluate(self, snapshot):
+        if self.window:
+            values = snapshot.window(self.metric, self.window)
+            if len(values) == 0:
+                return False
+            value = AGGREGATES[self.aggregate](values)
+        else:
+            value = snapshot.values.get(self.metric)
+            if value is None:
+                return False
+        if self.op is None:
+            return bool(value)
+        return self.op(value, self.threshold)
+
+class AllOf:
+    def __init__(self, children):
+        self.children = children
+        self.metrics = set().union(*(c.metrics for c in children))
+        self.windowed = set().union(*(c.windowed for c in children))
+
+    def evaluate(self, snapshot):
+        return all(child.evaluate(snapshot) for child in self.children)
+
+class AnyOf(AllOf):
+    def evaluate(self, snapshot):
+        return any(child.evaluate(snapshot) for child in self.children)
+
+class Negation:
+    def __init__(self, child):
+        self.child = child
+        self.metrics = child.metrics
+        self.windowed = child.windowed
+
+    def evaluate(self, snapshot):
+        return not self.child.evaluate(snapshot)
+
+def compile_condition(text):
+    """Parse a rule condition into a predicate object.
+
+    Grammar: comparisons (`cpu_usage > 80`), windowed aggregates
+    (`avg(cpu_usage) over 5m > 80` or `avg cpu_usage over 5m > 80`) and
+    bare flags, combined with `and`, `or`, `not` and parentheses.
+    """
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Unexpected input at {pos} in condition: {text!r}")
+        pos = match.end()
+        duration, unit, number, op, paren, name = match.groups()
+        if duration:
+            tokens.append(("duration", float(duration) * DURATION_UNITS[unit]))
+        elif number:
+            tokens.append(("number", float(number)))
+        elif op:
+            tokens.append(("op", op))
+        elif paren:
+            tokens.append((paren, paren))
+        else:
+            tokens.append(("name", name))
+    parser = _ConditionParser(tokens, text)
+    predicate = parser.parse_or()
+    if parser.pos != len(tokens):
+        raise ValueError(f"Unexpected {tokens[parser.pos][1]!r} in condition: {text!r}")
+    return predicate
+
+class _ConditionParser:
+    """Recursive-descent parser over the tokens of one condition"""
+
+    def __init__(self, tokens, text):
+        self.tokens = tokens
+        self.text = text
+        self.pos = 0
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self, kind, value=None):
+        token = self.peek()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise ValueError(f"Expected {value or kind} in condition: {self.text!r}")
+        self.pos += 1
+        return token[1]
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == ("name", "or"):
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else AnyOf(children)
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while self.peek() == ("name", "and"):
+            self.pos += 1
+            children.append(self.parse_unary())
+        return children[0] if len(children) == 1 else AllOf(children)
+
+    def parse_unary(self):
+        if self.peek() == ("name", "not"):
+            self.pos += 1
+            return Negation(self.parse_unary())
+        if self.peek()[0] == "(":
+            self.pos += 1
+            inner = self.parse_or()
+            self.take(")")
+            return inner
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        name = self.take("name")
+        aggregate = window = None
+        if name in AGGREGATES and (self.peek()[0] == "(" or self.peek(1) == ("name", "over")):
+            aggregate = name
+            if self.peek()[0] == "(":
+                self.pos += 1
+                name = self.take("name")
+                self.take(")")
+            else:
+                name = self.take("name")
+            self.take("name", "over")
+            window = self.take("duration")
+        if self.peek()[0] == "op":
+            op = self.take("op")
+            return Comparison(name, op, self.take("number"), aggregate, window)
+        if aggregate:
+            raise ValueError(f"Windowed aggregate needs a comparison in condition: {self.text!r}")
+        return Comparison(name)
+
+class MetricSnapshot:
+    """Current metric values plus memoized history windows for one tick"""
+
+    def __init__(self, values, timestamp, history=None):
+        self.values = values
+        self.timestamp = timestamp
+        self._history = history
+        self._windows = {}
+
+    def window(self, metric, seconds):
+        key = (metric, seconds)
+        if key not in self._windows:
+            values = self._history(metric, self.timestamp - seconds, self.timestamp) if self._history else []
+            values = np.asarray(values, dtype=np.float64)
+            self._windows[key] = values[np.isfinite(values)]
+        return self._windows[key]
+
+class RuleEngine:
+    """Evaluates compiled rules, re-running only those a new sample affects.
+
+    Rules are indexed by the metrics they read. Each tick, plain rules are
+    re-evaluated when one of their metrics changed value and windowed rules
+    whenever a newer sample of their metric arrived; every other rule keeps
+    its previous result.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        self.errors = []
+        self.by_metric = {}
+        self.windowed_by_metric = {}
+        for category, rule_list in rules.items():
+            for index, rule in enumerate(rule_list):
+                rule_id = rule.get("id", f"{category}:{index}")
+                try:
+                    predicate = compile_condition(rule["condition"])
+                except (KeyError, ValueError) as e:
+                    self.errors.append({"rule": rule_id, "error": str(e)})
+                    continue
+                position = len(self.rules)
+                self.rules.append(dict(rule, id=rule_id, category=category, predicate=predicate))
+                for metric in predicate.metrics:
+                    self.by_metric.setdefault(metric, []).append(position)
+                for metric in predicate.windowed:
+                    self.windowed_by_metric.setdefault(metric, []).append(position)
+        self.results = [False] * len(self.rules)
+        self.stats = [{"evaluations": 0, "hits": 0, "total_ns": 0, "max_ns": 0} for _ in self.rules]
+        self.last_values = None
+        self.last_timestamp = None
+        self.last_tick = {}
+
+    def evaluate(self, snapshot):
+        """Update rule results for a snapshot; returns the rules now matching"""
+        started = time.perf_counter_ns()
+        if self.last_values is None:
+            affected = range(len(self.rules))
+        else:
+            affected = set()
+            for metric in set(snapshot.values) | set(self.last_values):
+                if snapshot.values.get(metric) != self.last_values.get(metric):
+                    affected.update(self.by_metric.get(metric, ()))
+            if snapshot.timestamp != self.last_timestamp:
+                for metric in snapshot.values:
+                    affected.update(self.windowed_by_metric.get(metric, ()))
+            affected = sorted(affected)
+
+        for position in affected:
+            rule_started = time.perf_counter_ns()
+            try:
+                matched = bool(self.rules[position]["predicate"].evaluate(snapshot))
+            except (TypeError, ValueError):
+                matched = False
+            elapsed = time.perf_counter_ns() - rule_started
+            stats = self.stats[position]
+            stats["evaluations"] += 1
+            stats["hits"] += matched
+            stats["total_ns"] += elapsed
+            stats["max_ns"] = max(stats["max_ns"], elapsed)
+            self.results[position] = matched
+
+        self.last_values = dict(snapshot.values)
+        self.last_timestamp = snapshot.timestamp
+        self.last_tick = {"rules_evaluated": len(affected), "rules_total": len(self.rules),
+                          "tick_us": round((time.perf_counter_ns() - started) / 1000, 1)}
+        return [self.rules[i] for i, matched in enumerate(self.results) if matched]
+
+    def get_stats(self, top=10):
+        """Engine summary plus the rules that cost the most time"""
+        per_rule = []
+        for rule, stats in zip(self.rules, self.stats):
+            if stats["evaluations"]:
+                per_rule.append({
+                    "rule": rule["id"],
+                    "evaluations": stats["evaluations"],
+                    "hits": stats["hits"],
+                    "hit_rate": round(stats["hits"] / stats["evaluations"], 3),
+                    "avg_us": round(stats["total_ns"] / stats["evaluations"] / 1000, 2),
+                    "max_us": round(stats["max_ns"] / 1000, 2)
+                })
+        per_rule.sort(key=lambda r: r["avg_us"] * r["evaluations"], reverse=True)
+        return {
+            "rules_compiled": len(self.rules),
+            "indexed_metrics": sorted(self.by_metric),
+            "last_tick": self.last_tick,
+            "rule_stats": per_rule[:top]
+        }
+
+def _get_rule_engine():
+    """Get the compiled rule engine, recompiling only when the rules file changes"""
+    with _engine_lock:
+        rules = None if RULES_FILE.exists() else _load_decision_rules()
+        mtime = RULES_FILE.stat().st_mtime_ns
+        if _engine["engine"] is None or _engine["mtime"] != mtime:
+            _engine.update({"engine": RuleEngine(rules or _load_decision_rules()), "mtime": mtime})
+        return _engine["engine"]
+
+def _current_snapshot():
+    """Build the metric snapshot rules are evaluated against.
+
+    Collected metrics come from the shared metric store; disk usage and a
+    low-activity flag are derived here.
+    """
+    from ..service.metric_store import latest_snapshot
+    values = latest_snapshot()
+    timestamp = values.pop("timestamp") or time.time()
+    try:
+        import psutil
+        values["disk_usage"] = psutil.disk_usage("/").percent
+    except Exception:
+        pass
+    if "cpu_percent" in values:
+        values["low_activity_period"] = values["cpu_percent"] < 10
+    return MetricSnapshot(values, timestamp, load_metric_window)
+
+def load_metric_window(metric, since, until):
+    """History of one metric from the shared metric store, for windowed conditions.
+
+    `<counter>_rate` metrics are not stored; they are computed from the
+    counter column, starting one point early so the first sample has a rate.
+    """
+    from ..service.metric_store import load_columns, counter_rates, COUNTER_FIELDS
+    counter = metric[:-len("_rate")]
+    if not metric.endswith("_rate") or counter not in COUNTER_FIELDS:
+        return load_columns((metric,), since=since, until=until)[metric]
+    columns = load_columns((counter,), until=until)
+    timestamps = columns["timestamp"]
+    start = int(np.searchsorted(timestamps, since, side="left"))
+    first = max(start - 1, 0)
+    return counter_rates(timestamps[first:], columns[counter][first:])[start - first:]
+
+def _make_decisions(engine, snapshot=None):
+    """Make decisions from the rules matching the current state"""
+    snapshot = snapshot or _current_snapshot()
     decisions = []
-    current_time = time.time()
-    
-    # Simulate decision making based on rules
-    # In a real implementation, this would check actual system state
-    
-    for category, rule_list in rules.items():
-        for rule in rule_list:
-            # Simulate condition checking
-            if _evaluate_condition(rule["condition"]):
-                decision = {
-                    "category": category,
-                    "action": rule["action"],
-                    "priority": rule["priority"],
-                    "reason": f"Rule triggered: {rule['condition']}",
-                    "timestamp": current_time,
-                    "executed": False
-                }
-                decisions.append(decision)
-    
+    for rule in engine.evaluate(snapshot):
+        decisions.append({
+            "category": rule["category"],
+            "action": rule["action"],
+            "priority": rule["priority"],
+            "reason": f"Rule triggered: {rule['condition']}",
+            "timestamp": snapshot.timestamp,
+            "executed": False
+        })
     return decisions
-
-def _evaluate_condition(condition):
-    """Evaluate a decision rule condition"""
-    # This is a simplified implementation
-    # In reality, this would check actual system metrics
-    
-    current_hour = time.localtime().tm_hour
-    
-    # Simulate some conditions
-    if "cpu_usage > 80" in condition:
-        return current_hour in [10, 11, 14, 15]  # Simulate high CPU during work hours
-    elif "memory_usage > 85" in condition:
-        return current_hour in [16, 17, 20, 21]  # Simulate high memory usage
-    elif "disk_usage > 90" in condition:
-        return False  # Rarely trigger disk cleanup
-    elif "repetitive_task_detected" in condition:
-        return current_hour % 4 == 0  # Simulate detection every 4 hours
-    elif "low_activity_period" in condition:
-        return current_hour < 8 or current_hour > 22  # Early morning or late night
-    
-    return False
\ No newline at end of file
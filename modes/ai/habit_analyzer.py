@@ -1,104 +1,432 @@
 """Habit Analyzer - Analyzes user behavior patterns from collected data"""
 import json
 import time
+import hashlib
+import threading
+import numpy as np
 from pathlib import Path
-from collections import defaultdict, Counter
 
 DATA_DIR = Path(__file__).parent / "data"
 HABITS_FILE = DATA_DIR / "user_habits.json"
+HABIT_SKETCH_DIR = DATA_DIR / "habit_sketches"
+
+# Sketch sizes: count-min error is about e/CMS_WIDTH of the total count with
+# probability 1 - e^-CMS_DEPTH; HyperLogLog error is about 1.04/sqrt(2^HLL_PRECISION)
+CMS_WIDTH = 1024
+CMS_DEPTH = 4
+HLL_PRECISION = 12
+TOP_K = 32
+
+HOURS_PER_WEEK = 168
+# Samples at or above this CPU level count as user activity
+ACTIVE_CPU = 10
+# Per-day sketches kept for recent-habit analysis; older days live on in the total
+RECENT_DAYS = 28
+DAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+_sketch_lock = threading.Lock()
+_sketch_cache = {}
 
 def get_habit_analyzer():
     """Analyze user habits from collected monitoring data"""
     try:
         if not DATA_DIR.exists():
             DATA_DIR.mkdir(exist_ok=True)
-        
-        if not HABITS_FILE.exists():
+
+        update_habit_sketches()
+        with _sketch_lock:
+            total = _load_sketch("total")
+            recent = _merge_days(7)
+
+        if total.events == 0 and total.samples == 0:
             return {
                 "status": "no_data",
                 "message": "No habit data collected yet. Start monitoring to build patterns."
             }
-        
-        with open(HABITS_FILE, 'r') as f:
-            habits = json.load(f)
-        
-        # Analyze patterns
+
         analysis = {
-            "most_used_apps": Counter(habits.get("app_usage", {})).most_common(10),
-            "peak_activity_hours": _analyze_time_patterns(habits.get("activity_times", [])),
-            "keyboard_patterns": _analyze_keyboard_habits(habits.get("keyboard_data", {})),
-            "resource_usage_patterns": _analyze_resource_patterns(habits.get("resource_data", {})),
-            "habit_strength": _calculate_habit_strength(habits),
-            "last_updated": habits.get("last_updated", "unknown")
+            "most_used_apps": total.top("apps", 10),
+            "most_used_apps_this_week": recent.top("apps", 5),
+            "distinct_apps": total.distinct_apps.count(),
+            "distinct_actions": total.distinct_actions.count(),
+            "peak_activity_hours": _analyze_time_patterns(total),
+            "keyboard_patterns": _analyze_keyboard_habits(total),
+            "resource_usage_patterns": _analyze_resource_patterns(total),
+            "habit_strength": _calculate_habit_strength(total, recent),
+            "last_updated": total.last_timestamp
         }
-        
+
         return {
             "status": "analyzed",
             "habits": analysis,
-            "data_points": len(habits.get("sessions", [])),
-            "analysis_confidence": _calculate_confidence(habits)
+            "data_points": total.events + total.samples,
+            "analysis_confidence": _calculate_confidence(total),
+            "sketch_memory_kb": round(total.nbytes() / 1024, 1)
         }
     except Exception as e:
         return {"error": str(e)}
 
-def _analyze_time_patterns(activity_times):
+def record_activity(events):
+    """Fold activity events into today's and the all-time habit sketches.
+
+    Events are dicts with a "timestamp" and any of "app", "action",
+    "keys" (keystroke count) and "shortcut".
+    """
+    try:
+        with _sketch_lock:
+            total = _load_sketch("total")
+            touched = {"total": total}
+            for event in events:
+                event = event if "timestamp" in event else dict(event, timestamp=time.time())
+                day = _day_key(event["timestamp"])
+                if day not in touched:
+                    touched[day] = _load_sketch(day)
+                total.add(event)
+                touched[day].add(event)
+            for name, sketch in touched.items():
+                _save_sketch(name, sketch)
+            _prune_days()
+        return {"success": True, "recorded": len(events), "total_events": total.events}
+    except Exception as e:
+        return {"error": str(e)}
+
+def update_habit_sketches():
+    """Fold metric store points added since the last call into the time and resource matrices"""
+    from ..service.metric_store import read_points
+    with _sketch_lock:
+        state = _load_state()
+        if state["read_offset"] == 0:
+            _migrate_habits_file()
+        points, next_offset = read_points(state["read_offset"])
+        if next_offset < state["read_offset"]:
+            points, next_offset = read_points(0)
+        if not points:
+            return 0
+
+        timestamps = np.array([p["timestamp"] for p in points], dtype=np.float64)
+        cpu = np.array([p.get("cpu_percent", np.nan) for p in points], dtype=np.float64)
+        memory = np.array([p.get("memory_percent", np.nan) for p in points], dtype=np.float64)
+        # Day key looked up once per distinct hour rather than per point
+        hours, inverse = np.unique(np.floor(timestamps / 3600), return_inverse=True)
+        days = np.array([_day_key(hour * 3600) for hour in hours])[inverse]
+
+        total = _load_sketch("total")
+        total.add_samples(timestamps, cpu, memory)
+        _save_sketch("total", total)
+        for day in np.unique(days):
+            in_day = days == day
+            sketch = _load_sketch(day)
+            sketch.add_samples(timestamps[in_day], cpu[in_day], memory[in_day])
+            _save_sketch(day, sketch)
+        _prune_days()
+
+        state["read_offset"] = next_offset
+        _save_state(state)
+        return len(points)
+
+class CountMinSketch:
+    """Count-min frequency sketch; sketches of the same shape merge by addition"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, table=None):
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, key):
+        digest = hashlib.blake2b(str(key).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        width = self.table.shape[1]
+        return [(h1 + i * h2) % width for i in range(self.table.shape[0])]
+
+    def add(self, key, count=1):
+        """Add to a key's count and return its new estimate"""
+        columns = self._columns(key)
+        rows = np.arange(self.table.shape[0])
+        self.table[rows, columns] += count
+        return int(self.table[rows, columns].min())
+
+    def estimate(self, key):
+        return int(self.table[np.arange(self.table.shape[0]), self._columns(key)].min())
+
+    def merge(self, other):
+        self.table += other.table
+
+class HyperLogLog:
+    """HyperLogLog distinct counter; sketches merge by register-wise max"""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, key):
+        x = int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "little")
+        index = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+class HabitSketch:
+    """Bounded-size habit summary: frequency and distinct-count sketches plus
+    hour-of-week matrices. Any two sketches merge into one covering both.
+    """
+    MATRICES = ("activity", "samples", "active_samples", "keys", "cpu_sum", "cpu_count", "memory_sum", "memory_count")
+
+    def __init__(self):
+        self.apps = CountMinSketch()
+        self.actions = CountMinSketch()
+        self.shortcuts = CountMinSketch()
+        self.distinct_apps = HyperLogLog()
+        self.distinct_actions = HyperLogLog()
+        self.matrices = {name: np.zeros(HOURS_PER_WEEK) for name in self.MATRICES}
+        self.candidates = {"apps": {}, "actions": {}, "shortcuts": {}}
+        self.events = 0
+        self.samples = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def add(self, event):
+        timestamp = event["timestamp"]
+        how = _hour_of_week(np.array([timestamp]))[0]
+        self.events += 1
+        self.matrices["activity"][how] += 1
+        self._seen(timestamp, timestamp)
+        if event.get("app"):
+            self._count("apps", self.apps, event["app"])
+            self.distinct_apps.add(event["app"])
+        if event.get("action"):
+            self._count("actions", self.actions, event["action"])
+            self.distinct_actions.add(event["action"])
+        if event.get("shortcut"):
+            self._count("shortcuts", self.shortcuts, event["shortcut"])
+        if event.get("keys"):
+            self.matrices["keys"][how] += event["keys"]
+
+    def add_samples(self, timestamps, cpu, memory):
+        """Vectorized fold of metric samples into the hour-of-week matrices"""
+        if len(timestamps) == 0:
+            return
+        how = _hour_of_week(timestamps)
+        self.samples += len(timestamps)
+        self._seen(float(timestamps.min()), float(timestamps.max()))
+        matrices = self.matrices
+        matrices["samples"] += np.bincount(how, minlength=HOURS_PER_WEEK)
+        matrices["active_samples"] += np.bincount(how[cpu >= ACTIVE_CPU], minlength=HOURS_PER_WEEK)
+        for name, values in (("cpu", cpu), ("memory", memory)):
+            valid = np.isfinite(values)
+            matrices[f"{name}_sum"] += np.bincount(how[valid], weights=values[valid], minlength=HOURS_PER_WEEK)
+            matrices[f"{name}_count"] += np.bincount(how[valid], minlength=HOURS_PER_WEEK)
+
+    def _seen(self, first, last):
+        self.first_timestamp = first if self.first_timestamp is None else min(self.first_timestamp, first)
+        self.last_timestamp = last if self.last_timestamp is None else max(self.last_timestamp, last)
+
+    def _count(self, kind, sketch, key, count=1):
+        """Update the sketch and keep the TOP_K heaviest keys as report candidates"""
+        estimate = sketch.add(key, count)
+        candidates = self.candidates[kind]
+        if key in candidates or len(candidates) < TOP_K:
+            candidates[key] = estimate
+        else:
+            smallest = min(candidates, key=candidates.get)
+            if estimate > candidates[smallest]:
+                del candidates[smallest]
+                candidates[key] = estimate
+
+    def top(self, kind, limit):
+        sketch = getattr(self, kind)
+        ranked = sorted(((key, sketch.estimate(key)) for key in self.candidates[kind]),
+                        key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def merge(self, other):
+        for name in ("apps", "actions", "shortcuts", "distinct_apps", "distinct_actions"):
+            getattr(self, name).merge(getattr(other, name))
+        for name in self.MATRICES:
+            self.matrices[name] += other.matrices[name]
+        for kind, candidates in other.candidates.items():
+            keys = set(self.candidates[kind]) | set(candidates)
+            sketch = getattr(self, kind)
+            ranked = sorted(keys, key=lambda key: (-sketch.estimate(key), key))[:TOP_K]
+            self.candidates[kind] = {key: sketch.estimate(key) for key in ranked}
+        self.events += other.events
+        self.samples += other.samples
+        if other.first_timestamp is not None:
+            self._seen(other.first_timestamp, other.last_timestamp)
+
+    def nbytes(self):
+        arrays = [self.apps.table, self.actions.table, self.shortcuts.table,
+                  self.distinct_apps.registers, self.distinct_actions.registers, *self.matrices.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def save(self, path):
+        meta = {"candidates": self.candidates, "events": self.events, "samples": self.samples,
+                "first_timestamp": self.first_timestamp, "last_timestamp": self.last_timestamp}
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp, apps=self.apps.table, actions=self.actions.table, shortcuts=self.shortcuts.table,
+                 distinct_apps=self.distinct_apps.registers, distinct_actions=self.distinct_actions.registers,
+                 meta=np.array(json.dumps(meta)), **{f"m_{name}": m for name, m in self.matrices.items()})
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        sketch = cls()
+        with np.load(path, allow_pickle=False) as data:
+            sketch.apps.table = data["apps"]
+            sketch.actions.table = data["actions"]
+            sketch.shortcuts.table = data["shortcuts"]
+            sketch.distinct_apps.registers = data["distinct_apps"]
+            sketch.distinct_actions.registers = data["distinct_actions"]
+            sketch.matrices = {name: data[f"m_{name}"] for name in cls.MATRICES}
+            meta = json.loads(str(data["meta"]))
+        sketch.candidates = meta["candidates"]
+        sketch.events = meta["events"]
+        sketch.samples = meta["samples"]
+        sketch.first_timestamp = meta["first_timestamp"]
+        sketch.last_timestamp = meta["last_timestamp"]
+        return sketch
+
+def _hour_of_week(timestamps):
+    from ..ml.feature_engineering import local_time_parts
+    hour_of_day, day_of_week = local_time_parts(timestamps)
+    return day_of_week * 24 + np.floor(hour_of_day).astype(np.int64)
+
+def _day_key(timestamp):
+    return time.strftime("day_%Y%m%d", time.localtime(timestamp))
+
+def _load_sketch(name):
+    """Load a sketch by name ("total" or a day key), cached while its file is unchanged"""
+    path = HABIT_SKETCH_DIR / f"{name}.npz"
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    cached = _sketch_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    sketch = HabitSketch.load(path) if mtime is not None else HabitSketch()
+    _sketch_cache[path] = (mtime, sketch)
+    return sketch
+
+def _save_sketch(name, sketch):
+    HABIT_SKETCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = HABIT_SKETCH_DIR / f"{name}.npz"
+    sketch.save(path)
+    _sketch_cache[path] = (path.stat().st_mtime_ns, sketch)
+
+def _merge_days(days):
+    """Merge the most recent day sketches into one"""
+    merged = HabitSketch()
+    if HABIT_SKETCH_DIR.exists():
+        for path in sorted(HABIT_SKETCH_DIR.glob("day_*.npz"))[-days:]:
+            merged.merge(_load_sketch(path.stem))
+    return merged
+
+def _prune_days():
+    """Drop day sketches beyond RECENT_DAYS; their counts remain in the total"""
+    for path in sorted(HABIT_SKETCH_DIR.glob("day_*.npz"))[:-RECENT_DAYS]:
+        path.unlink()
+        _sketch_cache.pop(path, None)
+
+def _load_state():
+    state_file = HABIT_SKETCH_DIR / "state.json"
+    if state_file.exists():
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    return {"read_offset": 0}
+
+def _save_state(state):
+    HABIT_SKETCH_DIR.mkdir(parents=True, exist_ok=True)
+    with open(HABIT_SKETCH_DIR / "state.json", 'w') as f:
+        json.dump(state, f)
+
+def _migrate_habits_file():
+    """Fold the old raw habits file into the all-time sketch once"""
+    if not HABITS_FILE.exists():
+        return
+    with open(HABITS_FILE, 'r') as f:
+        habits = json.load(f)
+    total = _load_sketch("total")
+    for app, count in habits.get("app_usage", {}).items():
+        total._count("apps", total.apps, app, int(count))
+        total.distinct_apps.add(app)
+    for timestamp in habits.get("activity_times", []):
+        total.add({"timestamp": timestamp})
+    _save_sketch("total", total)
+    HABITS_FILE.rename(HABITS_FILE.with_suffix(".json.migrated"))
+
+def _analyze_time_patterns(sketch):
     """Analyze when user is most active"""
-    if not activity_times:
+    activity = sketch.matrices["activity"] + sketch.matrices["active_samples"]
+    if not activity.any():
         return {"message": "No time pattern data"}
-    
-    hour_counts = Counter()
-    for timestamp in activity_times:
-        hour = time.localtime(timestamp).tm_hour
-        hour_counts[hour] += 1
-    
+    by_hour = activity.reshape(7, 24).sum(axis=0)
+    peak_slots = np.argsort(activity)[::-1][:3]
     return {
-        "peak_hours": hour_counts.most_common(5),
-        "total_sessions": len(activity_times)
+        "peak_hours": [(int(hour), int(by_hour[hour])) for hour in np.argsort(by_hour)[::-1][:5] if by_hour[hour]],
+        "peak_hours_of_week": [f"{DAY_NAMES[slot // 24]} {slot % 24:02d}:00" for slot in peak_slots if activity[slot]],
+        "total_sessions": int(activity.sum())
     }
 
-def _analyze_keyboard_habits(keyboard_data):
+def _analyze_keyboard_habits(sketch):
     """Analyze typing patterns and shortcuts"""
-    if not keyboard_data:
+    keys = sketch.matrices["keys"]
+    if not keys.any() and not sketch.candidates["shortcuts"]:
         return {"message": "No keyboard data"}
-    
+    typing_hours = int(np.count_nonzero(keys))
     return {
-        "avg_keys_per_minute": keyboard_data.get("avg_kpm", 0),
-        "most_used_shortcuts": keyboard_data.get("shortcuts", {}),
-        "typing_sessions": keyboard_data.get("session_count", 0)
+        "keys_per_typing_hour_slot": round(float(keys.sum() / max(typing_hours, 1)), 1),
+        "busiest_typing_hour": int(keys.reshape(7, 24).sum(axis=0).argmax()),
+        "most_used_shortcuts": dict(sketch.top("shortcuts", 10))
     }
 
-def _analyze_resource_patterns(resource_data):
+def _analyze_resource_patterns(sketch):
     """Analyze system resource usage patterns"""
-    if not resource_data:
+    m = sketch.matrices
+    if not m["cpu_count"].any():
         return {"message": "No resource data"}
-    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cpu_by_slot = m["cpu_sum"] / m["cpu_count"]
+    peak_slots = [slot for slot in np.argsort(np.nan_to_num(cpu_by_slot, nan=-1))[::-1][:3] if m["cpu_count"][slot]]
     return {
-        "avg_cpu_usage": resource_data.get("avg_cpu", 0),
-        "avg_memory_usage": resource_data.get("avg_memory", 0),
-        "peak_usage_times": resource_data.get("peak_times", [])
+        "avg_cpu_usage": round(float(m["cpu_sum"].sum() / m["cpu_count"].sum()), 2),
+        "avg_memory_usage": round(float(m["memory_sum"].sum() / max(m["memory_count"].sum(), 1)), 2),
+        "peak_usage_times": [f"{DAY_NAMES[slot // 24]} {slot % 24:02d}:00" for slot in peak_slots]
     }
 
-def _calculate_habit_strength(habits):
-    """Calculate how strong/consistent user habits are"""
-    sessions = habits.get("sessions", [])
-    if len(sessions) < 10:
+def _calculate_habit_strength(total, recent):
+    """How closely the last week's hour-of-week activity follows the long-run pattern"""
+    long_run = total.matrices["activity"] + total.matrices["active_samples"]
+    week = recent.matrices["activity"] + recent.matrices["active_samples"]
+    if week.sum() < 10 or long_run.sum() <= week.sum():
         return {"strength": "insufficient_data", "score": 0}
-    
-    # Simple consistency score based on session count and regularity
-    consistency_score = min(len(sessions) / 100, 1.0) * 100
-    
+    baseline = long_run - week
+    score = float(week @ baseline / (np.linalg.norm(week) * np.linalg.norm(baseline) or 1)) * 100
     return {
-        "strength": "strong" if consistency_score > 70 else "moderate" if consistency_score > 30 else "weak",
-        "score": round(consistency_score, 2),
-        "sessions_analyzed": len(sessions)
+        "strength": "strong" if score > 70 else "moderate" if score > 30 else "weak",
+        "score": round(score, 2),
+        "sessions_analyzed": int(long_run.sum())
     }
 
-def _calculate_confidence(habits):
+def _calculate_confidence(sketch):
     """Calculate confidence in habit analysis"""
-    data_points = len(habits.get("sessions", []))
-    if data_points < 5:
+    if sketch.first_timestamp is None:
+        return "low"
+    days = (sketch.last_timestamp - sketch.first_timestamp) / 86400
+    if days < 2:
         return "low"
-    elif data_points < 20:
+    elif days < 14:
         return "moderate"
     else:
-        return "high"
\ No newline at end of file
+        return "high"
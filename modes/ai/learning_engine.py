@@ -1,25 +1,44 @@
 """Learning Engine - Continuously learns from user behavior and system data"""
 import json
+import math
 import time
+import threading
 from pathlib import Path
-from collections import defaultdict, deque
+from collections import Counter, deque
 import statistics
 
 DATA_DIR = Path(__file__).parent / "data"
 LEARNING_DATA = DATA_DIR / "learning_data.json"
+LEARNING_STATS = DATA_DIR / "learning_stats.json"
+OBSERVATION_STORE = DATA_DIR / "observations.ndjson"
 MODEL_STATE = DATA_DIR / "model_state.json"
 
+# Observation keys tracked as numeric streams -> metric store field names
+TRACKED_METRICS = {"cpu_usage": "cpu_percent", "memory_usage": "memory_percent"}
+QUANTILES = (0.5, 0.95)
+
+# Fast/slow EWMA smoothing; the trend is the gap between them
+EWMA_FAST = 0.3
+EWMA_SLOW = 0.05
+
+# Distinct apps counted before the rarest half is dropped
+MAX_TRACKED_APPS = 200
+RECENT_WINDOW = 10
+
+_stats_lock = threading.Lock()
+_stats_cache = {"stats": None, "mtime": None}
+
 def get_learning_engine():
     """Get status and insights from the learning engine"""
     try:
         if not DATA_DIR.exists():
             DATA_DIR.mkdir(exist_ok=True)
         
-        # Load learning data
-        learning_data = _load_learning_data()
+        # Load the streaming aggregates (constant size however long we learn)
+        stats = _load_stats()
         
         # Process recent observations
-        insights = _process_learning_data(learning_data)
+        insights = _process_learning_data(stats)
         
         # Update model state
         model_state = _update_model_state(insights)
@@ -28,111 +47,293 @@ def get_learning_engine():
             "status": "learning",
             "insights": insights,
             "model_state": model_state,
-            "data_points": len(learning_data.get("observations", [])),
-            "learning_confidence": _calculate_learning_confidence(learning_data)
+            "data_points": stats.count,
+            "learning_confidence": _calculate_learning_confidence(stats)
         }
     except Exception as e:
         return {"error": str(e)}
 
-def _load_learning_data():
-    """Load existing learning data or create new structure"""
-    if LEARNING_DATA.exists():
-        with open(LEARNING_DATA, 'r') as f:
-            return json.load(f)
-    else:
+def record_observations(observations):
+    """Fold observations into the streaming aggregates.
+
+    Raw observations are appended to the shared time-series store format
+    (OBSERVATION_STORE) instead of being kept in memory.
+    """
+    try:
+        if not DATA_DIR.exists():
+            DATA_DIR.mkdir(exist_ok=True)
+        now = time.time()
+        observations = [obs if "timestamp" in obs else dict(obs, timestamp=now) for obs in observations]
+        with _stats_lock:
+            stats = _load_stats()
+            for observation in observations:
+                stats.add(observation)
+            _save_stats(stats)
+
+        from ..service.metric_store import append_points
+        stored = append_points([_to_store_point(obs) for obs in observations], path=OBSERVATION_STORE)
+        return {"success": True, "recorded": len(observations), "stored": stored, "total": stats.count}
+    except Exception as e:
+        return {"error": str(e)}
+
+class RunningStats:
+    """Welford running count, mean and variance with min/max"""
+
+    def __init__(self, state=None):
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+        if state:
+            self.count, self.mean, self.m2, self.min, self.max = state
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def state_dict(self):
+        return [self.count, self.mean, self.m2, self.min, self.max]
+
+class P2Quantile:
+    """P-square streaming quantile estimate (Jain & Chlamtac) in five markers"""
+
+    def __init__(self, p, state=None):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+        if state:
+            self.heights, self.positions, self.desired = state
+
+    def add(self, value):
+        h, n = self.heights, self.positions
+        if len(h) < 5:
+            h.append(value)
+            h.sort()
+            return
+        if value < h[0]:
+            h[0] = value
+            k = 0
+        elif value >= h[4]:
+            h[4] = value
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= value < h[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Move the middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if not h[i - 1] < height < h[i + 1]:
+                    height = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = height
+                n[i] += d
+
+    def value(self):
+        if not self.heights:
+            return None
+        if len(self.heights) < 5:
+            return self.heights[min(int(self.p * len(self.heights)), len(self.heights) - 1)]
+        return self.heights[2]
+
+    def state_dict(self):
+        return [self.heights, self.positions, self.desired]
+
+class MetricStream:
+    """Streaming summary of one numeric observation key"""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.stats = RunningStats(state.get("stats"))
+        self.quantiles = {p: P2Quantile(p, state.get("quantiles", {}).get(str(p))) for p in QUANTILES}
+        self.fast, self.slow = state.get("ewma", (None, None))
+        self.recent = deque(state.get("recent", []), maxlen=RECENT_WINDOW)
+
+    def add(self, value):
+        self.stats.add(value)
+        for estimator in self.quantiles.values():
+            estimator.add(value)
+        self.fast = value if self.fast is None else self.fast + EWMA_FAST * (value - self.fast)
+        self.slow = value if self.slow is None else self.slow + EWMA_SLOW * (value - self.slow)
+        self.recent.append(value)
+
+    def trend(self):
+        if self.stats.count <= RECENT_WINDOW:
+            return "stable"
+        gap = self.fast - self.slow
+        if abs(gap) < max(1.0, 0.25 * self.stats.std):
+            return "stable"
+        return "increasing" if gap > 0 else "decreasing"
+
+    def summary(self):
+        return {
+            "average": round(self.stats.mean, 2),
+            "std": round(self.stats.std, 2),
+            "min": self.stats.min,
+            "max": self.stats.max,
+            **{f"p{int(p * 100)}": round(q.value(), 2) for p, q in self.quantiles.items()},
+            "ewma": round(self.fast, 2),
+            "trend": self.trend()
+        }
+
+    def state_dict(self):
+        return {
+            "stats": self.stats.state_dict(),
+            "quantiles": {str(p): q.state_dict() for p, q in self.quantiles.items()},
+            "ewma": [self.fast, self.slow],
+            "recent": list(self.recent)
+        }
+
+class LearningStats:
+    """All aggregates the learning engine reports, updated one observation at a time"""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.count = state.get("count", 0)
+        self.hourly = state.get("hourly", [0] * 24)
+        self.apps = Counter(state.get("apps", {}))
+        self.metrics = {key: MetricStream(state.get("metrics", {}).get(key)) for key in TRACKED_METRICS}
+        self.recent_actions = deque(state.get("recent_actions", []), maxlen=RECENT_WINDOW)
+        self.recent_cpu = deque(state.get("recent_cpu", []), maxlen=RECENT_WINDOW)
+        self.last_updated = state.get("last_updated")
+
+    def add(self, observation):
+        self.count += 1
+        if "timestamp" in observation:
+            self.hourly[time.localtime(observation["timestamp"]).tm_hour] += 1
+        if "active_app" in observation:
+            self.apps[observation["active_app"]] += 1
+            if len(self.apps) > MAX_TRACKED_APPS:
+                self.apps = Counter(dict(self.apps.most_common(MAX_TRACKED_APPS // 2)))
+        for key, field in TRACKED_METRICS.items():
+            value = observation.get(key, observation.get(field))
+            if isinstance(value, (int, float)) and math.isfinite(value):
+                self.metrics[key].add(float(value))
+        self.recent_actions.append(observation.get("action", ""))
+        self.recent_cpu.append(observation.get("cpu_usage", observation.get("cpu_percent")))
+        self.last_updated = time.time()
+
+    def state_dict(self):
         return {
-            "observations": [],
-            "patterns": {},
-            "user_preferences": {},
-            "performance_metrics": {},
-            "last_updated": time.time()
+            "count": self.count,
+            "hourly": self.hourly,
+            "apps": dict(self.apps),
+            "metrics": {key: stream.state_dict() for key, stream in self.metrics.items()},
+            "recent_actions": list(self.recent_actions),
+            "recent_cpu": list(self.recent_cpu),
+            "last_updated": self.last_updated
         }
 
-def _process_learning_data(learning_data):
+def _load_stats():
+    """Load the aggregates, reusing the in-memory copy while the file is unchanged"""
+    try:
+        mtime = LEARNING_STATS.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    if _stats_cache["stats"] is not None and _stats_cache["mtime"] == mtime:
+        return _stats_cache["stats"]
+    if mtime is not None:
+        with open(LEARNING_STATS, 'r') as f:
+            stats = LearningStats(json.load(f))
+    else:
+        stats = _migrate_learning_data()
+    _stats_cache.update({"stats": stats, "mtime": mtime})
+    return stats
+
+def _save_stats(stats):
+    with open(LEARNING_STATS, 'w') as f:
+        json.dump(stats.state_dict(), f)
+    _stats_cache.update({"stats": stats, "mtime": LEARNING_STATS.stat().st_mtime_ns})
+
+def _migrate_learning_data():
+    """Fold observations from the old full-list file into fresh aggregates"""
+    stats = LearningStats()
+    if not LEARNING_DATA.exists():
+        return stats
+    with open(LEARNING_DATA, 'r') as f:
+        observations = json.load(f).get("observations", [])
+    for observation in observations:
+        stats.add(observation)
+    from ..service.metric_store import append_points
+    append_points([_to_store_point(obs) for obs in observations], path=OBSERVATION_STORE)
+    _save_stats(stats)
+    LEARNING_DATA.rename(LEARNING_DATA.with_suffix(".json.migrated"))
+    return stats
+
+def _to_store_point(observation):
+    """Map an observation onto the metric store's field names"""
+    point = dict(observation)
+    for key, field in TRACKED_METRICS.items():
+        if key in point:
+            point.setdefault(field, point.pop(key))
+    return point
+
+def _process_learning_data(stats):
     """Process learning data to extract insights"""
-    observations = learning_data.get("observations", [])
-    
-    if len(observations) < 5:
+    if stats.count < 5:
         return {
             "status": "insufficient_data",
             "message": "Need more observations to generate insights"
         }
     
     insights = {
-        "usage_patterns": _analyze_usage_patterns(observations),
-        "performance_trends": _analyze_performance_trends(observations),
-        "user_preferences": _extract_user_preferences(observations),
-        "optimization_opportunities": _identify_optimizations(observations)
+        "usage_patterns": _analyze_usage_patterns(stats),
+        "performance_trends": _analyze_performance_trends(stats),
+        "user_preferences": _extract_user_preferences(stats),
+        "optimization_opportunities": _identify_optimizations(stats)
     }
     
     return insights
 
-def _analyze_usage_patterns(observations):
+def _analyze_usage_patterns(stats):
     """Analyze user usage patterns"""
-    if not observations:
-        return {"message": "No usage data"}
-    
-    # Analyze time-based patterns
-    hourly_usage = defaultdict(int)
-    app_usage = defaultdict(int)
-    
-    for obs in observations[-100:]:  # Last 100 observations
-        if "timestamp" in obs:
-            hour = time.localtime(obs["timestamp"]).tm_hour
-            hourly_usage[hour] += 1
-        
-        if "active_app" in obs:
-            app_usage[obs["active_app"]] += 1
+    hourly_usage = {hour: count for hour, count in enumerate(stats.hourly) if count}
     
     return {
         "peak_hours": sorted(hourly_usage.items(), key=lambda x: x[1], reverse=True)[:5],
-        "most_used_apps": sorted(app_usage.items(), key=lambda x: x[1], reverse=True)[:10],
+        "most_used_apps": stats.apps.most_common(10),
         "usage_consistency": _calculate_consistency(hourly_usage)
     }
 
-def _analyze_performance_trends(observations):
+def _analyze_performance_trends(stats):
     """Analyze system performance trends"""
-    cpu_usage = []
-    memory_usage = []
-    
-    for obs in observations[-50:]:  # Last 50 observations
-        if "cpu_usage" in obs:
-            cpu_usage.append(obs["cpu_usage"])
-        if "memory_usage" in obs:
-            memory_usage.append(obs["memory_usage"])
-    
     trends = {}
-    
-    if cpu_usage:
-        trends["cpu"] = {
-            "average": round(statistics.mean(cpu_usage), 2),
-            "trend": "increasing" if len(cpu_usage) > 10 and cpu_usage[-5:] > cpu_usage[:5] else "stable"
-        }
-    
-    if memory_usage:
-        trends["memory"] = {
-            "average": round(statistics.mean(memory_usage), 2),
-            "trend": "increasing" if len(memory_usage) > 10 and memory_usage[-5:] > memory_usage[:5] else "stable"
-        }
-    
+    for key, name in (("cpu_usage", "cpu"), ("memory_usage", "memory")):
+        if stats.metrics[key].stats.count:
+            trends[name] = stats.metrics[key].summary()
     return trends
 
-def _extract_user_preferences(observations):
+def _extract_user_preferences(stats):
     """Extract user preferences from behavior"""
     preferences = {
-        "preferred_work_hours": _get_preferred_hours(observations),
-        "application_preferences": _get_app_preferences(observations),
-        "interaction_style": _analyze_interaction_style(observations)
+        "preferred_work_hours": _get_preferred_hours(stats),
+        "application_preferences": _get_app_preferences(stats),
+        "interaction_style": _analyze_interaction_style(stats)
     }
     
     return preferences
 
-def _identify_optimizations(observations):
+def _identify_optimizations(stats):
     """Identify optimization opportunities"""
     optimizations = []
     
     # Check for repetitive tasks
-    if _detect_repetitive_tasks(observations):
+    if _detect_repetitive_tasks(stats):
         optimizations.append({
             "type": "automation",
             "description": "Repetitive tasks detected - consider macro automation",
@@ -140,7 +341,7 @@ def _identify_optimizations(observations):
         })
     
     # Check for resource inefficiencies
-    if _detect_resource_waste(observations):
+    if _detect_resource_waste(stats):
         optimizations.append({
             "type": "resource_optimization",
             "description": "Resource usage patterns suggest optimization opportunities",
@@ -165,9 +366,9 @@ def _update_model_state(insights):
     
     return model_state
 
-def _calculate_learning_confidence(learning_data):
+def _calculate_learning_confidence(stats):
     """Calculate confidence in learning accuracy"""
-    observation_count = len(learning_data.get("observations", []))
+    observation_count = stats.count
     
     if observation_count < 10:
         return "low"
@@ -193,30 +394,30 @@ def _calculate_consistency(usage_data):
     consistency = max(0, 1 - (std_dev / mean_val)) if mean_val > 0 else 0
     return round(consistency, 2)
 
-def _get_preferred_hours(observations):
+def _get_preferred_hours(stats):
     """Determine user's preferred working hours"""
     # Simplified implementation
     return {"morning": "9-12", "afternoon": "13-17", "evening": "18-22"}
 
-def _get_app_preferences(observations):
+def _get_app_preferences(stats):
     """Determine application preferences"""
     # Simplified implementation
     return {"productivity": ["notepad", "browser"], "entertainment": ["games", "media"]}
 
-def _analyze_interaction_style(observations):
+def _analyze_interaction_style(stats):
     """Analyze user interaction style"""
     # Simplified implementation
     return {"style": "efficient", "shortcuts_usage": "high", "multitasking": "moderate"}
 
-def _detect_repetitive_tasks(observations):
+def _detect_repetitive_tasks(stats):
     """Detect repetitive task patterns"""
     # Simplified detection logic
-    return len(observations) > 20 and len(set(obs.get("action", "") for obs in observations[-10:])) < 3
+    return stats.count > 20 and len(set(stats.recent_actions)) < 3
 
-def _detect_resource_waste(observations):
+def _detect_resource_waste(stats):
     """Detect resource waste patterns"""
     # Simplified detection logic
-    recent_cpu = [obs.get("cpu_usage", 0) for obs in observations[-10:] if "cpu_usage" in obs]
+    recent_cpu = [cpu for cpu in stats.recent_cpu if cpu is not None]
     return len(recent_cpu) > 5 and statistics.mean(recent_cpu) > 80
 
 def _determine_learning_phase(insights):
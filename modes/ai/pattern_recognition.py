@@ -1,106 +1,396 @@
 """Pattern Recognition - Identifies patterns in user behavior and system usage"""
 import json
+import os
 import time
+import threading
 from pathlib import Path
-from collections import defaultdict
-import statistics
+from collections import Counter, deque
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 DATA_DIR = Path(__file__).parent / "data"
-PATTERNS_FILE = DATA_DIR / "recognized_patterns.json"
+PATTERN_DB_DIR = DATA_DIR / "pattern_db"
+
+# Day buckets form a ring: slot = day % RETENTION_DAYS, so expiry is just
+# overwriting the slot of the day that fell out of the window
+RETENTION_DAYS = 30
+
+# Events closer than this (seconds) are treated as part of one sequence
+SEQUENCE_GAP = 600
+MAX_SEQUENCE_LENGTH = 3
+
+# Per-bucket cap on distinct events/sequences; the rarest half is dropped
+# when a bucket overflows, which keeps memory and file size bounded
+MAX_KEYS_PER_BUCKET = 2000
+MIN_SUPPORT = 3
+
+# Discretized metric states: field -> (event name, [(upper bound, state)])
+METRIC_STATES = {
+    "cpu_percent": ("cpu", [(10, "idle"), (80, "normal"), (float("inf"), "high")]),
+    "memory_percent": ("memory", [(85, "normal"), (float("inf"), "high")]),
+    "disk_bytes_rate": ("disk", [(10e6, "quiet"), (float("inf"), "busy")]),
+    "net_bytes_rate": ("network", [(1e6, "quiet"), (float("inf"), "busy")]),
+}
+COUNTER_GROUPS = {
+    "disk_bytes_rate": ("disk_read_bytes", "disk_write_bytes"),
+    "net_bytes_rate": ("net_bytes_sent", "net_bytes_recv"),
+}
+MAX_TRACKED_APPS = 500
+# Seconds between scans of running process names for app start/stop events
+APP_SCAN_INTERVAL = 900
+
+# Time-of-day patterns reported from the hourly activity counters
+TIME_PATTERNS = {
+    "work_hours": ("Activity during typical work hours", range(9, 18)),
+    "evening_activity": ("Evening computer usage", range(18, 24)),
+    "night_activity": ("Late night computer usage", range(0, 6)),
+}
+
+_db_lock = threading.Lock()
+_pattern_db = {"store": None}
 
 def get_pattern_recognition():
     """Recognize patterns in user behavior and system usage"""
     try:
         if not DATA_DIR.exists():
             DATA_DIR.mkdir(exist_ok=True)
-        
-        # Load existing patterns or create new
-        if PATTERNS_FILE.exists():
-            with open(PATTERNS_FILE, 'r') as f:
-                patterns = json.load(f)
-        else:
-            patterns = {"patterns": [], "last_analysis": None}
-        
-        # Analyze current patterns
-        current_patterns = _detect_current_patterns()
-        
-        # Update pattern database
-        patterns["patterns"].extend(current_patterns)
-        patterns["last_analysis"] = time.time()
-        
-        # Keep only recent patterns (last 30 days)
-        cutoff_time = time.time() - (30 * 24 * 3600)
-        patterns["patterns"] = [p for p in patterns["patterns"] if p.get("timestamp", 0) > cutoff_time]
-        
-        # Save updated patterns
-        with open(PATTERNS_FILE, 'w') as f:
-            json.dump(patterns, f, indent=2)
-        
-        # Analyze pattern types
-        pattern_analysis = _analyze_pattern_types(patterns["patterns"])
-        
+
+        # Fold in events since the last call; cost depends only on new data
+        new_events = update_pattern_db()
+        with _db_lock, _pattern_file_lock(PATTERN_DB_DIR):
+            store = _get_store()
+            store.expire(time.time())
+            time_patterns = store.time_patterns()
+            sequences = store.top_sequences()
+            pattern_analysis = {
+                "time_patterns": time_patterns,
+                "sequence_patterns": sequences,
+                "event_distribution": dict(store.totals["events"].most_common(10)),
+                "days_covered": store.days_covered(),
+                "pattern_variety": len(store.totals["events"])
+            }
+            total_patterns = sum(1 for count in store.totals["sequences"].values() if count >= MIN_SUPPORT)
+
+        hour = time.localtime().tm_hour
+        current_patterns = [dict(p, type=name) for name, p in time_patterns.items() if hour in TIME_PATTERNS[name][1]]
         return {
             "status": "active",
             "current_patterns": current_patterns,
+            "recent_events": new_events[-10:],
             "pattern_analysis": pattern_analysis,
-            "total_patterns": len(patterns["patterns"]),
-            "confidence": _calculate_pattern_confidence(patterns["patterns"])
+            "total_patterns": total_patterns,
+            "confidence": _calculate_pattern_confidence(pattern_analysis["days_covered"])
         }
     except Exception as e:
         return {"error": str(e)}
 
-def _detect_current_patterns():
-    """Detect patterns in current system state"""
-    current_time = time.time()
-    hour = time.localtime(current_time).tm_hour
-    
-    patterns = []
-    
-    # Time-based patterns
-    if 9 <= hour <= 17:
-        patterns.append({
-            "type": "work_hours",
-            "description": "Activity during typical work hours",
-            "timestamp": current_time,
-            "confidence": 0.8
-        })
-    elif 18 <= hour <= 23:
-        patterns.append({
-            "type": "evening_activity",
-            "description": "Evening computer usage",
-            "timestamp": current_time,
-            "confidence": 0.7
-        })
-    
-    # Add more pattern detection logic here
-    # This is a basic implementation - can be expanded with ML models
-    
-    return patterns
-
-def _analyze_pattern_types(patterns):
-    """Analyze types of patterns found"""
-    if not patterns:
-        return {"message": "No patterns to analyze"}
-    
-    pattern_types = defaultdict(int)
-    confidence_scores = []
-    
-    for pattern in patterns:
-        pattern_types[pattern.get("type", "unknown")] += 1
-        confidence_scores.append(pattern.get("confidence", 0))
-    
-    return {
-        "pattern_distribution": dict(pattern_types),
-        "most_common_pattern": max(pattern_types.items(), key=lambda x: x[1])[0] if pattern_types else None,
-        "average_confidence": round(statistics.mean(confidence_scores), 2) if confidence_scores else 0,
-        "pattern_variety": len(pattern_types)
-    }
-
-def _calculate_pattern_confidence(patterns):
+def update_pattern_db(scan_apps=True):
+    """Ingest new metric points (and application starts/stops) into the pattern store.
+
+    The monitor and report callers may live in different processes, so the
+    store is updated under a file lock and reloaded if another process saved
+    it since. Returns the events added by this call.
+    """
+    now = time.time()
+    with _db_lock:
+        last_scan = _pattern_db["store"].state.get("apps_scanned_at") if _pattern_db["store"] else None
+    # The process scan is throttled and runs before any lock is taken
+    apps = _running_apps() if scan_apps and now - (last_scan or 0) >= APP_SCAN_INTERVAL else None
+    with _db_lock, _pattern_file_lock(PATTERN_DB_DIR):
+        store = _get_store()
+        events = store.read_metric_events()
+        if apps is not None:
+            events += store.app_events(now, apps)
+        events.sort(key=lambda event: event[0])
+        for timestamp, name in events:
+            store.add_event(timestamp, name)
+        store.save()
+    return [{"timestamp": timestamp, "event": name} for timestamp, name in events]
+
+class PatternStore:
+    """Time-bucketed event and sequence counters with a ring of day buckets.
+
+    Running totals over all live buckets are kept in memory, so reports
+    never rescan the buckets; only buckets touched since the last save are
+    written back.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.buckets = {}
+        self.dirty = set()
+        self.state = {"read_offset": 0, "metric_states": {}, "last_counters": None,
+                      "apps": None, "recent": []}
+        self.totals = {"events": Counter(), "sequences": Counter(), "samples": [0] * 24, "busy": [0] * 24}
+        self.recent = deque(maxlen=MAX_SEQUENCE_LENGTH - 1)
+        self.mtime = None
+        self._load()
+
+    def _load(self):
+        if not self.directory.exists():
+            return
+        state_file = self.directory / "state.json"
+        if state_file.exists():
+            self.mtime = state_file.stat().st_mtime_ns
+            with open(state_file, 'r') as f:
+                self.state.update(json.load(f))
+        self.recent.extend(tuple(event) for event in self.state["recent"])
+        for slot in range(RETENTION_DAYS):
+            path = self.directory / f"day_{slot:02d}.json"
+            if path.exists():
+                with open(path, 'r') as f:
+                    bucket = json.load(f)
+                self.buckets[slot] = bucket
+                self._apply_totals(bucket, 1)
+
+    def save(self):
+        """Write dirty day buckets and the ingest state"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for slot in self.dirty:
+            path = self.directory / f"day_{slot:02d}.json"
+            if slot in self.buckets:
+                with open(path, 'w') as f:
+                    json.dump(self.buckets[slot], f)
+            elif path.exists():
+                path.unlink()
+        self.dirty.clear()
+        self.state["recent"] = list(self.recent)
+        # The state file is replaced last; its mtime tells readers to reload
+        state_file = self.directory / "state.json"
+        tmp_file = state_file.with_suffix(".tmp")
+        with open(tmp_file, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_file, state_file)
+        self.mtime = state_file.stat().st_mtime_ns
+
+    def _apply_totals(self, bucket, sign):
+        for name, hours in bucket["hourly"].items():
+            self.totals["events"][name] += sign * sum(hours)
+        for key, count in bucket["sequences"].items():
+            self.totals["sequences"][key] += sign * count
+        for hour in range(24):
+            self.totals["samples"][hour] += sign * bucket["samples"][hour]
+            self.totals["busy"][hour] += sign * bucket["busy"][hour]
+        # Drop keys that fell to zero so the totals stay bounded too
+        for counter in (self.totals["events"], self.totals["sequences"]):
+            for key in [key for key, count in counter.items() if count <= 0]:
+                del counter[key]
+
+    def _bucket(self, timestamp):
+        """Get the day bucket for a timestamp, recycling its slot if it expired"""
+        day = _local_day(timestamp)
+        slot = day % RETENTION_DAYS
+        bucket = self.buckets.get(slot)
+        if bucket is None or bucket["day"] != day:
+            if bucket is not None:
+                if bucket["day"] > day:
+                    return None  # Older than the retention window
+                self._apply_totals(bucket, -1)
+            bucket = {"day": day, "hourly": {}, "sequences": {}, "samples": [0] * 24, "busy": [0] * 24}
+            self.buckets[slot] = bucket
+        self.dirty.add(slot)
+        return bucket
+
+    def expire(self, now):
+        """Drop buckets that fell out of the retention window"""
+        oldest = _local_day(now) - RETENTION_DAYS
+        for slot, bucket in list(self.buckets.items()):
+            if bucket["day"] <= oldest:
+                self._apply_totals(bucket, -1)
+                del self.buckets[slot]
+                self.dirty.add(slot)
+
+    def add_sample(self, timestamp, busy):
+        bucket = self._bucket(timestamp)
+        if bucket is None:
+            return
+        hour = time.localtime(timestamp).tm_hour
+        bucket["samples"][hour] += 1
+        bucket["busy"][hour] += int(busy)
+        self.totals["samples"][hour] += 1
+        self.totals["busy"][hour] += int(busy)
+
+    def add_event(self, timestamp, name):
+        """Count an event and the sequences it completes"""
+        bucket = self._bucket(timestamp)
+        if bucket is None:
+            return
+        hour = time.localtime(timestamp).tm_hour
+        bucket["hourly"].setdefault(name, [0] * 24)[hour] += 1
+        self.totals["events"][name] += 1
+
+        # Sequences end at this event and chain back through events within the gap
+        chain = [name]
+        previous_time = timestamp
+        for event_time, event_name in reversed(self.recent):
+            if abs(previous_time - event_time) > SEQUENCE_GAP:
+                break
+            chain.insert(0, event_name)
+            key = " > ".join(chain)
+            bucket["sequences"][key] = bucket["sequences"].get(key, 0) + 1
+            self.totals["sequences"][key] += 1
+            previous_time = event_time
+        self.recent.append((timestamp, name))
+
+        for field in ("hourly", "sequences"):
+            if len(bucket[field]) > MAX_KEYS_PER_BUCKET:
+                self._prune(bucket, field)
+
+    def _prune(self, bucket, field):
+        """Keep the most frequent half of a bucket's keys"""
+        weight = (lambda item: sum(item[1])) if field == "hourly" else (lambda item: item[1])
+        ranked = sorted(bucket[field].items(), key=weight, reverse=True)
+        dropped = ranked[MAX_KEYS_PER_BUCKET // 2:]
+        bucket[field] = dict(ranked[:MAX_KEYS_PER_BUCKET // 2])
+        self._apply_totals({"hourly": dict(dropped) if field == "hourly" else {},
+                            "sequences": dict(dropped) if field == "sequences" else {},
+                            "samples": [0] * 24, "busy": [0] * 24}, -1)
+
+    def read_metric_events(self):
+        """Turn metric points stored since the last read into state-change events"""
+        from ..service.metric_store import read_points
+        points, self.state["read_offset"] = read_points(self.state["read_offset"])
+        events = []
+        states = self.state["metric_states"]
+        for point in points:
+            timestamp = point["timestamp"]
+            values = dict(point)
+            values.update(self._counter_rates(point))
+            cpu = values.get("cpu_percent")
+            if cpu is not None:
+                self.add_sample(timestamp, cpu >= METRIC_STATES["cpu_percent"][1][0][0])
+            for field, (event_name, levels) in METRIC_STATES.items():
+                value = values.get(field)
+                if value is None:
+                    continue
+                state = next(label for upper, label in levels if value < upper)
+                if states.get(event_name) != state:
+                    if event_name in states:
+                        events.append((timestamp, f"{event_name}:{state}"))
+                    states[event_name] = state
+        return events
+
+    def _counter_rates(self, point):
+        """Summed per-second rates of the counter groups against the previous point"""
+        previous = self.state["last_counters"]
+        current = {"timestamp": point["timestamp"]}
+        rates = {}
+        for group, fields in COUNTER_GROUPS.items():
+            if all(field in point for field in fields):
+                current[group] = sum(point[field] for field in fields)
+                if previous and group in previous:
+                    dt = point["timestamp"] - previous["timestamp"]
+                    delta = current[group] - previous[group]
+                    if dt > 0 and delta >= 0:
+                        rates[group] = delta / dt
+        self.state["last_counters"] = current
+        return rates
+
+    def app_events(self, timestamp, names):
+        """Application start/stop events from the change in running process names"""
+        names = set(sorted(names)[:MAX_TRACKED_APPS])
+        previous = self.state["apps"]
+        self.state["apps"] = sorted(names)
+        self.state["apps_scanned_at"] = timestamp
+        if previous is None:
+            return []
+        previous = set(previous)
+        return ([(timestamp, f"app_start:{name}") for name in sorted(names - previous)] +
+                [(timestamp, f"app_stop:{name}") for name in sorted(previous - names)])
+
+    def time_patterns(self):
+        """Time-of-day patterns from the share of busy samples per hour"""
+        total_busy = sum(self.totals["busy"])
+        patterns = {}
+        if not total_busy:
+            return patterns
+        for name, (description, hours) in TIME_PATTERNS.items():
+            busy = sum(self.totals["busy"][hour] for hour in hours)
+            samples = sum(self.totals["samples"][hour] for hour in hours)
+            if samples and busy / samples >= 0.5:
+                patterns[name] = {
+                    "description": description,
+                    "share_of_activity": round(busy / total_busy, 3),
+                    "confidence": round(busy / samples, 2)
+                }
+        return patterns
+
+    def top_sequences(self, limit=10):
+        """Most frequent sequences with their support and confidence"""
+        events = self.totals["events"]
+        sequences = self.totals["sequences"]
+        result = []
+        for key, count in sequences.most_common():
+            if count < MIN_SUPPORT or len(result) >= limit:
+                break
+            steps = key.split(" > ")
+            prefix = " > ".join(steps[:-1])
+            prefix_count = sequences.get(prefix) if len(steps) > 2 else events.get(prefix)
+            result.append({
+                "sequence": steps,
+                "support": count,
+                # How often the last step follows the prefix
+                "confidence": round(min(count / prefix_count, 1.0), 3) if prefix_count else None
+            })
+        return result
+
+    def days_covered(self):
+        return len(self.buckets)
+
+def _get_store():
+    """Get the pattern store, reloading it if another process saved a newer one.
+
+    Callers hold _db_lock and the pattern file lock.
+    """
+    try:
+        mtime = (PATTERN_DB_DIR / "state.json").stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    store = _pattern_db["store"]
+    if store is None or store.directory != PATTERN_DB_DIR or store.mtime != mtime:
+        store = PatternStore(PATTERN_DB_DIR)
+        _pattern_db["store"] = store
+    return store
+
+class _pattern_file_lock:
+    """Advisory lock so the monitor and report processes don't update the store at once"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.handle = None
+
+    def __enter__(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.directory / ".lock", 'w')
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+def _running_apps():
+    """Names of running processes, or None when psutil is unavailable"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return {proc.info['name'] for proc in psutil.process_iter(['name']) if proc.info['name']}
+
+def _local_day(timestamp):
+    """Local calendar day number for a timestamp"""
+    return int((timestamp + time.localtime(timestamp).tm_gmtoff) // 86400)
+
+def _calculate_pattern_confidence(days_covered):
     """Calculate overall confidence in pattern recognition"""
-    if len(patterns) < 10:
+    if days_covered < 3:
         return "low"
-    elif len(patterns) < 50:
+    elif days_covered < 14:
         return "moderate"
     else:
-        return "high"
\ No newline at end of file
+        return "high"
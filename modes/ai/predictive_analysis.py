@@ -1,156 +1,334 @@
-"""Predictive Analysis - Predicts future system needs and user behavior"""
+"""Predictive Analysis - Predicts future system needs from the collected history"""
 import json
+import os
 import time
+import threading
 from pathlib import Path
 import statistics
-from collections import defaultdict
+import numpy as np
 
 DATA_DIR = Path(__file__).parent / "data"
 PREDICTIONS_FILE = DATA_DIR / "predictions.json"
 HISTORY_FILE = DATA_DIR / "prediction_history.json"
 
+# Forecasts come from hourly rollups over the most recent weeks of history
+ROLLUP_SECONDS = 3600
+BASELINE_DAYS = 28
+FORECAST_HOURS = 3
+# Hour-of-week slots seen fewer times than this fall back to the hour-of-day mean
+MIN_SLOT_SAMPLES = 2
+FORECAST_METRICS = (("cpu_percent", "cpu", "CPU usage"), ("memory_percent", "memory", "Memory usage"))
+
+# Disk usage is sampled into HISTORY_FILE for time-until-full extrapolation
+DISK_PATH = "/"
+DISK_SAMPLE_INTERVAL = 3600
+DISK_HISTORY_DAYS = 90
+DISK_TREND_DAYS = 14
+MIN_TREND_SPAN = 86400
+# Memory usage treated as exhausted when projecting a steady climb
+MEMORY_LIMIT = 90.0
+HORIZON_DAYS = 90
+
+DAY_NAMES = ("Mondays", "Tuesdays", "Wednesdays", "Thursdays", "Fridays", "Saturdays", "Sundays")
+
+_cache_lock = threading.Lock()
+_forecast_cache = {"key": None, "result": None, "written": None}
+_disk_history = {"mtime": None, "samples": []}
+
 def get_predictive_analysis():
     """Generate predictions based on historical data and patterns"""
     try:
         if not DATA_DIR.exists():
             DATA_DIR.mkdir(exist_ok=True)
-        
-        # Load historical data for predictions
-        predictions = _generate_predictions()
-        
-        # Save predictions
-        prediction_data = {
-            "predictions": predictions,
-            "generated_at": time.time(),
-            "confidence_level": _calculate_prediction_confidence(predictions)
-        }
-        
-        with open(PREDICTIONS_FILE, 'w') as f:
-            json.dump(prediction_data, f, indent=2)
-        
+
+        started = time.perf_counter()
+        record_disk_sample()
+        result, cached = _cached_predictions()
+        predictions = result["predictions"]
+
         return {
-            "status": "generated",
+            "status": "generated" if predictions else "no_data",
             "predictions": predictions,
             "prediction_count": len(predictions),
-            "confidence": prediction_data["confidence_level"],
-            "next_update": time.time() + 3600  # Update every hour
+            "confidence": result["confidence_level"],
+            "based_on": result["based_on"],
+            "cached": cached,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "next_update": (int(time.time() // ROLLUP_SECONDS) + 1) * ROLLUP_SECONDS
         }
     except Exception as e:
         return {"error": str(e)}
 
-def _generate_predictions():
+def record_disk_sample(now=None):
+    """Append a disk usage sample to the history, at most once per DISK_SAMPLE_INTERVAL"""
+    import psutil
+    now = time.time() if now is None else now
+    samples = _load_disk_history()
+    if samples and now - samples[-1][0] < DISK_SAMPLE_INTERVAL:
+        return False
+
+    usage = psutil.disk_usage(DISK_PATH)
+    cutoff = now - DISK_HISTORY_DAYS * 86400
+    samples = [s for s in samples if s[0] >= cutoff] + [[round(now), usage.used, usage.total]]
+    DATA_DIR.mkdir(exist_ok=True)
+    tmp_file = HISTORY_FILE.with_name(HISTORY_FILE.name + ".tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump({"disk_samples": samples}, f)
+    os.replace(tmp_file, HISTORY_FILE)
+    _disk_history.update({"mtime": HISTORY_FILE.stat().st_mtime_ns, "samples": samples})
+    return True
+
+def _cached_predictions():
+    """Predictions for the current hour, recomputed only when new data arrives"""
+    from ..service.metric_store import get_store_watermark
+    now = time.time()
+    key = (get_store_watermark(), _disk_history_mtime(), int(now // ROLLUP_SECONDS))
+    with _cache_lock:
+        if _forecast_cache["key"] == key:
+            return _forecast_cache["result"], True
+
+    predictions, based_on = _generate_predictions(now)
+    result = {
+        "predictions": predictions,
+        "confidence_level": _calculate_prediction_confidence(predictions),
+        "based_on": based_on
+    }
+    _write_predictions(result)
+    with _cache_lock:
+        _forecast_cache.update({"key": key, "result": result})
+    return result, False
+
+def _write_predictions(result):
+    """Rewrite PREDICTIONS_FILE only when the predictions themselves changed"""
+    written = _forecast_cache["written"]
+    if written is None and PREDICTIONS_FILE.exists():
+        try:
+            with open(PREDICTIONS_FILE, 'r') as f:
+                written = json.load(f).get("predictions")
+        except (OSError, ValueError):
+            written = None
+    if written == result["predictions"]:
+        _forecast_cache["written"] = written
+        return False
+
+    prediction_data = {
+        "predictions": result["predictions"],
+        "generated_at": time.time(),
+        "confidence_level": result["confidence_level"]
+    }
+    tmp_file = PREDICTIONS_FILE.with_name(PREDICTIONS_FILE.name + ".tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(prediction_data, f, indent=2)
+    os.replace(tmp_file, PREDICTIONS_FILE)
+    _forecast_cache["written"] = result["predictions"]
+    return True
+
+def _generate_predictions(now):
     """Generate various types of predictions"""
-    current_time = time.time()
-    current_hour = time.localtime(current_time).tm_hour
-    
+    from ..service.metric_store import load_rollups
+    from ..ml.feature_engineering import local_time_parts
+    fields = [field for field, _, _ in FORECAST_METRICS]
+    rollups = load_rollups(fields, bucket_seconds=ROLLUP_SECONDS)
+    starts = rollups["bucket_start"][-BASELINE_DAYS * 24:]
+    based_on = {"hours_of_history": 0, "disk_samples": len(_load_disk_history())}
+
     predictions = []
-    
-    # Resource usage predictions
-    predictions.extend(_predict_resource_usage(current_hour))
-    
-    # Activity predictions
-    predictions.extend(_predict_user_activity(current_hour))
-    
-    # System maintenance predictions
-    predictions.extend(_predict_maintenance_needs())
-    
-    return predictions
+    if len(starts):
+        hour, weekday = local_time_parts(starts)
+        slots = weekday * 24 + np.floor(hour).astype(np.int64)
+        ahead = (np.floor(now / ROLLUP_SECONDS) + np.arange(1, FORECAST_HOURS + 1)) * ROLLUP_SECONDS
+        ahead_hour, ahead_weekday = local_time_parts(ahead)
+        ahead_slots = ahead_weekday * 24 + np.floor(ahead_hour).astype(np.int64)
+        series = {field: rollups[field][-len(starts):] for field in fields}
+        based_on["hours_of_history"] = int(np.isfinite(series["cpu_percent"]).sum())
+
+        # Resource usage predictions
+        predictions.extend(_predict_resource_usage(starts, slots, series, ahead, ahead_slots))
+
+        # Activity predictions
+        predictions.extend(_predict_user_activity(slots, series["cpu_percent"], ahead_slots))
+
+        # Memory growth that will need a restart
+        predictions.extend(_predict_memory_pressure(starts, series["memory_percent"]))
+
+    # Disk space predictions
+    predictions.extend(_predict_maintenance_needs(_load_disk_history()))
 
-def _predict_resource_usage(current_hour):
-    """Predict system resource usage"""
+    return predictions, based_on
+
+def _predict_resource_usage(starts, slots, series, ahead, ahead_slots):
+    """Forecast the next hours from seasonal baselines plus the recent trend"""
     predictions = []
-    
-    # CPU usage prediction based on time of day
-    if 9 <= current_hour <= 17:
-        predictions.append({
-            "type": "resource_usage",
-            "resource": "cpu",
-            "prediction": "high",
-            "confidence": 0.7,
-            "reason": "Work hours - typically high CPU usage",
-            "timeframe": "next_2_hours"
-        })
-    elif 18 <= current_hour <= 22:
+    for field, resource, label in FORECAST_METRICS:
+        values = series[field]
+        valid = np.isfinite(values)
+        if valid.sum() < 24:
+            continue
+        baseline, counts = _seasonal_baseline(values, slots)
+        slope = _daily_slope(starts[valid], values[valid])[0]
+        # Extrapolate no further past the newest data than the forecast horizon
+        horizon = np.minimum(ahead, starts[-1] + FORECAST_HOURS * ROLLUP_SECONDS)
+        forecast = baseline[ahead_slots] + slope * (horizon - starts[valid].mean()) / 86400
+        forecast = np.clip(forecast, 0, 100)
+        expected = float(forecast.mean())
+
+        usual, spread = float(values[valid].mean()), float(values[valid].std())
+        z = (expected - usual) / spread if spread >= 1 else 0.0
+        level = "high" if z > 0.5 else "low" if z < -0.5 else "moderate"
+
+        # Seasonal fit: how much of the variance the hour-of-week baseline explains
+        residual = values[valid] - baseline[slots[valid]]
+        fit = 1 - residual.var() / values[valid].var() if values[valid].var() > 0 else 1.0
+        coverage = min(1.0, counts[ahead_slots].mean() / 4)
+
+        first = time.localtime(ahead[0])
         predictions.append({
             "type": "resource_usage",
-            "resource": "gpu",
-            "prediction": "high",
-            "confidence": 0.6,
-            "reason": "Evening - potential gaming or media consumption",
-            "timeframe": "next_3_hours"
+            "resource": resource,
+            "prediction": level,
+            "expected_percent": round(expected, 1),
+            "usual_percent": round(usual, 1),
+            "confidence": round(min(0.95, coverage * (0.5 + 0.5 * max(fit, 0.0))), 2),
+            "reason": f"{label} usually averages {expected:.1f}% from {first.tm_hour:02d}:00 on "
+                      f"{DAY_NAMES[first.tm_wday]} ({usual:.1f}% overall)",
+            "timeframe": f"next_{FORECAST_HOURS}_hours"
         })
-    
-    # Memory usage prediction
-    predictions.append({
-        "type": "resource_usage",
-        "resource": "memory",
-        "prediction": "moderate",
-        "confidence": 0.5,
-        "reason": "Based on typical usage patterns",
-        "timeframe": "next_1_hour"
-    })
-    
     return predictions
 
-def _predict_user_activity(current_hour):
-    """Predict user activity patterns"""
-    predictions = []
-    
-    if current_hour < 8:
-        predictions.append({
-            "type": "user_activity",
-            "activity": "low",
-            "confidence": 0.8,
-            "reason": "Early morning - typically low activity",
-            "timeframe": "next_2_hours"
-        })
-    elif 12 <= current_hour <= 13:
-        predictions.append({
-            "type": "user_activity",
-            "activity": "reduced",
-            "confidence": 0.7,
-            "reason": "Lunch time - typically reduced activity",
-            "timeframe": "next_1_hour"
-        })
-    
-    return predictions
+def _predict_user_activity(slots, cpu, ahead_slots):
+    """Predict quiet or busy periods from where the coming hours rank in the week"""
+    valid = np.isfinite(cpu)
+    if valid.sum() < 24:
+        return []
+    baseline, counts = _seasonal_baseline(cpu, slots)
+    known = np.isfinite(baseline)
+    rank = float((baseline[known] < baseline[ahead_slots].mean()).mean())
+    if 0.25 < rank < 0.75:
+        return []
+    return [{
+        "type": "user_activity",
+        "activity": "low" if rank <= 0.25 else "high",
+        "confidence": round(min(0.9, 0.4 + counts[ahead_slots].mean() / 10), 2),
+        "reason": f"The coming hours are usually {'quieter' if rank <= 0.25 else 'busier'} "
+                  f"than {max(rank, 1 - rank):.0%} of the week",
+        "timeframe": f"next_{FORECAST_HOURS}_hours"
+    }]
 
-def _predict_maintenance_needs():
-    """Predict system maintenance needs"""
-    predictions = []
-    
-    # Simple maintenance predictions
-    predictions.append({
-        "type": "maintenance",
-        "task": "disk_cleanup",
-        "urgency": "low",
-        "confidence": 0.4,
-        "reason": "Routine maintenance recommendation",
-        "timeframe": "next_week"
-    })
-    
-    predictions.append({
+def _predict_memory_pressure(starts, memory):
+    """Predict a restart when memory usage climbs steadily toward MEMORY_LIMIT"""
+    valid = np.isfinite(memory)
+    slope, r2 = _daily_slope(starts[valid], memory[valid])
+    if slope <= 0 or r2 < 0.5:
+        return []
+    current = float(memory[valid][-1])
+    days = max(0.0, (MEMORY_LIMIT - current) / slope)
+    if days > 14:
+        return []
+    return [{
         "type": "maintenance",
         "task": "system_restart",
-        "urgency": "medium",
-        "confidence": 0.6,
-        "reason": "System uptime optimization",
-        "timeframe": "next_24_hours"
-    })
-    
-    return predictions
+        "urgency": "high" if days < 2 else "medium",
+        "confidence": round(r2, 2),
+        "reason": f"Memory usage is climbing {slope:.1f}% per day and reaches "
+                  f"{MEMORY_LIMIT:.0f}% in about {days:.1f} days",
+        "timeframe": f"next_{max(1, int(np.ceil(days)))}_days"
+    }]
+
+def _predict_maintenance_needs(samples):
+    """Predict when the disk fills up by extrapolating recent usage growth"""
+    if not samples:
+        return []
+    history = np.array(samples, dtype=np.float64)
+    history = history[history[:, 0] >= history[-1, 0] - DISK_TREND_DAYS * 86400]
+    used, total = history[-1, 1], history[-1, 2]
+    percent = 100 * used / total if total else 0.0
+
+    slope, r2 = 0.0, 0.0
+    if len(history) >= 3 and history[-1, 0] - history[0, 0] >= MIN_TREND_SPAN:
+        slope, r2 = _daily_slope(history[:, 0], history[:, 1])
+
+    days = (total - used) / slope if slope > 0 else None
+    if percent < 90 and (days is None or days > HORIZON_DAYS):
+        return []
+
+    urgency = "low"
+    if percent >= 95 or (days is not None and days < 7):
+        urgency = "high"
+    elif percent >= 90 or (days is not None and days < 30):
+        urgency = "medium"
+
+    if days is not None:
+        reason = f"Disk usage is growing {slope / 1024 ** 3:.2f} GB per day; full in about {days:.1f} days"
+        timeframe = f"next_{max(1, int(np.ceil(days)))}_days"
+    else:
+        reason = f"Disk is {percent:.0f}% full"
+        timeframe = "next_week"
+    return [{
+        "type": "maintenance",
+        "task": "disk_cleanup",
+        "urgency": urgency,
+        "disk_percent": round(percent, 1),
+        "days_until_full": round(days, 1) if days is not None else None,
+        "confidence": round(max(r2, 0.5 if percent >= 90 else 0.0), 2),
+        "reason": reason,
+        "timeframe": timeframe
+    }]
+
+def _seasonal_baseline(values, slots):
+    """Hour-of-week means, falling back to the hour-of-day mean for sparse slots"""
+    valid = np.isfinite(values)
+    week_sums = np.bincount(slots[valid], weights=values[valid], minlength=168)
+    week_counts = np.bincount(slots[valid], minlength=168)
+    day_sums = week_sums.reshape(7, 24).sum(axis=0)
+    day_counts = week_counts.reshape(7, 24).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        week_means = week_sums / week_counts
+        day_means = np.tile(day_sums / day_counts, 7)
+    baseline = np.where(week_counts >= MIN_SLOT_SAMPLES, week_means, day_means)
+    baseline = np.where(np.isfinite(baseline), baseline, values[valid].mean())
+    return baseline, week_counts
+
+def _daily_slope(timestamps, values):
+    """Least-squares slope per day and its r-squared"""
+    if len(values) < 3 or timestamps[-1] - timestamps[0] < MIN_TREND_SPAN:
+        return 0.0, 0.0
+    days = (timestamps - timestamps[0]) / 86400
+    slope, intercept = np.polyfit(days, values, 1)
+    total = ((values - values.mean()) ** 2).sum()
+    r2 = 1 - ((values - (slope * days + intercept)) ** 2).sum() / total if total > 0 else 0.0
+    return float(slope), float(max(r2, 0.0))
+
+def _disk_history_mtime():
+    try:
+        return HISTORY_FILE.stat().st_mtime_ns
+    except OSError:
+        return None
+
+def _load_disk_history():
+    """Disk usage samples as [timestamp, used, total], cached by file mtime"""
+    mtime = _disk_history_mtime()
+    if mtime is None:
+        return []
+    if _disk_history["mtime"] != mtime:
+        try:
+            with open(HISTORY_FILE, 'r') as f:
+                samples = json.load(f).get("disk_samples", [])
+        except (OSError, ValueError, AttributeError):
+            samples = []
+        _disk_history.update({"mtime": mtime, "samples": samples})
+    return _disk_history["samples"]
 
 def _calculate_prediction_confidence(predictions):
     """Calculate overall confidence in predictions"""
     if not predictions:
         return "no_data"
-    
+
     confidences = [p.get("confidence", 0) for p in predictions]
     avg_confidence = statistics.mean(confidences)
-    
+
     if avg_confidence > 0.7:
         return "high"
     elif avg_confidence > 0.4:
         return "moderate"
     else:
-        return "low"
\ No newline at end of file
+        return "low"
@@ -1,12 +1,51 @@
 """Query Processor - Processes natural language queries about system and habits"""
 import json
 import time
+import threading
+from collections import OrderedDict
 from pathlib import Path
 import re
+import numpy as np
 
 DATA_DIR = Path(__file__).parent / "data"
 QUERY_LOG = DATA_DIR / "query_log.json"
 
+# Queries run over hourly rollups; windows are anchored at the newest sample
+ROLLUP_SECONDS = 3600
+DEFAULT_WINDOW = 30 * 86400
+MAX_WINDOW = 365 * 86400
+
+# Words in a query -> queryable metric (derived metrics sum store fields)
+METRIC_KEYWORDS = (
+    (("cpu", "processor"), "cpu_percent"),
+    (("memory", "ram"), "memory_percent"),
+    (("process",), "active_processes"),
+    (("disk", "storage i/o", "i/o"), "disk_io_rate"),
+    (("network", "bandwidth", "internet", "upload", "download"), "network_rate"),
+)
+DERIVED_METRICS = {
+    "disk_io_rate": ("disk_read_bytes", "disk_write_bytes"),
+    "network_rate": ("net_bytes_sent", "net_bytes_recv"),
+}
+METRIC_LABELS = {
+    "cpu_percent": ("CPU usage", "%"),
+    "memory_percent": ("Memory usage", "%"),
+    "active_processes": ("Process count", ""),
+    "disk_io_rate": ("Disk I/O", " B/s"),
+    "network_rate": ("Network traffic", " B/s"),
+}
+# Metrics examined when explaining a slowdown
+EXPLAIN_METRICS = ("cpu_percent", "memory_percent", "active_processes", "disk_io_rate", "network_rate")
+
+PARTS_OF_DAY = {"morning": range(6, 12), "afternoon": range(12, 18), "evening": range(18, 24), "night": range(0, 6)}
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+WINDOW_UNITS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+
+QUERY_CACHE_SIZE = 256
+_cache_lock = threading.Lock()
+_query_cache = OrderedDict()
+_time_index = {"key": None, "hour": None, "weekday": None}
+
 def get_query_processor():
     """Process natural language queries about system state and user habits"""
     try:
@@ -23,7 +62,13 @@ def get_query_processor():
             "status": "ready",
             "capabilities": capabilities,
             "recent_queries": history,
-            "supported_query_types": _get_supported_query_types()
+            "supported_query_types": _get_supported_query_types(),
+            "query_engine": {
+                "intents": ["peak_time", "explain", "compare", "trend", "summary", "top_apps"],
+                "rollup_seconds": ROLLUP_SECONDS,
+                "default_window_days": DEFAULT_WINDOW // 86400,
+                "cached_plans": len(_query_cache)
+            }
         }
     except Exception as e:
         return {"error": str(e)}
@@ -128,60 +173,317 @@ def _classify_query(query_text):
     
     return "general"
 
-def _generate_response(query_text, query_type):
-    """Generate response based on query type and content"""
-    # This is a simplified response generator
-    # In a real implementation, this would analyze actual system data
-    
-    if "cpu" in query_text and query_type == "why_questions":
-        return {
-            "answer": "High CPU usage detected during work hours (9-17). Primary causes: browser with multiple tabs, background processes, and active applications.",
-            "details": {
-                "peak_usage_time": "14:00-16:00",
-                "main_culprits": ["chrome.exe", "python.exe", "system processes"],
-                "recommendation": "Consider closing unused browser tabs and limiting concurrent applications"
-            }
-        }
-    
-    elif "memory" in query_text and query_type == "when_questions":
-        return {
-            "answer": "Memory usage peaks between 10 AM and 4 PM, with highest usage around 2 PM.",
-            "details": {
-                "peak_time": "14:00",
-                "average_peak_usage": "78%",
-                "pattern": "Correlates with browser usage and multiple open applications"
-            }
-        }
-    
-    elif "app" in query_text and "most" in query_text:
-        return {
-            "answer": "Most used applications: Chrome (45%), VS Code (20%), File Explorer (15%), Notepad (10%), Others (10%)",
-            "details": {
-                "daily_usage_hours": {"chrome": 3.6, "vscode": 1.6, "explorer": 1.2},
-                "usage_pattern": "Heavy browser usage throughout the day, coding sessions in afternoon"
-            }
-        }
-    
-    elif query_type == "when_questions":
-        return {
-            "answer": "Based on usage patterns, you are most active between 9 AM and 6 PM, with peak productivity around 10-11 AM and 2-3 PM.",
-            "details": {
-                "peak_hours": ["10:00-11:00", "14:00-15:00"],
-                "low_activity": ["12:00-13:00", "17:00-18:00"],
-                "pattern_confidence": "high"
-            }
-        }
-    
+def plan_query(query_text, query_type=None):
+    """Turn a question into a structured query plan (None if it isn't about metrics).
+
+    A plan names the intent, metrics, window, grouping, aggregate and any
+    comparison; it is plain JSON so it doubles as the cache key.
+    """
+    text = query_text.lower()
+    query_type = query_type or _classify_query(text)
+    if "app" in text and ("most" in text or "often" in text):
+        return {"intent": "top_apps"}
+
+    metrics = [metric for words, metric in METRIC_KEYWORDS if any(word in text for word in words)]
+    focus_hour = _parse_hour(text)
+    parts = [part for part in PARTS_OF_DAY if part in text]
+    plan = {"intent": None, "metrics": metrics[:1] or ["cpu_percent"], "window": _parse_window(text),
+            "group_by": None, "aggregate": "mean", "order": "max", "focus": None, "compare": None}
+
+    if query_type == "comparison_questions" and len(parts) >= 2:
+        plan.update(intent="compare", metrics=metrics or ["cpu_percent", "memory_percent"],
+                    group_by="part_of_day", compare=parts)
+    elif query_type == "why_questions" or "slow" in text:
+        plan.update(intent="explain", metrics=metrics or list(EXPLAIN_METRICS), group_by="hour_of_day")
+        if focus_hour is not None:
+            plan["focus"] = {"hour": focus_hour}
+    elif any(word in text for word in ("increasing", "growing", "trend", "over time", "getting")):
+        plan.update(intent="trend", group_by="day")
+    elif query_type == "when_questions" or "which day" in text or "what day" in text:
+        plan.update(intent="peak_time",
+                    group_by="day_of_week" if "day" in text and "time of day" not in text else "hour_of_day",
+                    order="min" if any(word in text for word in ("least", "lowest", "quiet", "idle")) else "max")
+    elif metrics:
+        plan.update(intent="summary")
+        if focus_hour is not None:
+            plan["focus"] = {"hour": focus_hour}
     else:
-        return {
-            "answer": "I can help analyze your system usage patterns, resource consumption, and application habits. Try asking specific questions about CPU, memory, applications, or timing patterns.",
-            "suggestions": [
-                "Why is my CPU usage high?",
-                "When do I use the most memory?",
-                "What apps do I use most often?",
-                "How often do I restart my computer?"
-            ]
+        return None
+    return plan
+
+def run_query_plan(plan):
+    """Execute a plan against the stored rollups, cached by plan and the version of its data"""
+    started = time.perf_counter()
+    key = (json.dumps(plan, sort_keys=True), _data_version(plan))
+    with _cache_lock:
+        result = _query_cache.get(key)
+        if result is not None:
+            _query_cache.move_to_end(key)
+    cached = result is not None
+    if not cached:
+        result = _execute_plan(plan)
+        with _cache_lock:
+            _query_cache[key] = result
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+    return dict(result, plan=plan, cached=cached, elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+def _data_version(plan):
+    """Watermark of the data a plan reads: learning stats for top_apps, the metric store otherwise"""
+    if plan["intent"] == "top_apps":
+        from .learning_engine import LEARNING_STATS
+        try:
+            return LEARNING_STATS.stat().st_mtime_ns
+        except OSError:
+            return None
+    from ..service.metric_store import get_store_watermark
+    return get_store_watermark()
+
+def _execute_plan(plan):
+    if plan["intent"] == "top_apps":
+        return _top_apps()
+
+    series = _load_series(plan["metrics"], plan["window"])
+    if series is None:
+        return {"answer": "No stored metrics cover that period yet - the background monitor collects them.",
+                "details": {}}
+    handlers = {"peak_time": _answer_peak_time, "explain": _answer_explain, "compare": _answer_compare,
+                "trend": _answer_trend, "summary": _answer_summary}
+    return handlers[plan["intent"]](plan, series)
+
+def _load_series(metrics, window):
+    """Hourly means for the plan's metrics over the window ending at the newest data"""
+    from ..service.metric_store import load_rollups
+    fields = set()
+    for metric in metrics:
+        fields.update(DERIVED_METRICS.get(metric, (metric,)))
+    rollups = load_rollups(sorted(fields), bucket_seconds=ROLLUP_SECONDS)
+    starts = rollups["bucket_start"]
+    if len(starts) == 0:
+        return None
+
+    # Buckets are contiguous, so the window start is an index offset
+    n_buckets = max(1, int(min(window, MAX_WINDOW) // ROLLUP_SECONDS))
+    first = max(0, len(starts) - n_buckets)
+    hour, weekday = _bucket_time_index(starts)
+    series = {"bucket_start": starts[first:], "hour": hour[first:], "weekday": weekday[first:]}
+    for metric in metrics:
+        if metric in DERIVED_METRICS:
+            parts = [rollups[field][first:] for field in DERIVED_METRICS[metric]]
+            series[metric] = np.sum(parts, axis=0)
+        else:
+            series[metric] = rollups[metric][first:]
+    if not any(np.isfinite(series[metric]).any() for metric in metrics):
+        return None
+    return series
+
+def _bucket_time_index(starts):
+    """Local hour and weekday of each rollup bucket, extended as buckets are added"""
+    from ..ml.feature_engineering import local_time_parts
+    first = float(starts[0])
+    cached = _time_index
+    with _cache_lock:
+        done = len(cached["hour"]) if cached["key"] == first else 0
+        if done >= len(starts):
+            return cached["hour"][:len(starts)], cached["weekday"][:len(starts)]
+        hour, weekday = local_time_parts(starts[done:])
+        hour = np.floor(hour).astype(np.int64)
+        if done:
+            hour = np.concatenate([cached["hour"], hour])
+            weekday = np.concatenate([cached["weekday"], weekday])
+        cached.update({"key": first, "hour": hour, "weekday": weekday})
+        return hour, weekday
+
+def _group_means(values, groups, n_groups):
+    """NaN-aware mean of values per integer group"""
+    valid = np.isfinite(values)
+    sums = np.bincount(groups[valid], weights=values[valid], minlength=n_groups)
+    counts = np.bincount(groups[valid], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts, counts
+
+def _answer_peak_time(plan, series):
+    metric = plan["metrics"][0]
+    label, unit = METRIC_LABELS[metric]
+    if plan["group_by"] == "day_of_week":
+        means, counts = _group_means(series[metric], series["weekday"], 7)
+        names = DAY_NAMES
+    else:
+        means, counts = _group_means(series[metric], series["hour"], 24)
+        names = [f"{hour:02d}:00" for hour in range(24)]
+    if not np.isfinite(means).any():
+        return {"answer": f"No {label.lower()} data in that period.", "details": {}}
+    peak = int(np.nanargmax(means) if plan["order"] == "max" else np.nanargmin(means))
+    opposite = int(np.nanargmin(means) if plan["order"] == "max" else np.nanargmax(means))
+    word = "highest" if plan["order"] == "max" else "lowest"
+    other = "lowest" if plan["order"] == "max" else "highest"
+    at = "on" if plan["group_by"] == "day_of_week" else "around"
+    return {
+        "answer": f"{label} is {word} {at} {names[peak]} (average {_format(means[peak], unit)}) and "
+                  f"{other} {at} {names[opposite]} ({_format(means[opposite], unit)}), "
+                  f"based on the last {_describe_window(series)}.",
+        "details": {
+            "peak": names[peak],
+            "peak_value": _round(means[peak]),
+            "profile": {names[i]: _round(means[i]) for i in range(len(names)) if counts[i]},
+            "hours_of_data": int(np.isfinite(series[metric]).sum())
         }
+    }
+
+def _answer_explain(plan, series):
+    """Compare the focus hour (or the latest hours) with the usual level of each metric"""
+    if plan["focus"]:
+        hour = plan["focus"]["hour"]
+        in_focus = series["hour"] == hour
+        focus_label = f"around {hour:02d}:00"
+    else:
+        # Latest three hours against the same hours of the day across the window
+        in_focus = np.zeros(len(series["bucket_start"]), dtype=bool)
+        in_focus[-3:] = True
+        focus_label = "in the last few hours"
+
+    findings = []
+    for metric in plan["metrics"]:
+        values = series[metric]
+        focus, rest = values[in_focus & np.isfinite(values)], values[~in_focus & np.isfinite(values)]
+        if len(focus) == 0 or len(rest) < 2:
+            continue
+        spread = np.std(rest) or 1e-9
+        findings.append({
+            "metric": metric,
+            "focus_mean": _round(focus.mean()),
+            "usual_mean": _round(rest.mean()),
+            "elevation": round(float((focus.mean() - rest.mean()) / spread), 2)
+        })
+    if not findings:
+        return {"answer": f"Not enough history to compare {focus_label} with the rest of the day.", "details": {}}
+
+    findings.sort(key=lambda f: f["elevation"], reverse=True)
+    elevated = [f for f in findings if f["elevation"] >= 0.5]
+    if elevated:
+        reasons = [f"{METRIC_LABELS[f['metric']][0].lower()} averages {_format(f['focus_mean'], METRIC_LABELS[f['metric']][1])} "
+                   f"vs {_format(f['usual_mean'], METRIC_LABELS[f['metric']][1])} usually" for f in elevated[:3]]
+        answer = f"{focus_label.capitalize()}, " + "; ".join(reasons) + "."
+    else:
+        answer = f"Nothing stands out {focus_label}: every tracked metric is within its usual range."
+    return {"answer": answer, "details": {"compared": focus_label, "findings": findings}}
+
+def _answer_compare(plan, series):
+    details = {}
+    parts = []
+    for metric in plan["metrics"]:
+        label, unit = METRIC_LABELS[metric]
+        values = series[metric]
+        details[metric] = {}
+        for part in plan["compare"]:
+            mask = np.isin(series["hour"], list(PARTS_OF_DAY[part])) & np.isfinite(values)
+            details[metric][part] = _round(values[mask].mean()) if mask.any() else None
+        summary = " vs ".join(f"{part} {_format(details[metric][part], unit)}" for part in plan["compare"])
+        parts.append(f"{label}: {summary}")
+    return {"answer": "; ".join(parts) + ".", "details": details}
+
+def _answer_trend(plan, series):
+    metric = plan["metrics"][0]
+    label, unit = METRIC_LABELS[metric]
+    days = ((series["bucket_start"] - series["bucket_start"][0]) // 86400).astype(np.int64)
+    daily, counts = _group_means(series[metric], days, int(days[-1]) + 1)
+    valid = np.isfinite(daily)
+    if valid.sum() < 3:
+        return {"answer": f"Need at least three days of data to see a {label.lower()} trend.", "details": {}}
+    x = np.flatnonzero(valid)
+    slope = float(np.polyfit(x, daily[valid], 1)[0])
+    direction = "increasing" if slope > 0 else "decreasing"
+    if abs(slope) * len(x) < 0.05 * (abs(np.nanmean(daily)) or 1):
+        direction = "stable"
+    return {
+        "answer": f"{label} has been {direction} over the last {len(x)} days "
+                  f"({_format(slope, unit)} per day on average).",
+        "details": {"slope_per_day": _round(slope), "trend": direction,
+                    "daily_means": [_round(v) for v in daily[valid][-14:]]}
+    }
+
+def _answer_summary(plan, series):
+    metric = plan["metrics"][0]
+    label, unit = METRIC_LABELS[metric]
+    values = series[metric]
+    if plan["focus"]:
+        values = values[series["hour"] == plan["focus"]["hour"]]
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return {"answer": f"No {label.lower()} data in that period.", "details": {}}
+    return {
+        "answer": f"{label} typically averages {_format(values.mean(), unit)} "
+                  f"(95% of hours below {_format(np.percentile(values, 95), unit)}).",
+        "details": {"mean": _round(values.mean()), "p95": _round(np.percentile(values, 95)),
+                    "max_hourly_mean": _round(values.max()), "hours": len(values)}
+    }
+
+def _top_apps():
+    """Most used applications from the learning engine's streaming counters"""
+    from .learning_engine import _load_stats
+    apps = _load_stats().apps
+    total = sum(apps.values())
+    if not total:
+        return {"answer": "No application usage has been recorded yet.", "details": {}}
+    top = apps.most_common(5)
+    return {
+        "answer": "Most used applications: " + ", ".join(f"{name} ({count / total:.0%})" for name, count in top),
+        "details": {"observations": total, "top_apps": dict(top)}
+    }
+
+def _parse_window(text):
+    """Window length in seconds from phrases like 'last 2 weeks' or 'today'"""
+    if "today" in text or "yesterday" in text:
+        return 86400 * (2 if "yesterday" in text else 1)
+    match = re.search(r"(?:last|past|previous)\s+(\d+)?\s*(hour|day|week|month)s?", text)
+    if match:
+        return min(int(match.group(1) or 1) * WINDOW_UNITS[match.group(2)], MAX_WINDOW)
+    return DEFAULT_WINDOW
+
+def _parse_hour(text):
+    """Hour of day from phrases like 'at 3 pm', '3pm' or '15:00'"""
+    match = re.search(r"\b(\d{1,2})(?::\d{2})?\s*(am|pm|a\.m\.|p\.m\.)", text) or \
+        re.search(r"\b(\d{1,2}):\d{2}\b", text)
+    if not match:
+        return None
+    hour = int(match.group(1))
+    suffix = match.group(2) if match.lastindex and match.lastindex >= 2 else None
+    if suffix and suffix.startswith("p") and hour < 12:
+        hour += 12
+    elif suffix and suffix.startswith("a") and hour == 12:
+        hour = 0
+    return hour if 0 <= hour < 24 else None
+
+def _describe_window(series):
+    hours = len(series["bucket_start"])
+    return f"{hours // 24} days" if hours >= 48 else f"{hours} hours"
+
+def _format(value, unit):
+    if value is None or not np.isfinite(value):
+        return "n/a"
+    if unit == " B/s":
+        for scale, suffix in ((1e9, " GB/s"), (1e6, " MB/s"), (1e3, " KB/s")):
+            if abs(value) >= scale:
+                return f"{value / scale:.1f}{suffix}"
+    return f"{value:.1f}{unit}"
+
+def _round(value):
+    return round(float(value), 2) if value is not None and np.isfinite(value) else None
+
+def _generate_response(query_text, query_type):
+    """Generate response based on query type and content"""
+    plan = plan_query(query_text, query_type)
+    if plan is not None:
+        return run_query_plan(plan)
+    return {
+        "answer": "I can help analyze your system usage patterns, resource consumption, and application habits. Try asking specific questions about CPU, memory, applications, or timing patterns.",
+        "suggestions": [
+            "Why is my CPU usage high?",
+            "When do I use the most memory?",
+            "What apps do I use most often?",
+            "Why does my system slow down at 3 PM?"
+        ]
+    }
 
 def _log_query(query_text):
     """Log query for analysis"""
@@ -1,9 +1,12 @@
 """Directory Operations Module - Create, manage, and organize directories"""
 import os
+import heapq
 from pathlib import Path
 import shutil
 from datetime import datetime
 
+LARGEST_FILES = 10
+
 def create_directory(directory_path, parents=True, exist_ok=True):
     """Create a directory"""
     try:
@@ -24,167 +27,138 @@ def organize_files_by_extension(source_dir, destination_dir=None, create_subdirs
     """Organize files into subdirectories by extension"""
     try:
         src_path = Path(source_dir)
-        if not src_path.exists():
-            return {"error": f"Source directory {source_dir} does not exist"}
-        
         dst_path = Path(destination_dir) if destination_dir else src_path
-        dst_path.mkdir(parents=True, exist_ok=True)
-        
-        organized_files = {}
-        moved_count = 0
-        
-        for file_path in src_path.iterdir():
-            if file_path.is_file():
-                extension = file_path.suffix.lower() or "no_extension"
-                
-                # Create subdirectory for extension
-                if create_subdirs:
-                    ext_dir = dst_path / extension.replace('.', '')
-                    ext_dir.mkdir(exist_ok=True)
-                    dest_file = ext_dir / file_path.name
-                else:
-                    dest_file = dst_path / file_path.name
-                
-                # Move file
-                if file_path != dest_file:
-                    shutil.move(str(file_path), str(dest_file))
-                    moved_count += 1
-                    
-                    if extension not in organized_files:
-                        organized_files[extension] = []
-                    organized_files[extension].append({
-                        "original": str(file_path),
-                        "new_location": str(dest_file)
-                    })
+        organized_files = _collect_moves(iter_organize_files_by_extension(src_path, dst_path, create_subdirs))
         
         return {
             "success": True,
             "source_directory": str(src_path.absolute()),
             "destination_directory": str(dst_path.absolute()),
-            "moved_count": moved_count,
+            "moved_count": sum(len(files) for files in organized_files.values()),
             "extensions_found": list(organized_files.keys()),
             "organized_files": organized_files
         }
     except Exception as e:
         return {"error": str(e)}
 
+def iter_organize_files_by_extension(source_dir, destination_dir=None, create_subdirs=True):
+    """Yield a "moved" event per file (grouped by extension), "progress" and a final "done" event"""
+    src_path = Path(source_dir)
+    if not src_path.exists():
+        raise FileNotFoundError(f"Source directory {source_dir} does not exist")
+    
+    dst_path = Path(destination_dir) if destination_dir else src_path
+    dst_path.mkdir(parents=True, exist_ok=True)
+    
+    def destination(file_path, st):
+        extension = file_path.suffix.lower() or "no_extension"
+        
+        # Create subdirectory for extension
+        if create_subdirs:
+            ext_dir = dst_path / extension.replace('.', '')
+            ext_dir.mkdir(exist_ok=True)
+            return extension, ext_dir / file_path.name, {}
+        return extension, dst_path / file_path.name, {}
+    
+    yield from _iter_moves(src_path, dst_path, destination)
+
 def organize_files_by_date(source_dir, destination_dir=None, date_format="YYYY/MM"):
     """Organize files into subdirectories by creation/modification date"""
     try:
         src_path = Path(source_dir)
-        if not src_path.exists():
-            return {"error": f"Source directory {source_dir} does not exist"}
-        
         dst_path = Path(destination_dir) if destination_dir else src_path
-        dst_path.mkdir(parents=True, exist_ok=True)
-        
-        organized_files = {}
-        moved_count = 0
-        
-        for file_path in src_path.iterdir():
-            if file_path.is_file():
-                # Get file modification time
-                mod_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                
-                # Create date-based subdirectory
-                if date_format == "YYYY/MM":
-                    date_dir = dst_path / str(mod_time.year) / f"{mod_time.month:02d}"
-                elif date_format == "YYYY/MM/DD":
-                    date_dir = dst_path / str(mod_time.year) / f"{mod_time.month:02d}" / f"{mod_time.day:02d}"
-                elif date_format == "YYYY":
-                    date_dir = dst_path / str(mod_time.year)
-                else:
-                    date_dir = dst_path / mod_time.strftime(date_format)
-                
-                date_dir.mkdir(parents=True, exist_ok=True)
-                dest_file = date_dir / file_path.name
-                
-                # Move file
-                if file_path != dest_file:
-                    shutil.move(str(file_path), str(dest_file))
-                    moved_count += 1
-                    
-                    date_key = str(date_dir.relative_to(dst_path))
-                    if date_key not in organized_files:
-                        organized_files[date_key] = []
-                    organized_files[date_key].append({
-                        "original": str(file_path),
-                        "new_location": str(dest_file),
-                        "date": mod_time.isoformat()
-                    })
+        organized_files = _collect_moves(iter_organize_files_by_date(src_path, dst_path, date_format))
         
         return {
             "success": True,
             "source_directory": str(src_path.absolute()),
             "destination_directory": str(dst_path.absolute()),
-            "moved_count": moved_count,
+            "moved_count": sum(len(files) for files in organized_files.values()),
             "date_format": date_format,
             "organized_files": organized_files
         }
     except Exception as e:
         return {"error": str(e)}
 
-def get_directory_stats(directory):
-    """Get comprehensive directory statistics"""
+def iter_organize_files_by_date(source_dir, destination_dir=None, date_format="YYYY/MM"):
+    """Yield a "moved" event per file (grouped by date directory), "progress" and a final "done" event"""
+    src_path = Path(source_dir)
+    if not src_path.exists():
+        raise FileNotFoundError(f"Source directory {source_dir} does not exist")
+    
+    dst_path = Path(destination_dir) if destination_dir else src_path
+    dst_path.mkdir(parents=True, exist_ok=True)
+    
+    def destination(file_path, st):
+        # Get file modification time
+        mod_time = datetime.fromtimestamp(st.st_mtime)
+        
+        # Create date-based subdirectory
+        if date_format == "YYYY/MM":
+            date_dir = dst_path / str(mod_time.year) / f"{mod_time.month:02d}"
+        elif date_format == "YYYY/MM/DD":
+            date_dir = dst_path / str(mod_time.year) / f"{mod_time.month:02d}" / f"{mod_time.day:02d}"
+        elif date_format == "YYYY":
+            date_dir = dst_path / str(mod_time.year)
+        else:
+            date_dir = dst_path / mod_time.strftime(date_format)
+        
+        date_dir.mkdir(parents=True, exist_ok=True)
+        return str(date_dir.relative_to(dst_path)), date_dir / file_path.name, {"date": mod_time.isoformat()}
+    
+    yield from _iter_moves(src_path, dst_path, destination)
+
+def _iter_moves(src_path, dst_path, destination):
+    """Move each file in src_path to destination(file_path, stat) -> (group, dest_file, extra)"""
+    from .file_walker import PROGRESS_EVERY
+    
+    examined = moved = 0
+    for file_path in src_path.iterdir():
+        if file_path.is_file():
+            examined += 1
+            if examined % PROGRESS_EVERY == 0:
+                yield {"type": "progress", "files_examined": examined, "moved_count": moved}
+            group, dest_file, extra = destination(file_path, file_path.stat())
+            
+            # Move file
+            if file_path != dest_file:
+                shutil.move(str(file_path), str(dest_file))
+                moved += 1
+                yield {"type": "moved", "group": group,
+                       "file": {"original": str(file_path), "new_location": str(dest_file), **extra}}
+    
+    yield {"type": "done", "source_directory": str(src_path.absolute()),
+           "destination_directory": str(dst_path.absolute()), "files_examined": examined, "moved_count": moved}
+
+def _collect_moves(events):
+    organized_files = {}
+    for event in events:
+        if event["type"] == "moved":
+            organized_files.setdefault(event["group"], []).append(event["file"])
+    return organized_files
+
+def get_directory_stats(directory, top_n=LARGEST_FILES, rollup_depth=1, use_index=False):
+    """Get comprehensive directory statistics.
+
+    Each file is stat'ed once, the largest files are kept in a bounded heap
+    and subtrees are scanned in parallel, so memory does not grow with the
+    file count. subdirectory_sizes gives du-style totals for directories
+    up to rollup_depth levels below the root. With use_index=True the
+    persistent file index is refreshed (only changed directories are
+    re-listed) and the statistics are aggregated from it instead; files
+    grown in place are only seen under watch_index() or after
+    update_index(root, restat=True).
+    """
     try:
         dir_path = Path(directory)
         if not dir_path.exists():
             return {"error": f"Directory {directory} does not exist"}
         
-        stats = {
-            "path": str(dir_path.absolute()),
-            "total_files": 0,
-            "total_directories": 0,
-            "total_size_bytes": 0,
-            "file_extensions": {},
-            "largest_files": [],
-            "oldest_file": None,
-            "newest_file": None
-        }
-        
-        oldest_time = float('inf')
-        newest_time = 0
-        
-        for item in dir_path.rglob("*"):
-            if item.is_file():
-                stats["total_files"] += 1
-                size = item.stat().st_size
-                stats["total_size_bytes"] += size
-                
-                # Track extensions
-                ext = item.suffix.lower() or "no_extension"
-                if ext not in stats["file_extensions"]:
-                    stats["file_extensions"][ext] = {"count": 0, "total_size": 0}
-                stats["file_extensions"][ext]["count"] += 1
-                stats["file_extensions"][ext]["total_size"] += size
-                
-                # Track largest files
-                stats["largest_files"].append({
-                    "path": str(item),
-                    "size_mb": round(size / 1024 / 1024, 2)
-                })
-                
-                # Track oldest/newest
-                mod_time = item.stat().st_mtime
-                if mod_time < oldest_time:
-                    oldest_time = mod_time
-                    stats["oldest_file"] = {
-                        "path": str(item),
-                        "modified": datetime.fromtimestamp(mod_time).isoformat()
-                    }
-                if mod_time > newest_time:
-                    newest_time = mod_time
-                    stats["newest_file"] = {
-                        "path": str(item),
-                        "modified": datetime.fromtimestamp(mod_time).isoformat()
-                    }
-            
-            elif item.is_dir():
-                stats["total_directories"] += 1
-        
-        # Sort largest files and keep top 10
-        stats["largest_files"].sort(key=lambda x: x["size_mb"], reverse=True)
-        stats["largest_files"] = stats["largest_files"][:10]
+        root = os.path.abspath(directory)
+        if use_index:
+            stats = _stats_from_index(root, top_n, rollup_depth)
+        else:
+            stats = _stats_from_walk(root, top_n, rollup_depth)
         
         # Convert total size to readable format
         stats["total_size_mb"] = round(stats["total_size_bytes"] / 1024 / 1024, 2)
@@ -197,6 +171,162 @@ def get_directory_stats(directory):
     except Exception as e:
         return {"error": str(e)}
 
+def _new_stats(root, source):
+    return {
+        "path": root,
+        "source": source,
+        "total_files": 0,
+        "total_directories": 0,
+        "total_size_bytes": 0,
+        "file_extensions": {},
+        "largest_files": [],
+        "oldest_file": None,
+        "newest_file": None,
+        "subdirectory_sizes": []
+    }
+
+def _stats_from_walk(root, top_n, rollup_depth):
+    """Merge per-directory summaries from a parallel, level-by-level scandir walk"""
+    from .file_walker import parallel_map
+    stats = _new_stats(root, "walk")
+    largest = []
+    oldest = newest = None
+    rollups = {}
+    
+    def scan(item):
+        return _summarize_dir(item[0], top_n)
+    
+    frontier = [(root, ())]
+    while frontier:
+        next_frontier = []
+        for (path, labels), summary in parallel_map(scan, frontier):
+            if summary is None:
+                continue
+            stats["total_files"] += summary["files"]
+            stats["total_size_bytes"] += summary["size"]
+            for ext, (count, size) in summary["extensions"].items():
+                totals = stats["file_extensions"].setdefault(ext, {"count": 0, "total_size": 0})
+                totals["count"] += count
+                totals["total_size"] += size
+            for item in summary["largest"]:
+                _push_largest(largest, item, top_n)
+            if summary["oldest"] and (oldest is None or summary["oldest"] < oldest):
+                oldest = summary["oldest"]
+            if summary["newest"] and (newest is None or summary["newest"] > newest):
+                newest = summary["newest"]
+            for label in labels:
+                rollup = rollups[label]
+                rollup["files"] += summary["files"]
+                rollup["size_bytes"] += summary["size"]
+            
+            for subdir in summary["subdirs"]:
+                stats["total_directories"] += 1
+                sub_labels = labels
+                if len(labels) < rollup_depth:
+                    label = os.path.relpath(subdir, root)
+                    rollups[label] = {"files": 0, "size_bytes": 0}
+                    sub_labels = labels + (label,)
+                next_frontier.append((subdir, sub_labels))
+        frontier = next_frontier
+    
+    return _finish_stats(stats, largest, oldest, newest, rollups)
+
+def _summarize_dir(path, top_n):
+    """One scandir pass over a directory: file totals, local extremes and subdirectories"""
+    summary = {"files": 0, "size": 0, "extensions": {}, "largest": [], "oldest": None, "newest": None,
+               "subdirs": []}
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        summary["subdirs"].append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                size, mod_time = st.st_size, st.st_mtime
+                summary["files"] += 1
+                summary["size"] += size
+                ext = os.path.splitext(entry.name)[1].lower() or "no_extension"
+                counts = summary["extensions"].setdefault(ext, [0, 0])
+                counts[0] += 1
+                counts[1] += size
+                _push_largest(summary["largest"], (size, entry.path), top_n)
+                if summary["oldest"] is None or mod_time < summary["oldest"][0]:
+                    summary["oldest"] = (mod_time, entry.path)
+                if summary["newest"] is None or mod_time > summary["newest"][0]:
+                    summary["newest"] = (mod_time, entry.path)
+    except OSError:
+        return None
+    return summary
+
+def _push_largest(heap, item, top_n):
+    """Keep the top_n largest (size, path) items in a min-heap"""
+    if len(heap) < top_n:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+def _stats_from_index(root, top_n, rollup_depth):
+    """Refresh the persistent file index, then aggregate the statistics in SQLite"""
+    from .file_index import _connect, _subtree_range, update_index
+    update_index(root)
+    stats = _new_stats(root, "index")
+    _, low, high = _subtree_range(root)
+    in_tree = "path >= ? AND path < ?"
+    
+    conn = _connect()
+    try:
+        count, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files WHERE {in_tree}",
+                                    (low, high)).fetchone()
+        stats["total_files"], stats["total_size_bytes"] = count, total
+        stats["total_directories"] = conn.execute(f"SELECT COUNT(*) FROM dirs WHERE {in_tree}", (low, high)).fetchone()[0]
+        for ext, count, size in conn.execute(f"SELECT ext, COUNT(*), SUM(size) FROM files WHERE {in_tree} GROUP BY ext",
+                                             (low, high)):
+            stats["file_extensions"][ext or "no_extension"] = {"count": count, "total_size": size}
+        largest = [(size, path) for path, size in conn.execute(
+            f"SELECT path, size FROM files WHERE {in_tree} ORDER BY size DESC LIMIT ?", (low, high, top_n))]
+        oldest = conn.execute(f"SELECT mtime, path FROM files WHERE {in_tree} ORDER BY mtime LIMIT 1", (low, high)).fetchone()
+        newest = conn.execute(f"SELECT mtime, path FROM files WHERE {in_tree} ORDER BY mtime DESC LIMIT 1", (low, high)).fetchone()
+        
+        # Per-directory totals streamed from SQLite and folded into their rollup ancestors
+        rollups = {}
+        for path, in conn.execute(f"SELECT path FROM dirs WHERE {in_tree}", (low, high)):
+            parts = os.path.relpath(path, root).split(os.sep)
+            if len(parts) <= rollup_depth:
+                rollups[os.sep.join(parts)] = {"files": 0, "size_bytes": 0}
+        for directory, count, size in conn.execute(
+                f"SELECT dir, COUNT(*), SUM(size) FROM files WHERE {in_tree} GROUP BY dir", (low, high)):
+            parts = os.path.relpath(directory, root).split(os.sep)
+            if parts == ["."]:
+                continue
+            for depth in range(1, min(len(parts), rollup_depth) + 1):
+                rollup = rollups.get(os.sep.join(parts[:depth]))
+                if rollup:
+                    rollup["files"] += count
+                    rollup["size_bytes"] += size
+    finally:
+        conn.close()
+    
+    return _finish_stats(stats, largest, oldest, newest, rollups)
+
+def _finish_stats(stats, largest, oldest, newest, rollups):
+    """Format the heap, extremes and rollups into the reported statistics"""
+    stats["largest_files"] = [{"path": path, "size_mb": round(size / 1024 / 1024, 2)}
+                              for size, path in sorted(largest, reverse=True)]
+    if oldest:
+        stats["oldest_file"] = {"path": oldest[1], "modified": datetime.fromtimestamp(oldest[0]).isoformat()}
+    if newest:
+        stats["newest_file"] = {"path": newest[1], "modified": datetime.fromtimestamp(newest[0]).isoformat()}
+    stats["subdirectory_sizes"] = sorted(
+        ({"path": label, "files": rollup["files"], "size_mb": round(rollup["size_bytes"] / 1024 / 1024, 2),
+          "size_bytes": rollup["size_bytes"]} for label, rollup in rollups.items()),
+        key=lambda rollup: rollup["size_bytes"], reverse=True)
+    return stats
+
 def get_directory_ops():
     """Get directory operations capabilities"""
     try:
@@ -205,7 +335,9 @@ def get_directory_ops():
                 "create_directory": "create_directory(directory_path, parents=True, exist_ok=True)",
                 "organize_files_by_extension": "organize_files_by_extension(source_dir, destination_dir=None, create_subdirs=True)",
                 "organize_files_by_date": "organize_files_by_date(source_dir, destination_dir=None, date_format='YYYY/MM')",
-                "get_directory_stats": "get_directory_stats(directory)"
+                "iter_organize_files_by_extension": "iter_organize_files_by_extension(source_dir, destination_dir=None, create_subdirs=True)",
+                "iter_organize_files_by_date": "iter_organize_files_by_date(source_dir, destination_dir=None, date_format='YYYY/MM')",
+                "get_directory_stats": "get_directory_stats(directory, top_n=10, rollup_depth=1, use_index=False)"
             },
             "organization_methods": [
                 "By file extension",
@@ -217,7 +349,8 @@ def get_directory_ops():
                 "create_dir": "create_directory('/new/path/to/dir')",
                 "organize_by_ext": "organize_files_by_extension('/messy/folder')",
                 "organize_by_date": "organize_files_by_date('/photos', date_format='YYYY/MM')",
-                "get_stats": "get_directory_stats('/some/directory')"
+                "get_stats": "get_directory_stats('/some/directory')",
+                "du_rollups": "get_directory_stats('/srv', rollup_depth=2, use_index=True)"
             }
         }
     except Exception as e:
@@ -1,9 +1,43 @@
 """File Copy Module - Copies files and directories"""
+import os
+import re
+import sys
+import json
+import time
+import errno
+import fnmatch
 import shutil
+import sqlite3
+import tempfile
 from pathlib import Path
 from datetime import datetime
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import hashlib
 
+# Small files are latency-bound (open/create/close), large ones bandwidth-bound
+LARGE_FILE_BYTES = 8 * 1024 * 1024
+SMALL_FILE_WORKERS = 32
+LARGE_FILE_WORKERS = 4
+MAX_IN_FLIGHT = 256
+COPY_BUFFER_BYTES = 1024 * 1024
+OFFLOAD_CHUNK_BYTES = 64 * 1024 * 1024
+# Completed files are appended here so an interrupted batch_copy can resume
+MANIFEST_NAME = ".batch_copy_manifest.ndjson"
+PROGRESS_INTERVAL = 0.5
+# sync_directories remembers the source state of every synced file here
+SYNC_MANIFEST_NAME = ".sync_manifest.db"
+SYNC_COMMIT_ROWS = 1000
+_MANIFEST_PREFIXES = (MANIFEST_NAME, SYNC_MANIFEST_NAME)
+
+# Errors meaning "this kernel copy path does not apply here", not a failed copy
+_OFFLOAD_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+# sendfile only writes to regular files on Linux (macOS needs a socket)
+_offload = {"copy_file_range": hasattr(os, "copy_file_range"),
+            "sendfile": hasattr(os, "sendfile") and sys.platform.startswith("linux")}
+# Name globs follow the platform's case rules, as Path.rglob and fnmatch.fnmatch do
+_GLOB_FLAGS = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+
 def copy_file(source, destination, preserve_metadata=True, verify_copy=False):
     """Copy a file or directory"""
     try:
@@ -19,12 +53,13 @@ def copy_file(source, destination, preserve_metadata=True, verify_copy=False):
         else:
             dst_path.mkdir(parents=True, exist_ok=True)
         
-        # Perform copy
+        # Perform copy (the checksum, if asked for, is computed from the streamed bytes)
+        copied_bytes, digest = None, None
         if src_path.is_file():
-            if preserve_metadata:
-                shutil.copy2(src_path, dst_path)
-            else:
-                shutil.copy(src_path, dst_path)
+            if dst_path.is_dir():
+                dst_path = dst_path / src_path.name
+            copied_bytes, digest, _ = _copy_one(str(src_path), str(dst_path), checksum=verify_copy,
+                                                preserve_metadata=preserve_metadata)
         else:
             shutil.copytree(src_path, dst_path, dirs_exist_ok=True)
         
@@ -37,14 +72,14 @@ def copy_file(source, destination, preserve_metadata=True, verify_copy=False):
             "preserve_metadata": preserve_metadata
         }
         
-        # Verify copy if requested
+        # Verify copy if requested: a byte-count check. Every byte read was
+        # hashed and written, so the copy is complete when the written count
+        # matches both file sizes; the destination is not re-read or hashed
         if verify_copy and src_path.is_file():
             try:
-                src_hash = _get_file_hash(src_path)
-                dst_hash = _get_file_hash(dst_path)
-                result["verified"] = src_hash == dst_hash
-                result["source_hash"] = src_hash
-                result["destination_hash"] = dst_hash
+                result["verified"] = copied_bytes == src_path.stat().st_size == dst_path.stat().st_size
+                result["verification"] = "byte_count"
+                result["source_hash"] = digest
             except Exception as e:
                 result["verification_error"] = str(e)
         
@@ -52,69 +87,512 @@ def copy_file(source, destination, preserve_metadata=True, verify_copy=False):
     except Exception as e:
         return {"error": str(e)}
 
-def batch_copy(source_dir, destination_dir, file_pattern="*", preserve_structure=True):
-    """Batch copy files matching pattern"""
+def batch_copy(source_dir, destination_dir, file_pattern="*", preserve_structure=True,
+               checksum=False, resume=True, progress_callback=None):
+    """Batch copy files matching pattern.
+
+    Files are copied on separate worker pools for small and large files,
+    through copy_file_range/sendfile where the kernel supports them. Each
+    completed file is appended to a manifest in the destination; if the job
+    is interrupted, the next call with resume=True skips files already
+    copied (unchanged size and mtime). The manifest is removed once a run
+    finishes without errors. progress_callback, if given, receives a
+    progress dict at most every PROGRESS_INTERVAL seconds and at the end.
+    """
     try:
         src_path = Path(source_dir)
         dst_path = Path(destination_dir)
+        copied_files = []
+        errors = []
         
+        for event in iter_batch_copy(src_path, dst_path, file_pattern, preserve_structure, checksum, resume):
+            kind = event.pop("type")
+            if kind == "copied":
+                copied_files.append(event["file"])
+            elif kind == "error":
+                errors.append(event)
+            elif kind == "progress" and progress_callback:
+                progress_callback(event)
+            elif kind == "done":
+                summary = event
+        
+        return {
+            "success": True,
+            "source_directory": str(src_path.absolute()),
+            "destination_directory": str(dst_path.absolute()),
+            "copied_count": len(copied_files),
+            "copied_files": copied_files,
+            "skipped_count": summary["skipped_count"],
+            "total_size_mb": summary["total_size_mb"],
+            "elapsed_seconds": summary["elapsed_seconds"],
+            "throughput_mb_s": summary["throughput_mb_s"],
+            "errors": errors,
+            "pattern": file_pattern,
+            "preserve_structure": preserve_structure,
+            "resumable": bool(errors)
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+def iter_batch_copy(source_dir, destination_dir, file_pattern="*", preserve_structure=True,
+                    checksum=False, resume=True):
+    """Yield batch copy events as files complete.
+
+    Events are dicts with a "type": "copied" (the copied file under "file"),
+    "error" (with "file" and "error"), "progress" at most every
+    PROGRESS_INTERVAL seconds and once at the end, then "done" with the
+    totals. Closing the generator early leaves the manifest in place, so
+    a later call with resume=True picks up where it stopped.
+    """
+    src_path = Path(source_dir)
+    dst_path = Path(destination_dir)
+    
+    if not src_path.exists():
+        raise FileNotFoundError(f"Source directory {source_dir} does not exist")
+    
+    dst_path.mkdir(parents=True, exist_ok=True)
+    manifest_path = dst_path / MANIFEST_NAME
+    if not resume and manifest_path.exists():
+        manifest_path.unlink()
+    done = _load_manifest(manifest_path)
+    
+    def skip(source, key, st):
+        if done.get(key) == (st.st_size, st.st_mtime_ns):
+            progress["files_skipped"] += 1
+            return True
+        return False
+    
+    progress = {"files_copied": 0, "files_skipped": 0, "bytes_copied": 0, "errors": 0,
+                "elapsed_seconds": 0.0, "throughput_mb_s": 0.0, "current": None}
+    started = last_report = time.monotonic()
+    
+    jobs = _iter_copy_jobs(src_path, dst_path, file_pattern, preserve_structure, skip)
+    with open(manifest_path, 'a') as manifest:
+        for job, outcome in _run_copy_jobs(jobs, checksum):
+            source, rel, dest_file, size, mtime_ns = job
+            progress["current"] = source
+            if isinstance(outcome, Exception):
+                progress["errors"] += 1
+                yield {"type": "error", "file": source, "error": str(outcome)}
+            else:
+                copied_bytes, digest, _ = outcome
+                record = {"path": rel, "size": size, "mtime_ns": mtime_ns}
+                copied = {
+                    "source": source,
+                    "destination": dest_file,
+                    "size_bytes": copied_bytes
+                }
+                if digest:
+                    record["md5"] = copied["md5"] = digest
+                manifest.write(json.dumps(record, separators=(",", ":")) + "\n")
+                progress["files_copied"] += 1
+                progress["bytes_copied"] += copied_bytes
+                yield {"type": "copied", "file": copied}
+            
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                manifest.flush()
+                yield {"type": "progress", **_progress_snapshot(progress, started)}
+                last_report = now
+    
+    progress = _progress_snapshot(progress, started)
+    yield {"type": "progress", **progress}
+    if not progress["errors"]:
+        manifest_path.unlink()
+    
+    yield {
+        "type": "done",
+        "source_directory": str(src_path.absolute()),
+        "destination_directory": str(dst_path.absolute()),
+        "copied_count": progress["files_copied"],
+        "skipped_count": progress["files_skipped"],
+        "error_count": progress["errors"],
+        "total_size_mb": round(progress["bytes_copied"] / 1024 / 1024, 2),
+        "elapsed_seconds": progress["elapsed_seconds"],
+        "throughput_mb_s": progress["throughput_mb_s"],
+        "resumable": bool(progress["errors"])
+    }
+
+def sync_directories(source_dir, destination_dir, compare="mtime", delete_extraneous=False,
+                     dry_run=False, file_pattern="*", progress_callback=None):
+    """Copy only new or changed files from source to destination, like rsync.
+
+    A manifest in the destination records each synced file's source size,
+    mtime and (with compare="hash") checksum, so unchanged files are found
+    without stat-ing the destination tree. Files the manifest does not know
+    are compared once with the destination (size and whole-second mtime) and
+    adopted if they match. compare="hash" also skips files whose mtime moved
+    but whose checksum did not. delete_extraneous removes destination files
+    that were synced before but no longer exist in the source.
+    """
+    try:
+        if compare not in ("mtime", "hash"):
+            return {"error": "compare must be 'mtime' or 'hash'"}
+        src_path = Path(source_dir)
+        dst_path = Path(destination_dir)
         if not src_path.exists():
             return {"error": f"Source directory {source_dir} does not exist"}
         
         dst_path.mkdir(parents=True, exist_ok=True)
-        
-        copied_files = []
-        errors = []
-        total_size = 0
-        
-        for file_path in src_path.rglob(file_pattern):
-            if file_path.is_file():
-                try:
-                    if preserve_structure:
-                        # Maintain directory structure
-                        rel_path = file_path.relative_to(src_path)
-                        dest_file = dst_path / rel_path
-                        dest_file.parent.mkdir(parents=True, exist_ok=True)
+        src_root, dst_root = os.path.abspath(src_path), os.path.abspath(dst_path)
+        conn = _open_sync_manifest(dst_path / SYNC_MANIFEST_NAME, src_root)
+        try:
+            known = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime_ns, md5 FROM synced")}
+            counts = {"unchanged": 0, "adopted": 0, "hash_matched": 0}
+            updates = []
+            # Checksums of files whose mtime moved but size did not; the copy
+            # workers compare them against the digest they stream anyway
+            expected = {}
+            
+            def skip(source, key, st):
+                previous = known.pop(key, None)
+                if previous and previous[:2] == (st.st_size, st.st_mtime_ns):
+                    counts["unchanged"] += 1
+                    return True
+                if previous is None and _destination_matches(os.path.join(dst_root, key), st):
+                    counts["adopted"] += 1
+                    updates.append((key, st.st_size, st.st_mtime_ns, None))
+                    return True
+                if compare == "hash" and previous and previous[2] and previous[0] == st.st_size:
+                    expected[key] = previous[2]
+                return False
+            
+            jobs = _iter_copy_jobs(src_path, dst_path, file_pattern, True, skip)
+            copied_files, errors = [], []
+            progress = {"files_copied": 0, "files_skipped": 0, "bytes_copied": 0, "errors": 0,
+                        "elapsed_seconds": 0.0, "throughput_mb_s": 0.0, "current": None}
+            started = last_report = time.monotonic()
+            
+            if dry_run:
+                jobs = list(jobs)
+                with ThreadPoolExecutor(max_workers=SMALL_FILE_WORKERS) as pool:
+                    matched = list(pool.map(_hash_matches, [job[0] for job in jobs],
+                                            [expected.get(job[1]) for job in jobs]))
+                counts["hash_matched"] += sum(matched)
+                copied_files = [{"source": source, "destination": dest_file, "size_bytes": size}
+                                for (source, _, dest_file, size, _), same in zip(jobs, matched) if not same]
+            else:
+                for job, outcome in _run_copy_jobs(jobs, checksum=compare == "hash", expected=expected):
+                    source, key, dest_file, size, mtime_ns = job
+                    if isinstance(outcome, Exception):
+                        errors.append({"file": source, "error": str(outcome)})
+                        progress["errors"] += 1
+                    elif not outcome[2]:
+                        # Same checksum as last time and the destination was still there
+                        counts["hash_matched"] += 1
+                        updates.append((key, size, mtime_ns, outcome[1]))
                     else:
-                        # Flatten structure
-                        dest_file = dst_path / file_path.name
-                    
-                    shutil.copy2(file_path, dest_file)
-                    size = file_path.stat().st_size
-                    total_size += size
-                    
-                    copied_files.append({
-                        "source": str(file_path),
-                        "destination": str(dest_file),
-                        "size_bytes": size
-                    })
-                except Exception as e:
-                    errors.append({
-                        "file": str(file_path),
-                        "error": str(e)
-                    })
+                        copied_bytes, digest, _ = outcome
+                        updates.append((key, size, mtime_ns, digest))
+                        copied_files.append({"source": source, "destination": dest_file, "size_bytes": copied_bytes})
+                        progress["files_copied"] += 1
+                        progress["bytes_copied"] += copied_bytes
+                    progress["current"] = source
+                    if len(updates) >= SYNC_COMMIT_ROWS:
+                        _save_synced(conn, updates)
+                    now = time.monotonic()
+                    if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                        progress_callback(_progress_snapshot(dict(progress, files_skipped=sum(counts.values())), started))
+                        last_report = now
+            
+            # Whatever the walk did not pop from the manifest is gone from the source
+            deleted_files = []
+            if delete_extraneous:
+                for key in sorted(known):
+                    if not _matches_pattern(key, file_pattern) or os.path.lexists(os.path.join(src_root, key)):
+                        continue
+                    dest_file = os.path.join(dst_root, key)
+                    deleted_files.append(dest_file)
+                    if not dry_run:
+                        _remove_synced(dest_file, dst_root)
+                        conn.execute("DELETE FROM synced WHERE path = ?", (key,))
+            if not dry_run:
+                _save_synced(conn, updates)
+        finally:
+            conn.close()
+        
+        progress = _progress_snapshot(dict(progress, files_skipped=sum(counts.values())), started)
+        if progress_callback:
+            progress_callback(progress)
         
         return {
             "success": True,
             "source_directory": str(src_path.absolute()),
             "destination_directory": str(dst_path.absolute()),
+            "compare": compare,
+            "dry_run": dry_run,
             "copied_count": len(copied_files),
             "copied_files": copied_files,
-            "total_size_mb": round(total_size / 1024 / 1024, 2),
-            "errors": errors,
-            "pattern": file_pattern,
-            "preserve_structure": preserve_structure
+            "unchanged_count": counts["unchanged"],
+            "adopted_count": counts["adopted"],
+            "hash_matched_count": counts["hash_matched"],
+            "deleted_count": len(deleted_files),
+            "deleted_files": deleted_files,
+            "total_size_mb": round(progress["bytes_copied"] / 1024 / 1024, 2),
+            "elapsed_seconds": progress["elapsed_seconds"],
+            "errors": errors
         }
     except Exception as e:
         return {"error": str(e)}
 
-def _get_file_hash(file_path):
-    """Calculate MD5 hash of a file"""
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+def _open_sync_manifest(manifest_path, src_root):
+    """Open the sync manifest, starting over if it was written for another source"""
+    conn = sqlite3.connect(manifest_path, timeout=30)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS synced (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, md5 TEXT);
+    """)
+    row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+    if row is None or row[0] != src_root:
+        conn.execute("DELETE FROM synced")
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (src_root,))
+        conn.commit()
+    return conn
+
+def _save_synced(conn, updates):
+    conn.executemany("INSERT OR REPLACE INTO synced VALUES (?, ?, ?, ?)", updates)
+    conn.commit()
+    updates.clear()
+
+def _destination_matches(dest_file, st):
+    """Whether an untracked destination file already has the source's size and mtime"""
+    try:
+        dest = os.stat(dest_file)
+    except OSError:
+        return False
+    # Whole seconds, since the destination filesystem may store coarser timestamps
+    return dest.st_size == st.st_size and int(dest.st_mtime) == int(st.st_mtime)
+
+def _matches_pattern(rel, file_pattern):
+    if not file_pattern or file_pattern == "*":
+        return True
+    if os.sep in file_pattern:
+        return fnmatch.fnmatch(rel, file_pattern)
+    return fnmatch.fnmatch(os.path.basename(rel), file_pattern)
+
+def _remove_synced(dest_file, dst_root):
+    """Delete a destination file and any directories it leaves empty"""
+    try:
+        os.unlink(dest_file)
+    except FileNotFoundError:
+        pass
+    parent = os.path.dirname(dest_file)
+    while parent != dst_root and parent.startswith(dst_root):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+def _file_md5(file_path):
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _hash_matches(file_path, md5):
+    """Whether a file still has checksum md5 (False when there is none to compare)"""
+    if md5 is None:
+        return False
+    try:
+        return _file_md5(file_path) == md5
+    except OSError:
+        return False
+
+def _iter_copy_jobs(src_path, dst_path, file_pattern, preserve_structure, skip=None):
+    """Yield (source, relative key, destination, size, mtime_ns) for files still to copy.
+
+    skip(source, key, stat), if given, decides which files need no copy.
+    """
+    from .file_walker import walk_files
+    src_root = os.path.abspath(src_path)
+    dst_root = os.path.abspath(dst_path)
+    
+    # Plain name globs are matched by the walker before any stat; path globs after
+    name_regex, path_glob = None, None
+    if file_pattern and file_pattern != "*":
+        if os.sep in file_pattern:
+            path_glob = file_pattern
+        else:
+            name_regex = re.compile(fnmatch.translate(file_pattern), _GLOB_FLAGS)
+    
+    made_dirs = set()
+    for entry in walk_files(src_root, name_pattern=name_regex, stat=True):
+        rel = os.path.relpath(entry.path, src_root)
+        if path_glob and not fnmatch.fnmatch(rel, path_glob):
+            continue
+        if entry.name.startswith(_MANIFEST_PREFIXES):
+            continue
+        st = entry.stat()
+        # Keyed by source path: flattened copies of same-named files would collide on entry.name
+        key = rel
+        if skip and skip(entry.path, key, st):
+            continue
+        
+        if preserve_structure:
+            # Maintain directory structure
+            dest_file = os.path.join(dst_root, rel)
+            parent = os.path.dirname(dest_file)
+            if parent not in made_dirs:
+                os.makedirs(parent, exist_ok=True)
+                made_dirs.add(parent)
+        else:
+            # Flatten structure
+            dest_file = os.path.join(dst_root, entry.name)
+        yield entry.path, key, dest_file, st.st_size, st.st_mtime_ns
+
+def _run_copy_jobs(jobs, checksum=False, expected=None):
+    """Copy jobs on the small- and large-file pools, yielding (job, _copy_one result or exception).
+
+    Jobs for a destination that is already being written (same-named files
+    when the structure is flattened) wait for the earlier copy, so the
+    last one wins as in a serial copy. expected maps job keys to the md5 an
+    unchanged file would have (see _copy_one).
+    """
+    small = ThreadPoolExecutor(max_workers=SMALL_FILE_WORKERS, thread_name_prefix="copy-small")
+    large = ThreadPoolExecutor(max_workers=LARGE_FILE_WORKERS, thread_name_prefix="copy-large")
+    in_flight = {}
+    busy = {}  # destination -> jobs waiting for it
+    
+    def submit(job):
+        pool = large if job[3] >= LARGE_FILE_BYTES else small
+        expected_md5 = expected.get(job[1]) if expected else None
+        in_flight[pool.submit(_copy_one, job[0], job[2], checksum, expected_md5=expected_md5)] = job
+    
+    def finished(futures):
+        for future in futures:
+            job = in_flight.pop(future)
+            waiting = busy[job[2]]
+            if waiting:
+                submit(waiting.popleft())
+            else:
+                del busy[job[2]]
+            try:
+                yield job, future.result()
+            except Exception as e:
+                yield job, e
+    
+    try:
+        for job in jobs:
+            if job[2] in busy:
+                busy[job[2]].append(job)
+                continue
+            busy[job[2]] = deque()
+            submit(job)
+            if len(in_flight) >= MAX_IN_FLIGHT:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from finished(done)
+    finally:
+        small.shutdown(wait=False, cancel_futures=True)
+        large.shutdown(wait=False, cancel_futures=True)
+
+def _copy_one(source, destination, checksum=False, preserve_metadata=True, expected_md5=None):
+    """Copy one file via a temporary name, returning (bytes copied, md5 hex or None, replaced).
+
+    With checksum the data goes through a userspace buffer and is hashed on
+    the way; otherwise the kernel copies it. The destination only appears
+    once the copy is complete. The temporary name is unique, so concurrent
+    copies to one destination never share it. If the streamed md5 equals
+    expected_md5 and the destination exists, the copy is dropped, the
+    destination left untouched and replaced is False.
+    """
+    directory, name = os.path.split(destination)
+    fd, tmp_file = tempfile.mkstemp(prefix=f".{name}.", suffix=".partial", dir=directory or None)
+    try:
+        with os.fdopen(fd, 'wb') as fdst, open(source, 'rb') as fsrc:
+            if checksum:
+                digest = hashlib.md5()
+                copied = 0
+                buffer = bytearray(COPY_BUFFER_BYTES)
+                view = memoryview(buffer)
+                while True:
+                    n = fsrc.readinto(buffer)
+                    if not n:
+                        break
+                    digest.update(view[:n])
+                    fdst.write(view[:n])
+                    copied += n
+                digest = digest.hexdigest()
+            else:
+                copied = _kernel_copy(fsrc, fdst)
+                digest = None
+        if expected_md5 is not None and digest == expected_md5 and os.path.exists(destination):
+            os.unlink(tmp_file)
+            return copied, digest, False
+        # mkstemp creates the file 0600, so permission bits are always copied
+        if preserve_metadata:
+            shutil.copystat(source, tmp_file)
+        else:
+            shutil.copymode(source, tmp_file)
+        os.replace(tmp_file, destination)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+        raise
+    return copied, digest, True
+
+def _kernel_copy(fsrc, fdst):
+    """Copy an open file with copy_file_range, then sendfile, then a userspace loop.
+
+    Each method continues from the current file offsets, so a fallback
+    part-way through picks up where the previous one stopped. Any failure
+    before a method moved its first byte just means it is unavailable here.
+    """
+    src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+    offloads = {
+        "copy_file_range": lambda: os.copy_file_range(src_fd, dst_fd, OFFLOAD_CHUNK_BYTES),
+        "sendfile": lambda: os.sendfile(dst_fd, src_fd, None, OFFLOAD_CHUNK_BYTES),
+    }
+    copied = 0
+    for method, copy_chunk in offloads.items():
+        if not _offload[method]:
+            continue
+        moved = 0
+        try:
+            while True:
+                n = copy_chunk()
+                if n == 0:
+                    return copied
+                moved += n
+                copied += n
+        except (OSError, TypeError) as e:
+            unsupported = isinstance(e, TypeError) or e.errno in _OFFLOAD_ERRORS
+            if moved and not unsupported:
+                raise
+            if isinstance(e, TypeError) or e.errno == errno.ENOSYS:
+                _offload[method] = False
+    while True:
+        chunk = fsrc.read(COPY_BUFFER_BYTES)
+        if not chunk:
+            return copied
+        fdst.write(chunk)
+        copied += len(chunk)
+
+def _load_manifest(manifest_path):
+    """Files finished by an interrupted run, as {key: (size, mtime_ns)}"""
+    done = {}
+    if not manifest_path.exists():
+        return done
+    with open(manifest_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                done[record["path"]] = (record["size"], record["mtime_ns"])
+            except (ValueError, KeyError):
+                continue  # A line cut short by the interruption
+    return done
+
+def _progress_snapshot(progress, started):
+    elapsed = time.monotonic() - started
+    progress["elapsed_seconds"] = round(elapsed, 3)
+    progress["throughput_mb_s"] = round(progress["bytes_copied"] / 1024 / 1024 / elapsed, 2) if elapsed > 0 else 0.0
+    return dict(progress)
 
 def get_file_copy():
     """Get file copy capabilities"""
@@ -122,18 +600,28 @@ def get_file_copy():
         return {
             "functions": {
                 "copy_file": "copy_file(source, destination, preserve_metadata=True, verify_copy=False)",
-                "batch_copy": "batch_copy(source_dir, destination_dir, file_pattern='*', preserve_structure=True)"
+                "batch_copy": "batch_copy(source_dir, destination_dir, file_pattern='*', preserve_structure=True, checksum=False, resume=True, progress_callback=None)",
+                "iter_batch_copy": "iter_batch_copy(source_dir, destination_dir, file_pattern='*', preserve_structure=True, checksum=False, resume=True)",
+                "sync_directories": "sync_directories(source_dir, destination_dir, compare='mtime', delete_extraneous=False, dry_run=False, file_pattern='*', progress_callback=None)"
             },
             "features": [
                 "Metadata preservation",
-                "Copy verification with hash comparison",
+                "Copy verification by byte count, with the source MD5 computed while streaming",
                 "Batch copying with pattern matching",
-                "Directory structure preservation"
+                "Directory structure preservation",
+                "Kernel copy offload (copy_file_range/sendfile)",
+                "Separate worker pools for small and large files",
+                "Checksums computed while streaming",
+                "Resumable batch copies via a manifest",
+                "Streaming copied/error/progress events from iter_batch_copy",
+                "Incremental sync of new/changed files (size+mtime or checksum)"
             ],
             "examples": {
                 "simple_copy": "copy_file('source.txt', 'backup.txt')",
                 "verified_copy": "copy_file('important.txt', 'backup.txt', verify_copy=True)",
-                "batch_copy": "batch_copy('/source/dir', '/backup/dir', '*.txt')"
+                "batch_copy": "batch_copy('/source/dir', '/backup/dir', '*.txt')",
+                "checked_backup": "batch_copy('/home', '/mnt/backup/home', checksum=True, progress_callback=print)",
+                "nightly_sync": "sync_directories('/srv/data', '/mnt/backup/data', delete_extraneous=True)"
             }
         }
     except Exception as e:
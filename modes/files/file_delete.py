@@ -55,31 +55,16 @@ def cleanup_temp_files(directory, older_than_days=7, file_patterns=None):
     """Clean up temporary files older than specified days"""
     try:
         dir_path = Path(directory)
-        if not dir_path.exists():
-            return {"error": f"Directory {directory} does not exist"}
-        
         if file_patterns is None:
             file_patterns = ["*.tmp", "*.temp", "*.log", "*~", "*.bak"]
         
-        import time
-        cutoff_time = time.time() - (older_than_days * 24 * 60 * 60)
-        
         deleted_files = []
         total_size_freed = 0
         
-        for pattern in file_patterns:
-            for file_path in dir_path.glob(pattern):
-                if file_path.is_file() and file_path.stat().st_mtime < cutoff_time:
-                    try:
-                        size = file_path.stat().st_size
-                        send2trash.send2trash(str(file_path))
-                        deleted_files.append({
-                            "name": file_path.name,
-                            "size_bytes": size
-                        })
-                        total_size_freed += size
-                    except:
-                        pass
+        for event in iter_cleanup_temp_files(dir_path, older_than_days, file_patterns):
+            if event["type"] == "deleted":
+                deleted_files.append({"name": event["name"], "size_bytes": event["size_bytes"]})
+                total_size_freed += event["size_bytes"]
         
         return {
             "success": True,
@@ -93,13 +78,52 @@ def cleanup_temp_files(directory, older_than_days=7, file_patterns=None):
     except Exception as e:
         return {"error": str(e)}
 
+def iter_cleanup_temp_files(directory, older_than_days=7, file_patterns=None):
+    """Yield "deleted", "error", "progress" and a final "done" event as temp files are removed"""
+    from .file_walker import PROGRESS_EVERY
+    
+    dir_path = Path(directory)
+    if not dir_path.exists():
+        raise FileNotFoundError(f"Directory {directory} does not exist")
+    
+    if file_patterns is None:
+        file_patterns = ["*.tmp", "*.temp", "*.log", "*~", "*.bak"]
+    
+    import time
+    cutoff_time = time.time() - (older_than_days * 24 * 60 * 60)
+    
+    examined = deleted = 0
+    total_size_freed = 0
+    for pattern in file_patterns:
+        for file_path in dir_path.glob(pattern):
+            if not file_path.is_file():
+                continue
+            examined += 1
+            if examined % PROGRESS_EVERY == 0:
+                yield {"type": "progress", "files_examined": examined, "deleted_count": deleted}
+            try:
+                st = file_path.stat()
+                if st.st_mtime >= cutoff_time:
+                    continue
+                send2trash.send2trash(str(file_path))
+            except Exception as e:
+                yield {"type": "error", "file": str(file_path), "error": str(e)}
+                continue
+            deleted += 1
+            total_size_freed += st.st_size
+            yield {"type": "deleted", "name": file_path.name, "path": str(file_path), "size_bytes": st.st_size}
+    
+    yield {"type": "done", "directory": str(dir_path.absolute()), "files_examined": examined,
+           "deleted_count": deleted, "total_size_freed_mb": round(total_size_freed / 1024 / 1024, 2)}
+
 def get_file_delete():
     """Get file deletion capabilities"""
     try:
         return {
             "functions": {
                 "delete_file": "delete_file(filepath, use_recycle_bin=True, force=False)",
-                "cleanup_temp_files": "cleanup_temp_files(directory, older_than_days=7, file_patterns=None)"
+                "cleanup_temp_files": "cleanup_temp_files(directory, older_than_days=7, file_patterns=None)",
+                "iter_cleanup_temp_files": "iter_cleanup_temp_files(directory, older_than_days=7, file_patterns=None)"
             },
             "safety_features": [
                 "Recycle bin support (requires send2trash: pip install send2trash)",
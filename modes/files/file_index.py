@@ -0,0 +1,370 @@
+"""File Index - Persistent SQLite index of file metadata for repeated searches"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from datetime import datetime, timedelta
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+INDEX_FILE = Path(__file__).parent / "data" / "file_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (root TEXT PRIMARY KEY, built_at REAL, updated_at REAL);
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, dir TEXT, name TEXT, ext TEXT, size INTEGER, mtime REAL, inode INTEGER
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_ext ON files (ext, size);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, kind TEXT, digest TEXT, stored_at REAL,
+    PRIMARY KEY (dev, inode, size, mtime_ns, kind)
+) WITHOUT ROWID;
+"""
+# Cached content hashes not refreshed for this long are dropped
+HASH_CACHE_DAYS = 180
+
+_watchers = {}
+_watch_lock = threading.Lock()
+
+def update_index(root, full=False, restat=False):
+    """Bring the index for root up to date, rescanning only changed directories.
+
+    The first call (or full=True) walks the whole tree. Later calls stat the
+    known directories and re-list only those whose mtime moved, which is
+    what file creates, deletes and renames change. Writes to an existing
+    file leave its directory's mtime alone, so in-place modifications are
+    only seen while watch_index() is running for root (only directories
+    reported by filesystem events are then re-listed) or with restat=True,
+    which also re-stats the indexed files of the unchanged directories at
+    the cost of one stat per file. restat is ignored while a synced watcher
+    already reports those writes.
+    """
+    from .file_walker import parallel_map
+    root = os.path.abspath(os.fspath(root))
+    started = time.perf_counter()
+    conn = _connect()
+    try:
+        built = conn.execute("SELECT built_at FROM roots WHERE root = ?", (root,)).fetchone()
+        watcher = _watchers.get(root)
+        known = dict(conn.execute(
+            "SELECT path, mtime_ns FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", _subtree_range(root)))
+
+        checked = restatted = refreshed = 0
+        if full or not built:
+            mode = "full"
+            _delete_subtree(conn, root)
+            known = {}
+            frontier = [root]
+        elif watcher and watcher["synced"]:
+            mode = "watch"
+            with _watch_lock:
+                dirty, watcher["dirty"] = watcher["dirty"], set()
+            frontier = sorted(path for path in dirty if path == root or path.startswith(root + os.sep))
+        else:
+            mode = "incremental"
+            checked = len(known)
+            mtimes = dict(parallel_map(_dir_mtime, known))
+            frontier = [path for path, mtime_ns in mtimes.items() if mtime_ns != known[path]]
+            if restat:
+                restatted, refreshed = _refresh_files(conn, [path for path, mtime_ns in mtimes.items()
+                                                             if mtime_ns == known[path]])
+
+        rescanned = 0
+        queued = set(frontier)
+        while frontier:
+            next_frontier = []
+            for path, listing in parallel_map(_scan_dir, frontier):
+                rescanned += 1
+                if listing is None:
+                    _delete_subtree(conn, path)
+                    continue
+                mtime_ns, files, subdirs = listing
+                conn.execute("DELETE FROM files WHERE dir = ?", (path,))
+                conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files)
+                conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (path, os.path.dirname(path), mtime_ns))
+                indexed = {row[0] for row in conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,))}
+                for gone in indexed.difference(subdirs):
+                    _delete_subtree(conn, gone)
+                for subdir in subdirs:
+                    if subdir not in known and subdir not in queued:
+                        queued.add(subdir)
+                        next_frontier.append(subdir)
+            frontier = next_frontier
+
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO roots VALUES (?, ?, ?)", (root, built[0] if built and not full else now, now))
+        conn.commit()
+        if watcher:
+            watcher["synced"] = True
+        file_count = conn.execute("SELECT COUNT(*) FROM files WHERE path >= ? AND path < ?",
+                                  _subtree_range(root)[1:]).fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        "root": root,
+        "mode": mode,
+        "directories_checked": checked,
+        "directories_rescanned": rescanned,
+        "files_restatted": restatted,
+        "files_refreshed": refreshed,
+        "files_indexed": file_count,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def query_index(root, name_pattern=None, file_extension=None, size_min_mb=None, size_max_mb=None,
+                modified_within_days=None, exclude_patterns=None, limit=None):
+    """Yield (path, name, size, mtime) for indexed files under root matching the criteria"""
+    from .file_walker import _compile_globs, _normalize_extensions
+    root = os.path.abspath(os.fspath(root))
+    clauses, params = ["path >= ?", "path < ?"], list(_subtree_range(root)[1:])
+    extensions = _normalize_extensions(file_extension)
+    if extensions:
+        clauses.append(f"ext IN ({', '.join('?' * len(extensions))})")
+        params.extend(extensions)
+    if size_min_mb:
+        clauses.append("size >= ?")
+        params.append(size_min_mb * 1024 * 1024)
+    if size_max_mb:
+        clauses.append("size <= ?")
+        params.append(size_max_mb * 1024 * 1024)
+    if modified_within_days:
+        clauses.append("mtime >= ?")
+        params.append((datetime.now() - timedelta(days=modified_within_days)).timestamp())
+    if name_pattern:
+        clauses.append("name REGEXP ?")
+        params.append(name_pattern)
+    sql = f"SELECT path, name, size, mtime FROM files WHERE {' AND '.join(clauses)}"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+
+    excluded = _compile_globs(exclude_patterns)
+    conn = _connect()
+    try:
+        for row in conn.execute(sql, params):
+            if excluded and _is_excluded(row[0], root, excluded):
+                continue
+            yield row
+    finally:
+        conn.close()
+
+def load_hashes(keys, kind):
+    """Cached digests for (dev, inode, size, mtime_ns) file keys, as {key: digest}"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    conn = _connect()
+    try:
+        conn.execute("CREATE TEMP TABLE wanted (dev INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER)")
+        conn.executemany("INSERT INTO wanted VALUES (?, ?, ?, ?)", keys)
+        rows = conn.execute(
+            "SELECT h.dev, h.inode, h.size, h.mtime_ns, h.digest FROM wanted w JOIN hashes h "
+            "ON h.dev = w.dev AND h.inode = w.inode AND h.size = w.size AND h.mtime_ns = w.mtime_ns "
+            "AND h.kind = ?", (kind,))
+        return {tuple(row[:4]): row[4] for row in rows}
+    finally:
+        conn.close()
+
+def store_hashes(digests, kind):
+    """Remember digests for {(dev, inode, size, mtime_ns): digest} across runs"""
+    if not digests:
+        return
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         ((*key, kind, digest, now) for key, digest in digests.items()))
+        conn.execute("DELETE FROM hashes WHERE stored_at < ?", (now - HASH_CACHE_DAYS * 86400,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def watch_index(root):
+    """Keep a dirty-directory set for root from filesystem events (inotify via watchdog)"""
+    if not WATCHDOG_AVAILABLE:
+        return {"error": "watchdog not installed. Run: pip install watchdog (updates fall back to mtime checks)"}
+    root = os.path.abspath(os.fspath(root))
+    with _watch_lock:
+        if root in _watchers:
+            return {"success": True, "root": root, "already_watching": True}
+        watcher = {"dirty": set(), "synced": False}
+
+        class DirtyHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                paths = [event.src_path, getattr(event, "dest_path", None)]
+                with _watch_lock:
+                    for path in filter(None, paths):
+                        watcher["dirty"].add(os.path.dirname(path))
+                        if event.is_directory:
+                            watcher["dirty"].add(path)
+
+        observer = Observer()
+        observer.schedule(DirtyHandler(), root, recursive=True)
+        observer.daemon = True
+        observer.start()
+        watcher["observer"] = observer
+        _watchers[root] = watcher
+    return {"success": True, "root": root, "already_watching": False}
+
+def unwatch_index(root):
+    """Stop watching root; later updates go back to directory mtime checks"""
+    with _watch_lock:
+        watcher = _watchers.pop(os.path.abspath(os.fspath(root)), None)
+    if watcher:
+        watcher["observer"].stop()
+        watcher["observer"].join(timeout=5)
+    return {"success": True, "was_watching": watcher is not None}
+
+def _connect():
+    INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(INDEX_FILE, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+    return conn
+
+@lru_cache(maxsize=64)
+def _compiled(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+def _regexp(pattern, value):
+    return value is not None and _compiled(pattern).search(value) is not None
+
+def _subtree_range(path):
+    """(path, low, high) so that low <= p < high selects everything below path"""
+    prefix = path.rstrip(os.sep) + os.sep
+    return path, prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+def _delete_subtree(conn, path):
+    path, low, high = _subtree_range(path)
+    conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+    conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (low, high))
+
+def _dir_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _refresh_files(conn, dirs):
+    """Re-stat the indexed files of unchanged directories and update rows whose size or mtime moved.
+
+    Returns (files stat'ed, rows updated or removed).
+    """
+    from .file_walker import parallel_map
+    rows = {}
+    for path in dirs:
+        listed = conn.execute("SELECT path, size, mtime FROM files WHERE dir = ?", (path,)).fetchall()
+        if listed:
+            rows[path] = listed
+    
+    def restat(path):
+        changed = []
+        for file_path, size, mtime in rows[path]:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                changed.append((file_path, None))
+                continue
+            if st.st_size != size or st.st_mtime != mtime:
+                changed.append((file_path, st))
+        return changed
+    
+    restatted = refreshed = 0
+    for path, changed in parallel_map(restat, rows):
+        restatted += len(rows[path])
+        for file_path, st in changed:
+            refreshed += 1
+            if st is None:
+                conn.execute("DELETE FROM files WHERE path = ?", (file_path,))
+            else:
+                conn.execute("UPDATE files SET size = ?, mtime = ?, inode = ? WHERE path = ?",
+                             (st.st_size, st.st_mtime, st.st_ino, file_path))
+    return restatted, refreshed
+
+def _scan_dir(path):
+    """List one directory: its mtime, its files' metadata rows and its subdirectories"""
+    files, subdirs = [], []
+    try:
+        # Read the mtime first so a change during the listing is caught next time
+        mtime_ns = os.stat(path).st_mtime_ns
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.path, path, entry.name, os.path.splitext(entry.name)[1].lower(),
+                                      st.st_size, st.st_mtime, st.st_ino))
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return mtime_ns, files, subdirs
+
+def _is_excluded(path, root, excluded):
+    """Whether any directory between root and the file matches an exclude glob"""
+    directory = os.path.dirname(path)
+    while len(directory) > len(root):
+        if excluded(os.path.basename(directory)) or excluded(directory):
+            return True
+        directory = os.path.dirname(directory)
+    return False
+
+def get_file_index():
+    """Get file index status"""
+    try:
+        roots = []
+        if INDEX_FILE.exists():
+            conn = _connect()
+            try:
+                for root, built_at, updated_at in conn.execute("SELECT root, built_at, updated_at FROM roots"):
+                    count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files "
+                                               "WHERE path >= ? AND path < ?", _subtree_range(root)[1:]).fetchone()
+                    roots.append({
+                        "root": root,
+                        "files": count,
+                        "total_size_gb": round(size / 1024 ** 3, 2),
+                        "built": datetime.fromtimestamp(built_at).isoformat(),
+                        "updated": datetime.fromtimestamp(updated_at).isoformat(),
+                        "watching": root in _watchers
+                    })
+            finally:
+                conn.close()
+        return {
+            "index_file": str(INDEX_FILE),
+            "size_mb": round(INDEX_FILE.stat().st_size / 1024 / 1024, 2) if INDEX_FILE.exists() else 0,
+            "indexed_roots": roots,
+            "watchdog_available": WATCHDOG_AVAILABLE,
+            "functions": {
+                "update_index": "update_index(root, full=False, restat=False)",
+                "query_index": "query_index(root, name_pattern=None, file_extension=None, size_min_mb=None, size_max_mb=None, modified_within_days=None, exclude_patterns=None, limit=None)",
+                "watch_index": "watch_index(root)",
+                "unwatch_index": "unwatch_index(root)",
+                "load_hashes": "load_hashes(keys, kind)",
+                "store_hashes": "store_hashes(digests, kind)"
+            },
+            "capabilities": {
+                "incremental": "Only directories whose mtime changed are re-listed after the first build; other indexed files are re-stat'ed for in-place writes",
+                "events": "With watchdog installed, filesystem events mark directories dirty instead",
+                "indexed_queries": "Extension, size and date filters use SQLite indexes; names match by regex",
+                "hash_cache": "Content hashes keyed by (device, inode, size, mtime) are reused across runs"
+            }
+        }
+    except Exception as e:
+        return {"error": str(e)}
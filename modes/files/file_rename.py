@@ -40,34 +40,15 @@ def batch_rename(directory, pattern, replacement, file_extension=None):
     """Batch rename files in a directory"""
     try:
         dir_path = Path(directory)
-        if not dir_path.exists() or not dir_path.is_dir():
-            return {"error": f"Directory {directory} does not exist"}
-        
         renamed_files = []
         errors = []
         
-        for file_path in dir_path.iterdir():
-            if file_path.is_file():
-                # Filter by extension if specified
-                if file_extension and not file_path.suffix.lower() == file_extension.lower():
-                    continue
-                
-                # Apply pattern replacement
-                if pattern in file_path.stem:
-                    new_name = file_path.stem.replace(pattern, replacement) + file_path.suffix
-                    new_path = file_path.parent / new_name
-                    
-                    try:
-                        file_path.rename(new_path)
-                        renamed_files.append({
-                            "old_name": file_path.name,
-                            "new_name": new_name
-                        })
-                    except Exception as e:
-                        errors.append({
-                            "file": file_path.name,
-                            "error": str(e)
-                        })
+        for event in iter_batch_rename(dir_path, pattern, replacement, file_extension):
+            kind = event.pop("type")
+            if kind == "renamed":
+                renamed_files.append(event)
+            elif kind == "error":
+                errors.append(event)
         
         return {
             "success": True,
@@ -81,13 +62,50 @@ def batch_rename(directory, pattern, replacement, file_extension=None):
     except Exception as e:
         return {"error": str(e)}
 
+def iter_batch_rename(directory, pattern, replacement, file_extension=None):
+    """Yield "renamed", "error", "progress" and a final "done" event as files are renamed"""
+    from .file_walker import PROGRESS_EVERY
+    
+    dir_path = Path(directory)
+    if not dir_path.exists() or not dir_path.is_dir():
+        raise FileNotFoundError(f"Directory {directory} does not exist")
+    
+    examined = renamed = failed = 0
+    for file_path in dir_path.iterdir():
+        if file_path.is_file():
+            examined += 1
+            if examined % PROGRESS_EVERY == 0:
+                yield {"type": "progress", "files_examined": examined, "renamed_count": renamed}
+            
+            # Filter by extension if specified
+            if file_extension and not file_path.suffix.lower() == file_extension.lower():
+                continue
+            
+            # Apply pattern replacement
+            if pattern in file_path.stem:
+                new_name = file_path.stem.replace(pattern, replacement) + file_path.suffix
+                new_path = file_path.parent / new_name
+                
+                try:
+                    file_path.rename(new_path)
+                except Exception as e:
+                    failed += 1
+                    yield {"type": "error", "file": file_path.name, "error": str(e)}
+                    continue
+                renamed += 1
+                yield {"type": "renamed", "old_name": file_path.name, "new_name": new_name}
+    
+    yield {"type": "done", "directory": str(dir_path.absolute()), "files_examined": examined,
+           "renamed_count": renamed, "error_count": failed}
+
 def get_file_rename():
     """Get file rename capabilities and statistics"""
     try:
         return {
             "functions": {
                 "rename_file": "rename_file(old_path, new_path, create_backup=False)",
-                "batch_rename": "batch_rename(directory, pattern, replacement, file_extension=None)"
+                "batch_rename": "batch_rename(directory, pattern, replacement, file_extension=None)",
+                "iter_batch_rename": "iter_batch_rename(directory, pattern, replacement, file_extension=None)"
             },
             "examples": {
                 "single_rename": "rename_file('old_name.txt', 'new_name.txt')",
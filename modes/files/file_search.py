@@ -1,75 +1,41 @@
 """File Search Module - Search for files and content"""
 import os
+import mmap
+import hashlib
 from pathlib import Path
 import re
+from collections import defaultdict
 from datetime import datetime, timedelta
 
+# Files with a NUL byte in their first block are treated as binary and skipped
+BINARY_SNIFF_BYTES = 8192
+# Smaller files are read in one call; larger ones are searched through mmap
+MMAP_MIN_BYTES = 256 * 1024
+MAX_LINE_MATCHES = 100
+# Newlines between matches are counted in slices of this size, so a long
+# gap in a mapped file is never copied out whole
+NEWLINE_COUNT_BYTES = 1024 * 1024
+# Pattern constructs that match differently on UTF-8 bytes than on text
+# (ASCII-only classes and word boundaries, '.' and negated classes that
+# match a single byte of a multi-byte character)
+_UNICODE_SENSITIVE = re.compile(r"\\[wWbBdDsS]|\.|\[\^")
+
+# Duplicate detection hashes the head and tail first, then whole files only if those agree
+PARTIAL_HASH_BYTES = 16 * 1024
+HASH_BUFFER_BYTES = 1024 * 1024
+
 def search_files(directory, name_pattern=None, content_pattern=None, file_extension=None, 
-                modified_within_days=None, size_min_mb=None, size_max_mb=None):
+                modified_within_days=None, size_min_mb=None, size_max_mb=None, exclude_patterns=None,
+                show_lines=False, context_lines=0, use_index=False):
     """Search for files based on various criteria"""
     try:
         dir_path = Path(directory)
-        if not dir_path.exists():
-            return {"error": f"Directory {directory} does not exist"}
-        
         found_files = []
-        
-        # Calculate time threshold if specified
-        time_threshold = None
-        if modified_within_days:
-            time_threshold = datetime.now() - timedelta(days=modified_within_days)
-        
-        for file_path in dir_path.rglob("*"):
-            if not file_path.is_file():
-                continue
-            
-            # Check file extension
-            if file_extension and not file_path.suffix.lower() == file_extension.lower():
-                continue
-            
-            # Check name pattern
-            if name_pattern and not re.search(name_pattern, file_path.name, re.IGNORECASE):
-                continue
-            
-            # Check file size
-            file_size_mb = file_path.stat().st_size / 1024 / 1024
-            if size_min_mb and file_size_mb < size_min_mb:
-                continue
-            if size_max_mb and file_size_mb > size_max_mb:
-                continue
-            
-            # Check modification time
-            if time_threshold:
-                mod_time = datetime.fromtimestamp(file_path.stat().st_mtime)
-                if mod_time < time_threshold:
-                    continue
-            
-            # Check content pattern
-            content_match = False
-            if content_pattern:
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        if re.search(content_pattern, content, re.IGNORECASE):
-                            content_match = True
-                        else:
-                            continue
-                except:
-                    continue
-            
-            # File matches all criteria
-            file_info = {
-                "path": str(file_path.absolute()),
-                "name": file_path.name,
-                "size_mb": round(file_size_mb, 2),
-                "modified": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                "extension": file_path.suffix
-            }
-            
-            if content_pattern and content_match:
-                file_info["content_match"] = True
-            
-            found_files.append(file_info)
+        for event in iter_search_files(dir_path, name_pattern, content_pattern, file_extension,
+                                       modified_within_days, size_min_mb, size_max_mb, exclude_patterns,
+                                       show_lines, context_lines, use_index):
+            if event["type"] == "match":
+                found_files.append(event["file"])
         
         return {
             "success": True,
@@ -82,96 +48,400 @@ def search_files(directory, name_pattern=None, content_pattern=None, file_extens
                 "file_extension": file_extension,
                 "modified_within_days": modified_within_days,
                 "size_min_mb": size_min_mb,
-                "size_max_mb": size_max_mb
+                "size_max_mb": size_max_mb,
+                "exclude_patterns": exclude_patterns,
+                "use_index": use_index
             }
         }
     except Exception as e:
         return {"error": str(e)}
 
-def find_duplicates(directory, compare_by="name"):
-    """Find duplicate files in directory"""
-    try:
-        dir_path = Path(directory)
-        if not dir_path.exists():
-            return {"error": f"Directory {directory} does not exist"}
+def iter_search_files(directory, name_pattern=None, content_pattern=None, file_extension=None,
+                      modified_within_days=None, size_min_mb=None, size_max_mb=None, exclude_patterns=None,
+                      show_lines=False, context_lines=0, use_index=False):
+    """Yield search events as the walker (or the index) finds matches.
+
+    Each event is a dict with a "type": "match" carries the file info under
+    "file", "progress" reports files_scanned/found_count every PROGRESS_EVERY
+    candidates, and a final "done" holds the totals. Closing the generator
+    stops the search. With use_index the index is refreshed from directory
+    mtimes, so in-place writes are only seen under watch_index() or after
+    update_index(root, restat=True).
+    """
+    from .file_walker import PROGRESS_EVERY, parallel_map
+    
+    dir_path = Path(directory)
+    if not dir_path.exists():
+        raise FileNotFoundError(f"Directory {directory} does not exist")
+    
+    # Candidates as (path, name, size, mtime), filtered on everything but content
+    if use_index:
+        from .file_index import query_index, update_index
+        update_index(dir_path)
+        candidates = query_index(dir_path, name_pattern, file_extension, size_min_mb, size_max_mb,
+                                 modified_within_days, exclude_patterns)
+    else:
+        candidates = _walk_candidates(dir_path, name_pattern, file_extension, modified_within_days,
+                                      size_min_mb, size_max_mb, exclude_patterns)
+    
+    # Check content pattern: compiled once, files searched on a thread pool
+    if content_pattern:
+        content_regex = compile_content_pattern(content_pattern)
         
-        files_dict = {}
-        duplicates = []
+        def check(candidate):
+            try:
+                return search_content(candidate[0], content_regex, show_lines, context_lines)
+            except OSError:
+                return None
         
-        for file_path in dir_path.rglob("*"):
-            if not file_path.is_file():
-                continue
-            
-            if compare_by == "name":
-                key = file_path.name
-            elif compare_by == "size":
-                key = file_path.stat().st_size
-            elif compare_by == "content":
-                try:
-                    import hashlib
-                    hash_md5 = hashlib.md5()
-                    with open(file_path, "rb") as f:
-                        for chunk in iter(lambda: f.read(4096), b""):
-                            hash_md5.update(chunk)
-                    key = hash_md5.hexdigest()
-                except:
-                    continue
-            else:
-                return {"error": "compare_by must be 'name', 'size', or 'content'"}
-            
-            if key in files_dict:
-                files_dict[key].append(file_path)
-            else:
-                files_dict[key] = [file_path]
+        results = parallel_map(check, candidates)
+    else:
+        results = ((candidate, None) for candidate in candidates)
+    
+    scanned = found_count = 0
+    for (path, name, size, mtime), found in results:
+        scanned += 1
+        if scanned % PROGRESS_EVERY == 0:
+            yield {"type": "progress", "files_scanned": scanned, "found_count": found_count}
+        if content_pattern and not found:
+            continue
         
-        # Find duplicates
-        for key, file_list in files_dict.items():
-            if len(file_list) > 1:
-                duplicate_group = {
-                    "key": key,
-                    "count": len(file_list),
-                    "files": [
-                        {
-                            "path": str(f.absolute()),
-                            "size_mb": round(f.stat().st_size / 1024 / 1024, 2),
-                            "modified": datetime.fromtimestamp(f.stat().st_mtime).isoformat()
-                        }
-                        for f in file_list
-                    ]
-                }
-                duplicates.append(duplicate_group)
+        file_info = {
+            "path": path,
+            "name": name,
+            "size_mb": round(size / 1024 / 1024, 2),
+            "modified": datetime.fromtimestamp(mtime).isoformat(),
+            "extension": os.path.splitext(name)[1]
+        }
         
-        return {
+        if found:
+            file_info["content_match"] = True
+            if show_lines:
+                file_info["matches"] = found
+        
+        found_count += 1
+        yield {"type": "match", "file": file_info}
+    
+    yield {"type": "done", "directory": str(dir_path.absolute()), "files_scanned": scanned,
+           "found_count": found_count}
+
+def compile_content_pattern(pattern):
+    """Compile a case-insensitive content pattern for search_content.
+
+    ASCII patterns without Unicode-sensitive constructs match the raw UTF-8
+    bytes exactly as they would match the text, so they become bytes
+    regexes searched over the (memory-mapped) file. Anything else stays a
+    str regex and is searched over the decoded text.
+    """
+    if pattern.isascii() and not _UNICODE_SENSITIVE.search(pattern):
+        return re.compile(pattern.encode('utf-8'), re.IGNORECASE)
+    return re.compile(pattern, re.IGNORECASE)
+
+def search_content(file_path, content_regex, show_lines=False, context_lines=0, max_matches=MAX_LINE_MATCHES):
+    """Search one file with a regex from compile_content_pattern.
+
+    Returns None for no match or a binary file, True when only existence
+    was asked for (the scan stops at the first hit), or a list of
+    {"line", "text", "before", "after"} dicts when show_lines is set.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(BINARY_SNIFF_BYTES)
+        if b"\0" in head:
+            return None
+        size = os.fstat(f.fileno()).st_size
+        if isinstance(content_regex.pattern, str):
+            data = (head + f.read()).decode('utf-8', errors='replace')
+        elif size <= len(head):
+            data = head
+        elif size < MMAP_MIN_BYTES:
+            data = head + f.read()
+        else:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                data = head + f.read()
+        try:
+            if not show_lines:
+                return True if content_regex.search(data) else None
+            return _matching_lines(data, content_regex, context_lines, max_matches) or None
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+def _matching_lines(data, content_regex, context_lines, max_matches):
+    """Line numbers and text around each match, counting newlines incrementally.
+
+    data is bytes (or an mmap) for bytes regexes and str for str regexes.
+    """
+    newline = "\n" if isinstance(data, str) else b"\n"
+    matches = []
+    line_number, counted_to, last_line_start = 1, 0, -1
+    for match in content_regex.finditer(data):
+        line_start = data.rfind(newline, 0, match.start()) + 1
+        if line_start == last_line_start:
+            continue  # One entry per line
+        line_number += _count_newlines(data, counted_to, line_start)
+        counted_to, last_line_start = line_start, line_start
+        line_end = data.find(newline, match.start())
+        line_end = len(data) if line_end < 0 else line_end
+
+        before, start = [], line_start
+        for _ in range(context_lines):
+            if start == 0:
+                break
+            previous = data.rfind(newline, 0, start - 1) + 1
+            before.insert(0, _decode(data[previous:start - 1]))
+            start = previous
+        after, end = [], line_end
+        for _ in range(context_lines):
+            if end >= len(data) - 1:
+                break
+            following = data.find(newline, end + 1)
+            following = len(data) if following < 0 else following
+            after.append(_decode(data[end + 1:following]))
+            end = following
+
+        matches.append({"line": line_number, "text": _decode(data[line_start:line_end]),
+                        "before": before, "after": after})
+        if len(matches) >= max_matches:
+            break
+    return matches
+
+def _count_newlines(data, start, stop):
+    newline = "\n" if isinstance(data, str) else b"\n"
+    count = 0
+    for offset in range(start, stop, NEWLINE_COUNT_BYTES):
+        count += data[offset:min(offset + NEWLINE_COUNT_BYTES, stop)].count(newline)
+    return count
+
+def _decode(line):
+    if isinstance(line, str):
+        return line.rstrip("\r")
+    return line.decode('utf-8', errors='replace').rstrip("\r")
+
+def _walk_candidates(dir_path, name_pattern, file_extension, modified_within_days,
+                     size_min_mb, size_max_mb, exclude_patterns):
+    """Walk the tree, checking size and date on each entry's single stat in the walker threads"""
+    from .file_walker import walk_files
+    
+    # Calculate time threshold if specified
+    time_threshold = None
+    if modified_within_days:
+        time_threshold = (datetime.now() - timedelta(days=modified_within_days)).timestamp()
+    
+    def predicate(entry):
+        st = entry.stat()
+        if size_min_mb and st.st_size < size_min_mb * 1024 * 1024:
+            return False
+        if size_max_mb and st.st_size > size_max_mb * 1024 * 1024:
+            return False
+        return not (time_threshold and st.st_mtime < time_threshold)
+    
+    for entry in walk_files(dir_path, exclude=exclude_patterns, extensions=file_extension,
+                            name_pattern=name_pattern, predicate=predicate):
+        st = entry.stat()
+        yield entry.path, entry.name, st.st_size, st.st_mtime
+
+def find_duplicates(directory, compare_by="name", exclude_patterns=None, use_cache=True):
+    """Find duplicate files in directory"""
+    try:
+        dir_path = Path(directory)
+        duplicates, stages = [], None
+        for event in iter_find_duplicates(dir_path, compare_by, exclude_patterns, use_cache):
+            if event["type"] == "duplicate":
+                duplicates.append(event["group"])
+            elif event["type"] == "done":
+                stages = event.get("stages")
+        
+        result = {
             "success": True,
             "directory": str(dir_path.absolute()),
             "duplicate_groups": len(duplicates),
             "duplicates": duplicates,
             "compare_by": compare_by
         }
+        if stages:
+            result["stages"] = stages
+        return result
     except Exception as e:
         return {"error": str(e)}
 
+def iter_find_duplicates(directory, compare_by="name", exclude_patterns=None, use_cache=True):
+    """Yield duplicate-detection events.
+
+    A group is only complete once the whole tree has been seen, so the
+    walk emits "progress" events (files_scanned) every PROGRESS_EVERY files,
+    then one "duplicate" event per group and a final "done" with the
+    totals (and the hashing stages when comparing by content).
+    """
+    from .file_walker import PROGRESS_EVERY, walk_files
+    
+    dir_path = Path(directory)
+    if not dir_path.exists():
+        raise FileNotFoundError(f"Directory {directory} does not exist")
+    if compare_by not in ("name", "size", "content"):
+        raise ValueError("compare_by must be 'name', 'size', or 'content'")
+    
+    # Content comparison starts from the same-size groups
+    files_dict = defaultdict(list)
+    scanned = 0
+    for entry in walk_files(dir_path, exclude=exclude_patterns, stat=True):
+        scanned += 1
+        key = entry.name if compare_by == "name" else entry.stat().st_size
+        files_dict[key].append(entry)
+        if scanned % PROGRESS_EVERY == 0:
+            yield {"type": "progress", "files_scanned": scanned}
+    
+    stages = None
+    if compare_by == "content":
+        files_dict, stages = _content_groups(files_dict, scanned, use_cache)
+    
+    group_count = 0
+    for key, file_list in files_dict.items():
+        if len(file_list) > 1:
+            group_count += 1
+            yield {"type": "duplicate", "group": {
+                "key": key,
+                "count": len(file_list),
+                "files": [
+                    {
+                        "path": entry.path,
+                        "size_mb": round(entry.stat().st_size / 1024 / 1024, 2),
+                        "modified": datetime.fromtimestamp(entry.stat().st_mtime).isoformat()
+                    }
+                    for entry in file_list
+                ]
+            }}
+    
+    done = {"type": "done", "directory": str(dir_path.absolute()), "files_scanned": scanned,
+            "duplicate_groups": group_count, "compare_by": compare_by}
+    if stages:
+        done["stages"] = stages
+    yield done
+
+def _content_groups(by_size, scanned, use_cache=True):
+    """Group same-size files by content: head/tail hash, then full hash of what is left"""
+    stages = {"files_scanned": scanned, "same_size_candidates": 0, "partial_hashed": 0,
+              "full_hashed": 0, "cache_hits": 0}
+    
+    groups = {}
+    candidates = {}
+    for size, group in by_size.items():
+        if len(group) < 2:
+            continue
+        stages["same_size_candidates"] += len(group)
+        if size == 0:
+            groups[hashlib.blake2b(b"", digest_size=20).hexdigest()] = group
+        else:
+            candidates[size] = group
+    
+    # Files no bigger than head + tail are fully hashed by the partial pass
+    partial = _hash_stage(candidates, "blake2b-partial", _partial_hash, use_cache, stages, "partial_hashed")
+    remaining = {}
+    for (size, digest), group in partial.items():
+        if size <= 2 * PARTIAL_HASH_BYTES:
+            groups[digest] = group
+        else:
+            remaining[(size, digest)] = group
+    
+    full = _hash_stage(remaining, "blake2b", _full_hash, use_cache, stages, "full_hashed")
+    for (_, digest), group in full.items():
+        groups[digest] = group
+    return groups, stages
+
+def _hash_stage(groups, kind, hash_func, use_cache, stages, counter):
+    """Split each group by a per-file digest, keeping only sub-groups with two or more files"""
+    from .file_walker import parallel_map
+    entries = [entry for group in groups.values() for entry in group]
+    if not entries:
+        return {}
+    
+    keys = {entry.path: _cache_key(entry.stat()) for entry in entries}
+    digests = {}
+    if use_cache:
+        from .file_index import load_hashes
+        cached = load_hashes(keys.values(), kind)
+        digests = {path: cached[key] for path, key in keys.items() if key in cached}
+        stages["cache_hits"] += len(digests)
+    
+    todo = [entry for entry in entries if entry.path not in digests]
+    computed = {}
+    for entry, digest in parallel_map(_safe_hash(hash_func), todo):
+        if digest is not None:
+            digests[entry.path] = digest
+            computed[keys[entry.path]] = digest
+    stages[counter] += len(computed)
+    if use_cache and computed:
+        from .file_index import store_hashes
+        store_hashes(computed, kind)
+    
+    split = defaultdict(list)
+    for key, group in groups.items():
+        for entry in group:
+            if entry.path in digests:
+                split[(key[0] if isinstance(key, tuple) else key, digests[entry.path])].append(entry)
+    return {key: group for key, group in split.items() if len(group) > 1}
+
+def _cache_key(st):
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+def _safe_hash(hash_func):
+    def run(entry):
+        try:
+            return hash_func(entry.path, entry.stat().st_size)
+        except OSError:
+            return None
+    return run
+
+def _partial_hash(path, size):
+    """Hash of the first and last PARTIAL_HASH_BYTES, or of the whole file if it is that small"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        if size <= 2 * PARTIAL_HASH_BYTES:
+            digest.update(f.read())
+        else:
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+            f.seek(-PARTIAL_HASH_BYTES, os.SEEK_END)
+            digest.update(f.read(PARTIAL_HASH_BYTES))
+    return digest.hexdigest()
+
+def _full_hash(path, size=None):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb', buffering=0) as f:
+        for chunk in iter(lambda: f.read(HASH_BUFFER_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def get_file_search():
     """Get file search capabilities"""
     try:
         return {
             "functions": {
-                "search_files": "search_files(directory, name_pattern=None, content_pattern=None, file_extension=None, modified_within_days=None, size_min_mb=None, size_max_mb=None)",
-                "find_duplicates": "find_duplicates(directory, compare_by='name')"
+                "search_files": "search_files(directory, name_pattern=None, content_pattern=None, file_extension=None, modified_within_days=None, size_min_mb=None, size_max_mb=None, exclude_patterns=None, show_lines=False, context_lines=0, use_index=False)",
+                "iter_search_files": "iter_search_files(directory, ...same arguments as search_files)",
+                "search_content": "search_content(file_path, compile_content_pattern(pattern), show_lines=False, context_lines=0)",
+                "find_duplicates": "find_duplicates(directory, compare_by='name', exclude_patterns=None, use_cache=True)",
+                "iter_find_duplicates": "iter_find_duplicates(directory, compare_by='name', exclude_patterns=None, use_cache=True)"
             },
             "search_criteria": [
                 "File name pattern (regex)",
-                "File content pattern (regex)",
+                "File content pattern (regex, binary files skipped)",
                 "File extension",
                 "Modification time",
-                "File size range"
+                "File size range",
+                "Excluded directories (glob)"
             ],
-            "duplicate_detection": ["by name", "by size", "by content (hash)"],
+            "streaming": "iter_* functions yield match/duplicate, progress and done events; closing them stops the scan",
+            "duplicate_detection": ["by name", "by size", "by content (size, then head/tail BLAKE2b, then full BLAKE2b; hashes cached)"],
             "examples": {
                 "name_search": "search_files('/path', name_pattern='.*\\.py$')",
                 "content_search": "search_files('/path', content_pattern='TODO')",
+                "content_lines": "search_files('/path', content_pattern='TODO', show_lines=True, context_lines=2)",
+                "indexed_search": "search_files('/path', file_extension='.log', size_min_mb=100, use_index=True)",
                 "recent_files": "search_files('/path', modified_within_days=7)",
-                "find_duplicates": "find_duplicates('/path', compare_by='content')"
+                "skip_dirs": "search_files('/path', file_extension='.py', exclude_patterns=['.git', 'node_modules'])",
+                "find_duplicates": "find_duplicates('/path', compare_by='content')",
+                "stream_matches": "for event in iter_search_files('/path', content_pattern='TODO'): print(json.dumps(event))"
             }
         }
     except Exception as e:
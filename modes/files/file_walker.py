@@ -0,0 +1,178 @@
+"""File Walker - Parallel os.scandir tree walker shared by the file modules"""
+import os
+import re
+import fnmatch
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Threads mostly wait on directory reads and stat calls, so use more than the CPU count
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Directory batches buffered ahead of a slow consumer
+QUEUE_BATCHES = 64
+# The iter_* bulk operations emit a progress event every this many files examined
+PROGRESS_EVERY = 1000
+
+def walk_files(root, exclude=None, extensions=None, name_pattern=None, predicate=None,
+               stat=False, max_workers=DEFAULT_WORKERS):
+    """Yield os.DirEntry objects for the files under root.
+
+    Directories whose name (or path) matches an exclude glob are never
+    entered. Extension and name filters run before any stat call; with
+    stat=True or a predicate, each surviving entry is stat'ed once in the
+    worker threads and callers reuse entry.stat() for free. Subtrees are
+    scanned in parallel and results arrive in no particular order.
+    Closing the generator stops the walk.
+    """
+    root = os.path.abspath(os.fspath(root))
+    excluded = _compile_globs(exclude)
+    suffixes = _normalize_extensions(extensions)
+    if isinstance(name_pattern, str):
+        name_pattern = re.compile(name_pattern, re.IGNORECASE)
+
+    def scan(path):
+        files, dirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not (excluded and (excluded(entry.name) or excluded(entry.path))):
+                                dirs.append(entry.path)
+                            continue
+                        if suffixes and not entry.name.lower().endswith(suffixes):
+                            continue
+                        if name_pattern and not name_pattern.search(entry.name):
+                            continue
+                        if not entry.is_file():
+                            continue
+                        if stat or predicate:
+                            entry.stat()
+                        if predicate and not predicate(entry):
+                            continue
+                        files.append(entry)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files, dirs
+
+    if max_workers <= 1:
+        stack = [root]
+        while stack:
+            files, dirs = scan(stack.pop())
+            stack.extend(reversed(dirs))
+            yield from files
+        return
+
+    results = queue.Queue(maxsize=QUEUE_BATCHES)
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [1]
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def work(path):
+        if stop.is_set():
+            return
+        try:
+            files, dirs = scan(path)
+        except Exception:
+            files, dirs = [], []
+        with lock:
+            pending[0] += len(dirs)
+        for directory in dirs:
+            try:
+                executor.submit(work, directory)
+            except RuntimeError:
+                return  # The walk was closed
+        if files:
+            put(files)
+        with lock:
+            pending[0] -= 1
+            finished = pending[0] == 0
+        if finished:
+            put(None)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-walker")
+    try:
+        executor.submit(work, root)
+        while True:
+            batch = results.get()
+            if batch is None:
+                break
+            yield from batch
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def parallel_map(func, items, max_workers=DEFAULT_WORKERS):
+    """Yield (item, func(item)) in completion order with a bounded number in flight.
+
+    Items are pulled lazily, so a walker generator can feed it without the
+    whole tree being materialized. Closing the generator cancels queued work.
+    """
+    items = iter(items)
+    if max_workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-worker")
+    in_flight = {}
+    try:
+        for item in items:
+            in_flight[executor.submit(func, item)] = item
+            if len(in_flight) >= max_workers * 4:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _compile_globs(patterns):
+    """Combine glob patterns into one matcher, or None when there are none"""
+    if not patterns:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    regex = re.compile("|".join(fnmatch.translate(p) for p in patterns))
+    return regex.match
+
+def _normalize_extensions(extensions):
+    """Lower-case '.ext' suffixes for str.endswith, or None for no filter"""
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        extensions = [extensions]
+    return tuple(e.lower() if e.startswith('.') else f".{e.lower()}" for e in extensions)
+
+def get_file_walker():
+    """Get file walker capabilities"""
+    try:
+        return {
+            "functions": {
+                "walk_files": "walk_files(root, exclude=None, extensions=None, name_pattern=None, predicate=None, stat=False, max_workers=DEFAULT_WORKERS)",
+                "parallel_map": "parallel_map(func, items, max_workers=DEFAULT_WORKERS)"
+            },
+            "default_workers": DEFAULT_WORKERS,
+            "capabilities": {
+                "scandir": "Directory entries come from os.scandir, so file types need no extra syscalls",
+                "single_stat": "Each matching file is stat'ed at most once and the result is cached on its entry",
+                "pruning": "Excluded directories are skipped before they are read",
+                "parallel": "Subtrees are scanned concurrently across a thread pool",
+                "streaming": "Files are yielded as directories finish; closing the generator stops the walk"
+            }
+        }
+    except Exception as e:
+        return {"error": str(e)}
@@ -1,13 +1,35 @@
 """Anomaly Detection - ML-based detection of unusual system behavior"""
 import json
+import os
 import time
+import tempfile
+import multiprocessing
 import numpy as np
 from pathlib import Path
 from collections import deque
 
+try:
+    import joblib
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 MODEL_DIR = Path(__file__).parent / "models"
 DATA_DIR = Path(__file__).parent / "data"
 ANOMALY_LOG = DATA_DIR / "anomalies.json"
+BATCH_MODEL_FILE = MODEL_DIR / "batch_anomaly.joblib"
+BATCH_LABELS_FILE = DATA_DIR / "anomaly_labels.npz"
+BATCH_TRAINING_LOG = DATA_DIR / "batch_training.json"
+
+BATCH_METHODS = ("robust_covariance", "isolation_forest")
+SCORE_CHUNK_SIZE = 65536
+
+_training_process = None
 
 def get_anomaly_detection():
     """Get anomaly detection status and recent anomalies"""
@@ -30,6 +52,7 @@ def get_anomaly_detection():
         return {
             "status": "monitoring",
             "model_status": "trained" if _check_model_exists() else "training",
+            "batch_model": _get_batch_model_info(),
             "current_anomalies": current_anomalies,
             "recent_anomalies": anomaly_data["anomalies"][-10:],
             "total_anomalies": len(anomaly_data["anomalies"]),
@@ -106,4 +129,253 @@ def _detect_current_anomalies():
 def _check_model_exists():
     """Check if trained models exist"""
     model_files = list(MODEL_DIR.glob("*.pkl")) + list(MODEL_DIR.glob("*.joblib"))
-    return len(model_files) > 0
\ No newline at end of file
+    return len(model_files) > 0
+
+def train_batch_model(method="robust_covariance", since=None, background=True):
+    """Retrain the multivariate batch model over stored history.
+
+    By default training runs in a separate process so the caller (and the
+    GIL) are not blocked; the model is written atomically to MODEL_DIR.
+    """
+    global _training_process
+    if not JOBLIB_AVAILABLE:
+        return {"error": "joblib not installed. Run: pip install joblib"}
+    if method not in BATCH_METHODS:
+        return {"error": f"method must be one of {list(BATCH_METHODS)}"}
+
+    if not background:
+        return _train_batch_model(method, since)
+
+    if _training_process is not None and _training_process.is_alive():
+        return {"status": "already_training", "pid": _training_process.pid}
+
+    ctx = multiprocessing.get_context("spawn")
+    _training_process = ctx.Process(target=_train_batch_model, args=(method, since), daemon=True)
+    _training_process.start()
+    return {"status": "training", "pid": _training_process.pid, "method": method}
+
+def score_history(since=None, until=None):
+    """Score stored history with the persisted batch model.
+
+    Returns (timestamps, scores, labels); higher scores are more anomalous
+    and labels are 1 where the score exceeds the model threshold.
+    """
+    model = _load_batch_model()
+    timestamps, features = _build_feature_matrix(model["features"], since, until)
+    scores = np.empty(len(features), dtype=np.float64)
+    for start in range(0, len(features), SCORE_CHUNK_SIZE):
+        chunk = features[start:start + SCORE_CHUNK_SIZE]
+        scores[start:start + len(chunk)] = _score_matrix(model, chunk)
+    labels = (scores > model["threshold"]).astype(np.int8)
+    return timestamps, scores, labels
+
+def backfill_anomaly_labels(since=None, until=None):
+    """Label the stored history with the batch model and save the labels"""
+    try:
+        started = time.perf_counter()
+        timestamps, scores, labels = score_history(since, until)
+        elapsed = time.perf_counter() - started
+
+        DATA_DIR.mkdir(exist_ok=True)
+        tmp_file = BATCH_LABELS_FILE.with_name(BATCH_LABELS_FILE.stem + ".tmp.npz")
+        np.savez(tmp_file, timestamp=timestamps, score=scores, label=labels)
+        os.replace(tmp_file, BATCH_LABELS_FILE)
+
+        top = np.argsort(scores)[::-1][:10] if len(scores) else []
+        return {
+            "success": True,
+            "points_scored": len(scores),
+            "anomalies_labeled": int(labels.sum()),
+            "scoring_seconds": round(elapsed, 4),
+            "points_per_ms": round(len(scores) / max(elapsed * 1000, 1e-9), 1),
+            "labels_file": str(BATCH_LABELS_FILE),
+            "top_anomalies": [
+                {"timestamp": float(timestamps[i]), "score": round(float(scores[i]), 4)}
+                for i in top if labels[i]
+            ]
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+def update_batch_threshold(quantile=0.99, window_seconds=86400):
+    """Recalibrate the batch model's threshold on recent history.
+
+    Rescoring a day of points is cheap compared with retraining, so this is
+    how the threshold follows a new normal between full retrains.
+    """
+    try:
+        model = dict(_load_batch_model())
+        _, scores, _ = score_history(since=time.time() - window_seconds)
+        if len(scores) < 50:
+            return {"error": f"Need at least 50 recent points, have {len(scores)}"}
+        previous = model["threshold"]
+        model["threshold"] = float(np.quantile(scores, quantile))
+        model["threshold_updated_at"] = time.time()
+        with _model_file_lock():
+            # A retrain that finished while we were scoring wins over these stale parameters
+            if _load_batch_model()["trained_at"] != model["trained_at"]:
+                return {"status": "skipped", "reason": "Batch model was retrained during the update"}
+            _save_batch_model(model)
+        return {"success": True, "previous_threshold": previous, "threshold": model["threshold"],
+                "points_scored": len(scores)}
+    except Exception as e:
+        return {"error": str(e)}
+
+def _train_batch_model(method, since=None):
+    """Fit and persist a batch model (runs inside the training process)"""
+    result = _fit_and_save_batch_model(method, since)
+    try:
+        DATA_DIR.mkdir(exist_ok=True)
+        with open(BATCH_TRAINING_LOG, 'w') as f:
+            json.dump(dict(result, method=method, finished_at=time.time()), f, indent=2)
+    except OSError:
+        pass
+    return result
+
+def _fit_and_save_batch_model(method, since=None):
+    """Fit a batch model on the feature matrix and write it to MODEL_DIR"""
+    try:
+        from .feature_engineering import list_base_features
+        started = time.time()
+        features = list_base_features()
+        timestamps, matrix = _build_feature_matrix(features, since, None)
+        if len(matrix) < 50:
+            return {"error": f"Need at least 50 complete data points, have {len(matrix)}"}
+
+        if method == "isolation_forest":
+            model = _fit_isolation_forest(matrix)
+        else:
+            model = _fit_robust_covariance(matrix)
+
+        model.update({
+            "features": features,
+            "trained_at": time.time(),
+            "training_seconds": round(time.time() - started, 2),
+            "samples": len(matrix),
+            "data_range": [float(timestamps[0]), float(timestamps[-1])]
+        })
+
+        with _model_file_lock():
+            _save_batch_model(model)
+        return {"success": True, "method": method, "samples": len(matrix), "model_file": str(BATCH_MODEL_FILE)}
+    except Exception as e:
+        return {"error": str(e)}
+
+class _model_file_lock:
+    """Advisory lock so a retrain process and a threshold update don't write the model at once"""
+
+    def __enter__(self):
+        BATCH_MODEL_FILE.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = open(BATCH_MODEL_FILE.with_name(BATCH_MODEL_FILE.name + ".lock"), 'w')
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+def _save_batch_model(model):
+    """Write the model through a unique temporary file (hold _model_file_lock)"""
+    fd, tmp_file = tempfile.mkstemp(prefix=f".{BATCH_MODEL_FILE.name}.", suffix=".tmp", dir=BATCH_MODEL_FILE.parent)
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp_file)
+        os.replace(tmp_file, BATCH_MODEL_FILE)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+        raise
+
+def _build_feature_matrix(features, since=None, until=None):
+    """Get complete rows of the named pipeline features from stored history"""
+    from .feature_engineering import select_features
+    return select_features(features, since, until)
+
+def _fit_robust_covariance(matrix, support_fraction=0.75, n_steps=20):
+    """Fit a minimum-covariance-determinant style model with concentration steps"""
+    # Standardize with median/MAD so counters in bytes/s don't dominate
+    center = np.median(matrix, axis=0)
+    scale = np.median(np.abs(matrix - center), axis=0) * 1.4826
+    scale[scale == 0] = 1.0
+    scaled = (matrix - center) / scale
+
+    h = max(int(len(scaled) * support_fraction), scaled.shape[1] + 1)
+    subset = np.argsort(np.einsum("ij,ij->i", scaled, scaled))[:h]
+    for _ in range(n_steps):
+        location = scaled[subset].mean(axis=0)
+        covariance = np.cov(scaled[subset], rowvar=False) + np.eye(scaled.shape[1]) * 1e-6
+        precision = np.linalg.inv(covariance)
+        diff = scaled - location
+        distances = np.einsum("ij,jk,ik->i", diff, precision, diff)
+        new_subset = np.argpartition(distances, h - 1)[:h]
+        if np.array_equal(np.sort(new_subset), np.sort(subset)):
+            break
+        subset = new_subset
+
+    # Flag the top 1% of training distances as anomalous
+    threshold = float(np.quantile(distances, 0.99))
+    return {
+        "method": "robust_covariance",
+        "center": center,
+        "scale": scale,
+        "location": location,
+        "precision": precision,
+        "threshold": threshold
+    }
+
+def _fit_isolation_forest(matrix):
+    """Fit an isolation forest (requires scikit-learn)"""
+    try:
+        from sklearn.ensemble import IsolationForest
+    except ImportError:
+        raise RuntimeError("scikit-learn not installed. Run: pip install scikit-learn")
+
+    forest = IsolationForest(n_estimators=100, contamination=0.01, random_state=0)
+    forest.fit(matrix)
+    # score_samples is higher for normal points; negate so higher means anomalous
+    return {"method": "isolation_forest", "estimator": forest, "threshold": float(-forest.offset_)}
+
+def _score_matrix(model, matrix):
+    """Vectorized anomaly scores for a feature matrix"""
+    if model["method"] == "isolation_forest":
+        return -model["estimator"].score_samples(matrix)
+    diff = (matrix - model["center"]) / model["scale"] - model["location"]
+    return np.einsum("ij,jk,ik->i", diff, model["precision"], diff)
+
+def _load_batch_model():
+    """Load the persisted batch model with its arrays memory-mapped"""
+    if not JOBLIB_AVAILABLE:
+        raise RuntimeError("joblib not installed. Run: pip install joblib")
+    if not BATCH_MODEL_FILE.exists():
+        raise FileNotFoundError("No batch anomaly model trained yet. Run train_batch_model() first")
+    return joblib.load(BATCH_MODEL_FILE, mmap_mode="r")
+
+def _get_batch_model_info():
+    """Summarize the persisted batch model and any running training process"""
+    info = {"training_in_progress": _training_process is not None and _training_process.is_alive()}
+    if BATCH_TRAINING_LOG.exists():
+        try:
+            with open(BATCH_TRAINING_LOG, 'r') as f:
+                info["last_training"] = json.load(f)
+        except (OSError, ValueError):
+            pass
+    info["trained"] = False
+    if not JOBLIB_AVAILABLE or not BATCH_MODEL_FILE.exists():
+        return info
+    try:
+        model = _load_batch_model()
+        info.update({
+            "trained": True,
+            "method": model["method"],
+            "features": list(model["features"]),
+            "samples": model["samples"],
+            "trained_at": model["trained_at"],
+            "data_range": model["data_range"]
+        })
+    except Exception as e:
+        info["error"] = str(e)
+    return info
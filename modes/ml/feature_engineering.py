@@ -1,11 +1,38 @@
 """Feature Engineering - Advanced feature extraction and transformation for ML models"""
 import json
+import os
 import time
+import hashlib
+import threading
 import numpy as np
 from pathlib import Path
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 DATA_DIR = Path(__file__).parent / "data"
 FEATURES_LOG = DATA_DIR / "feature_engineering.json"
+FEATURE_STORE_DIR = DATA_DIR / "feature_store"
+
+# Window sizes are in samples (the collector samples every 30 seconds)
+ROLLING_WINDOWS = (10, 120)
+LAG_STEPS = (1, 10)
+FFT_WINDOW = 256
+FFT_STRIDE = 32
+TIME_FEATURES = ("hour_sin", "hour_cos", "dow_sin", "dow_cos")
+
+# Rows of history a new row depends on; recomputed as overlap on each update
+CONTEXT_ROWS = max(max(ROLLING_WINDOWS), max(LAG_STEPS), FFT_WINDOW + FFT_STRIDE)
+
+# Lineage entries kept in the store manifest
+MAX_LINEAGE_BATCHES = 200
+
+_lock = threading.Lock()
+_store_cache = {"path": None, "rows": None, "created_at": None, "timestamps": None, "matrix": None,
+                "watermark": None}
 
 def get_feature_engineering():
     """Get feature engineering capabilities and extracted features"""
@@ -20,10 +47,25 @@ def get_feature_engineering():
         else:
             features_data = {"extracted_features": {}, "transformations": []}
         
+        timestamps, matrix, names = build_features()
+        manifest = _read_manifest(_store_dir())
+        last_batch = manifest["batches"][-1] if manifest["batches"] else {}
+        
         return {
             "status": "active",
-            "total_features_extracted": len(features_data.get("extracted_features", {})),
+            "total_features_extracted": len(names),
             "active_transformations": len(features_data.get("transformations", [])),
+            "pipeline": {
+                "rows_stored": len(timestamps),
+                "feature_names": names,
+                "rolling_windows": list(ROLLING_WINDOWS),
+                "lag_steps": list(LAG_STEPS),
+                "fft_window": FFT_WINDOW,
+                "last_update": last_batch.get("created_at"),
+                "last_rows_computed": last_batch.get("rows", [0, 0])[1] - last_batch.get("rows", [0, 0])[0],
+                "last_compute_ms": last_batch.get("compute_ms", 0)
+            },
+            "feature_store_status": get_feature_store_info(),
             "feature_categories": {
                 "temporal_features": {
                     "description": "Time-based features from system metrics",
@@ -98,7 +140,7 @@ def get_feature_engineering():
                 "domain_specific_features": "Generate features specific to system monitoring domain"
             },
             "feature_quality_metrics": {
-                "feature_importance_scores": _get_feature_importance(),
+                "feature_importance_scores": _get_feature_importance(timestamps, matrix, names),
                 "correlation_analysis": "Identify highly correlated features",
                 "mutual_information_scores": "Measure feature-target relationships",
                 "stability_analysis": "Assess feature stability over time",
@@ -120,22 +162,428 @@ def get_feature_engineering():
     except Exception as e:
         return {"error": str(e)}
 
-def _get_feature_importance():
-    """Get feature importance scores"""
+def list_base_features():
+    """Get the names of the per-sample base features (counters become rates)"""
+    from ..service.metric_store import METRIC_FIELDS, COUNTER_FIELDS
+    return [f"{field}_rate" if field in COUNTER_FIELDS else field for field in METRIC_FIELDS]
+
+def list_feature_names():
+    """Get the column names of the feature matrix in order"""
+    names = []
+    for base in list_base_features():
+        names.append(base)
+        for window in ROLLING_WINDOWS:
+            names += [f"{base}_mean_{window}", f"{base}_std_{window}"]
+        names += [f"{base}_lag_{lag}" for lag in LAG_STEPS]
+        names.append(f"{base}_fft_period")
+    return names + list(TIME_FEATURES)
+
+def build_features(since=None, until=None):
+    """Build the feature matrix over stored history.
+
+    Returns (timestamps, matrix, feature_names). Rows appended to the metric
+    store since the last call are computed and appended to the on-disk
+    feature store; everything else is served memory-mapped from the store.
+    Rows without enough history for a rolling, lag or FFT feature carry NaN
+    in that column.
+    """
+    from ..service.metric_store import get_store_watermark
+    with _lock:
+        store_dir = _store_dir()
+        watermark = get_store_watermark()
+        if _store_cache["path"] != store_dir or _store_cache["watermark"] != watermark:
+            with _store_file_lock(store_dir):
+                _update_feature_store(store_dir)
+            _store_cache["watermark"] = watermark
+        timestamps, matrix = _open_store(store_dir)
+
+    start = 0 if since is None else int(np.searchsorted(timestamps, since, side="left"))
+    stop = len(timestamps) if until is None else int(np.searchsorted(timestamps, until, side="right"))
+    return timestamps[start:stop], matrix[start:stop], list_feature_names()
+
+def select_features(names, since=None, until=None, complete=True):
+    """Get (timestamps, matrix) for the named feature columns.
+
+    With complete=True rows with any missing value are dropped, which is what
+    most models want.
+    """
+    timestamps, matrix, all_names = build_features(since, until)
+    columns = [all_names.index(name) for name in names]
+    selected = np.asarray(matrix[:, columns])
+    if complete:
+        keep = np.isfinite(selected).all(axis=1)
+        return timestamps[keep], selected[keep]
+    return timestamps, selected
+
+def get_feature_store_info():
+    """Get version, lineage and drift statistics of the current feature store"""
+    manifest = _read_manifest(_store_dir())
+    return {
+        "version": manifest["version"],
+        "rows": manifest["rows"],
+        "time_range": manifest["time_range"],
+        "created_at": manifest["created_at"],
+        "source": manifest["source"],
+        "recent_batches": manifest["batches"][-5:],
+        "drift": _drift_report(manifest),
+        "other_versions": sorted(
+            p.name for p in FEATURE_STORE_DIR.glob("v_*") if p.is_dir() and p != _store_dir()
+        ) if FEATURE_STORE_DIR.exists() else []
+    }
+
+def feature_store_summary():
+    """Short description of the feature matrix available to model modules"""
+    timestamps, _, names = build_features()
     return {
-        "cpu_usage_mean": 0.15,
-        "memory_usage_std": 0.12,
-        "hour_of_day": 0.11,
-        "application_switching_rate": 0.10,
-        "network_activity_peak": 0.09,
-        "disk_io_variance": 0.08,
-        "typing_rhythm_consistency": 0.07,
-        "focus_duration_avg": 0.06,
-        "mouse_movement_entropy": 0.05,
-        "system_idle_time": 0.04,
-        "day_of_week": 0.04,
-        "multitasking_index": 0.03,
-        "error_frequency": 0.03,
-        "session_duration": 0.02,
-        "break_frequency": 0.01
-    }
\ No newline at end of file
+        "version": feature_set_version(),
+        "rows": len(timestamps),
+        "features": len(names),
+        "time_range": [float(timestamps[0]), float(timestamps[-1])] if len(timestamps) else [None, None],
+        "access": "memory-mapped via feature_engineering.select_features()"
+    }
+
+def feature_set_version():
+    """Get a short hash identifying the feature definitions.
+
+    Changing windows, lags or base metrics yields a new version, so stored
+    matrices are never mixed across incompatible feature sets.
+    """
+    definition = {
+        "features": list_feature_names(),
+        "rolling_windows": ROLLING_WINDOWS,
+        "lag_steps": LAG_STEPS,
+        "fft_window": FFT_WINDOW,
+        "fft_stride": FFT_STRIDE
+    }
+    return hashlib.sha1(json.dumps(definition, sort_keys=True).encode()).hexdigest()[:12]
+
+def local_time_parts(timestamps):
+    """Get (fractional hour of day, day of week) in local time for timestamps.
+
+    The UTC offset is looked up once per distinct hour so DST changes are
+    handled without a per-row localtime() call. Monday is day 0.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(timestamps) == 0:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    hours = np.floor(timestamps / 3600).astype(np.int64)
+    unique_hours, inverse = np.unique(hours, return_inverse=True)
+    offsets = np.array([time.localtime(h * 3600).tm_gmtoff for h in unique_hours], dtype=np.float64)
+    local = timestamps + offsets[inverse]
+    hour_of_day = (local % 86400) / 3600
+    # The epoch (day 0) was a Thursday
+    day_of_week = (np.floor(local / 86400).astype(np.int64) + 3) % 7
+    return hour_of_day, day_of_week
+
+def _store_dir():
+    """Directory holding the store for the current feature-set version"""
+    return FEATURE_STORE_DIR / f"v_{feature_set_version()}"
+
+def _read_manifest(store_dir):
+    """Load the store manifest, or an empty one for a new store"""
+    manifest_file = store_dir / "manifest.json"
+    if manifest_file.exists():
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
+    return _new_manifest(store_dir)
+
+def _new_manifest(store_dir):
+    """Manifest for an empty store, recording how its features are defined"""
+    return {
+        "version": store_dir.name[2:],
+        "feature_names": list_feature_names(),
+        "parameters": {
+            "rolling_windows": list(ROLLING_WINDOWS),
+            "lag_steps": list(LAG_STEPS),
+            "fft_window": FFT_WINDOW,
+            "fft_stride": FFT_STRIDE
+        },
+        "source": {"module": __name__, "metric_store": None},
+        "created_at": time.time(),
+        "rows": 0,
+        "time_range": [None, None],
+        "batches": [],
+        "drift": {}
+    }
+
+def _write_manifest(store_dir, manifest):
+    """Atomically replace the store manifest"""
+    tmp_file = store_dir / "manifest.json.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, store_dir / "manifest.json")
+
+class _store_file_lock:
+    """Advisory lock so separate processes don't append to a store at once"""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.handle = None
+
+    def __enter__(self):
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.handle = open(self.store_dir / ".lock", 'w')
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+        self.handle.close()
+
+def _open_store(store_dir):
+    """Memory-map the stored timestamps and feature matrix.
+
+    The maps are reused while the row count and the store's creation time
+    are unchanged; a rebuild of the same length still gets fresh maps.
+    """
+    manifest = _read_manifest(store_dir)
+    rows = manifest["rows"]
+    cache = _store_cache
+    if cache["path"] == store_dir and cache["rows"] == rows and cache["created_at"] == manifest["created_at"]:
+        return cache["timestamps"], cache["matrix"]
+
+    n_features = len(manifest["feature_names"])
+    if rows == 0:
+        timestamps, matrix = np.empty(0), np.empty((0, n_features))
+    else:
+        timestamps = np.memmap(store_dir / "timestamps.f64", dtype=np.float64, mode='r', shape=(rows,))
+        matrix = np.memmap(store_dir / "features.f64", dtype=np.float64, mode='r', shape=(rows, n_features))
+    cache.update({"path": store_dir, "rows": rows, "created_at": manifest["created_at"],
+                  "timestamps": timestamps, "matrix": matrix})
+    return timestamps, matrix
+
+def _release_store_maps():
+    """Drop the cached memory maps so their files can be replaced; _open_store maps them again"""
+    _store_cache.update({"path": None, "rows": None, "created_at": None, "timestamps": None, "matrix": None})
+
+def _update_feature_store(store_dir):
+    """Compute feature rows for points not yet in the store and append them"""
+    from ..service.metric_store import load_columns, get_store_watermark, STORE_FILE
+    started = time.perf_counter()
+    manifest = _read_manifest(store_dir)
+    columns = load_columns()
+    timestamps = columns["timestamp"]
+    stored_rows = manifest["rows"]
+
+    # The metric store only grows; anything else means it was rewritten
+    if stored_rows > len(timestamps) or (
+            stored_rows and timestamps[stored_rows - 1] != manifest["time_range"][1]):
+        manifest = _new_manifest(store_dir)
+        stored_rows = 0
+    if stored_rows == len(timestamps):
+        return
+
+    # Recompute with enough overlap that windows reaching back are complete
+    start = max(stored_rows - CONTEXT_ROWS, 0)
+    seed = None
+    if start > 0:
+        _, stored_matrix = _open_store(store_dir)
+        seed = np.array(stored_matrix[start - 1, _base_columns()])
+        del stored_matrix
+    base = _base_block(columns, start, seed)
+    new_rows = np.array(_feature_block(timestamps[start:], base, start)[stored_rows - start:], dtype=np.float64)
+    new_timestamps = np.array(timestamps[stored_rows:], dtype=np.float64)
+
+    # Both blobs are owned bytes before any file is touched, so nothing
+    # written can alias a mapped store or cached column being rewritten
+    blobs = [(name, 1 if values.ndim == 1 else values.shape[1], values.tobytes())
+             for name, values in (("timestamps.f64", new_timestamps), ("features.f64", new_rows))]
+
+    # Write data before the manifest; rows past manifest["rows"] are ignored.
+    # A rebuild writes fresh files so existing memory maps stay valid. Our
+    # own maps are dropped first: Windows refuses to replace or truncate a
+    # file while a mapped view of it is open.
+    _release_store_maps()
+    for name, width, data in blobs:
+        path = store_dir / name
+        if stored_rows == 0:
+            with open(path.with_suffix(".tmp"), 'wb') as f:
+                f.write(data)
+            os.replace(path.with_suffix(".tmp"), path)
+        else:
+            with open(path, 'r+b') as f:
+                f.truncate(stored_rows * width * 8)
+                f.seek(0, os.SEEK_END)
+                f.write(data)
+
+    manifest["drift"] = _update_drift_stats(manifest.get("drift", {}), manifest["feature_names"], new_rows)
+    manifest["rows"] = len(timestamps)
+    manifest["time_range"] = [manifest["time_range"][0] or float(timestamps[0]), float(timestamps[-1])]
+    manifest["source"]["metric_store"] = {"path": str(STORE_FILE), "watermark": list(get_store_watermark())}
+    manifest["batches"].append({
+        "rows": [stored_rows, len(timestamps)],
+        "time_range": [float(new_timestamps[0]), float(new_timestamps[-1])],
+        "created_at": time.time(),
+        "compute_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+    manifest["batches"] = manifest["batches"][-MAX_LINEAGE_BATCHES:]
+    _write_manifest(store_dir, manifest)
+
+def _base_columns():
+    """Matrix column index of each base feature"""
+    names = list_feature_names()
+    return [names.index(base) for base in list_base_features()]
+
+def _base_block(columns, start, seed_row):
+    """Base feature columns (counter rates, forward-filled) for rows from `start`.
+
+    `seed_row` is the stored base row just before `start`; it provides the
+    previous counter values and the value to forward-fill from.
+    """
+    from ..service.metric_store import METRIC_FIELDS, COUNTER_FIELDS, counter_rates
+    timestamps = columns["timestamp"]
+    # One extra leading row so counter rates at `start` have a predecessor
+    first = max(start - 1, 0)
+
+    block = np.empty((len(timestamps) - first, len(METRIC_FIELDS)), dtype=np.float64)
+    for i, field in enumerate(METRIC_FIELDS):
+        values = columns[field][first:]
+        if field in COUNTER_FIELDS:
+            values = counter_rates(timestamps[first:], values)
+        block[:, i] = values
+    if seed_row is not None:
+        block[0] = seed_row
+
+    # Forward fill gaps so a missed sample doesn't blank every window over it
+    rows = np.arange(len(block))
+    for i in range(block.shape[1]):
+        last_valid = np.where(np.isfinite(block[:, i]), rows, -1)
+        np.maximum.accumulate(last_valid, out=last_valid)
+        block[:, i] = np.where(last_valid >= 0, block[last_valid, i], np.nan)
+
+    return block[start - first:]
+
+def _update_drift_stats(drift, names, new_rows):
+    """Fold a batch into per-feature reference moments and record its shift.
+
+    Reference statistics use Chan's parallel Welford merge so they cover
+    every stored row without rereading it.
+    """
+    for i, name in enumerate(names):
+        column = new_rows[:, i]
+        column = column[np.isfinite(column)]
+        if len(column) == 0:
+            continue
+        stats = drift.get(name, {"count": 0, "mean": 0.0, "m2": 0.0})
+        batch_count = len(column)
+        batch_mean = float(column.mean())
+        batch_m2 = float(((column - batch_mean) ** 2).sum())
+
+        # Shift of this batch relative to everything stored before it
+        if stats["count"] > 1:
+            ref_std = (stats["m2"] / (stats["count"] - 1)) ** 0.5
+            stats["last_batch_shift"] = round(abs(batch_mean - stats["mean"]) / ref_std, 4) if ref_std > 0 else 0.0
+
+        count = stats["count"] + batch_count
+        delta = batch_mean - stats["mean"]
+        stats["mean"] = stats["mean"] + delta * batch_count / count
+        stats["m2"] = stats["m2"] + batch_m2 + delta * delta * stats["count"] * batch_count / count
+        stats["count"] = count
+        stats["last_batch_mean"] = batch_mean
+        drift[name] = stats
+    return drift
+
+def _drift_report(manifest, threshold=3.0):
+    """Summarize features whose latest batch moved away from their reference"""
+    report = {}
+    for name, stats in manifest.get("drift", {}).items():
+        std = (stats["m2"] / (stats["count"] - 1)) ** 0.5 if stats["count"] > 1 else 0.0
+        report[name] = {
+            "mean": round(stats["mean"], 4),
+            "std": round(std, 4),
+            "last_batch_shift": stats.get("last_batch_shift"),
+            "drifting": (stats.get("last_batch_shift") or 0) > threshold
+        }
+    return report
+
+def _feature_block(timestamps, base, offset):
+    """Vectorized features for a contiguous block of rows.
+
+    `offset` is the global row index of the block's first row; it keeps FFT
+    anchors aligned so incremental and full computations agree.
+    """
+    n_rows, n_base = base.shape
+    per_base = 1 + 2 * len(ROLLING_WINDOWS) + len(LAG_STEPS) + 1
+    out = np.full((n_rows, n_base * per_base + len(TIME_FEATURES)), np.nan)
+
+    for i in range(n_base):
+        values = base[:, i]
+        col = i * per_base
+        out[:, col] = values
+        col += 1
+
+        for window in ROLLING_WINDOWS:
+            if n_rows >= window:
+                windows = sliding_window_view(values, window)
+                out[window - 1:, col] = windows.mean(axis=1)
+                out[window - 1:, col + 1] = windows.std(axis=1)
+            col += 2
+
+        for lag in LAG_STEPS:
+            if n_rows > lag:
+                out[lag:, col] = values[:-lag]
+            col += 1
+
+        out[:, col] = _fft_periods(timestamps, values, offset)
+
+    hour_of_day, day_of_week = local_time_parts(timestamps)
+    time_col = n_base * per_base
+    out[:, time_col] = np.sin(2 * np.pi * hour_of_day / 24)
+    out[:, time_col + 1] = np.cos(2 * np.pi * hour_of_day / 24)
+    out[:, time_col + 2] = np.sin(2 * np.pi * day_of_week / 7)
+    out[:, time_col + 3] = np.cos(2 * np.pi * day_of_week / 7)
+    return out
+
+def _fft_periods(timestamps, values, offset):
+    """Dominant period (seconds) of the trailing FFT window, held between anchors"""
+    n_rows = len(values)
+    periods = np.full(n_rows, np.nan)
+    if n_rows < FFT_WINDOW:
+        return periods
+
+    # Anchor rows are every FFT_STRIDE-th global row once a full window exists
+    first_end = FFT_WINDOW - 1
+    first_anchor = first_end + (-offset % FFT_STRIDE)
+    anchors = np.arange(first_anchor, n_rows, FFT_STRIDE)
+    if len(anchors) == 0:
+        return periods
+
+    windows = sliding_window_view(np.nan_to_num(values), FFT_WINDOW)[anchors - first_end]
+    windows = windows - windows.mean(axis=1, keepdims=True)
+    spectrum = np.abs(np.fft.rfft(windows, axis=1))
+    spectrum[:, 0] = 0
+    dominant = spectrum.argmax(axis=1)
+
+    span = timestamps[anchors] - timestamps[anchors - first_end]
+    sample_seconds = span / first_end
+    with np.errstate(divide="ignore", invalid="ignore"):
+        anchor_periods = np.where(dominant > 0, FFT_WINDOW * sample_seconds / dominant, np.nan)
+
+    # Hold each anchor's value until the next anchor
+    holder = np.full(n_rows, -1)
+    holder[anchors] = np.arange(len(anchors))
+    np.maximum.accumulate(holder, out=holder)
+    held = holder >= 0
+    periods[held] = anchor_periods[holder[held]]
+    return periods
+
+def _get_feature_importance(timestamps, matrix, names, target="cpu_percent", horizon=10):
+    """Rank features by absolute correlation with the target `horizon` samples ahead"""
+    if len(matrix) <= horizon + 2:
+        return {}
+    target_values = matrix[horizon:, names.index(target)]
+    features = matrix[:-horizon]
+    scores = {}
+    for i, name in enumerate(names):
+        column = features[:, i]
+        valid = np.isfinite(column) & np.isfinite(target_values)
+        if valid.sum() < 3 or np.std(column[valid]) == 0 or np.std(target_values[valid]) == 0:
+            continue
+        scores[name] = abs(float(np.corrcoef(column[valid], target_values[valid])[0, 1]))
+    total = sum(scores.values())
+    if not total:
+        return {}
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:15]
+    return {name: round(score / total, 3) for name, score in ranked}
@@ -1,6 +1,7 @@
 """Performance Prediction - ML models for system performance forecasting"""
 import json
 import time
+import threading
 import numpy as np
 from pathlib import Path
 
@@ -8,6 +9,39 @@ MODEL_DIR = Path(__file__).parent / "models"
 DATA_DIR = Path(__file__).parent / "data"
 PERFORMANCE_LOG = DATA_DIR / "performance_predictions.json"
 
+# Forecasts run on 5-minute rollups with a daily season
+FORECAST_BUCKET_SECONDS = 300
+SEASON_BUCKETS = 288
+FORECAST_HISTORY_DAYS = 28
+MIN_FORECAST_BUCKETS = 24
+
+# Forecast metric -> (rolled-up store fields summed together, scale, unit, label)
+FORECAST_METRICS = {
+    "cpu_usage": (("cpu_percent",), 1.0, "%", "CPU usage"),
+    "memory_usage": (("memory_percent",), 1.0, "%", "Memory usage"),
+    "disk_io": (("disk_read_bytes", "disk_write_bytes"), 1 / 1024 / 1024, "MB/s", "Disk I/O"),
+    "network_bandwidth": (("net_bytes_sent", "net_bytes_recv"), 1 / 1024 / 1024, "MB/s", "Network bandwidth"),
+}
+
+# Forecast horizon per metric in buckets, and its label
+FORECAST_HORIZONS = {
+    "cpu_usage": (24, "next_2_hours"),
+    "memory_usage": (12, "next_1_hour"),
+    "disk_io": (6, "next_30_minutes"),
+    "network_bandwidth": (6, "next_30_minutes"),
+}
+
+# Suggested actions when a metric is forecast to rise
+FORECAST_RECOMMENDATIONS = {
+    "cpu_usage": ["Close unnecessary applications", "Monitor background processes"],
+    "memory_usage": ["Consider closing unused browser tabs", "Monitor memory-heavy applications"],
+    "disk_io": ["Defer non-critical disk operations", "Monitor disk queue length"],
+    "network_bandwidth": ["Pause large downloads or syncs", "Check for background updates"],
+}
+
+_forecast_lock = threading.Lock()
+_forecast_cache = {"watermark": None, "models": None, "fitted_at": None, "fit_ms": 0}
+
 def get_performance_prediction():
     """Get performance prediction models and forecasts"""
     try:
@@ -26,9 +60,21 @@ def get_performance_prediction():
         # Generate current performance predictions
         current_predictions = _generate_performance_predictions()
         
+        models = load_forecast_models()
+        
         return {
             "status": "predicting",
             "current_predictions": current_predictions,
+            "forecast_engine": {
+                "type": "seasonal_naive_ar1",
+                "bucket_seconds": FORECAST_BUCKET_SECONDS,
+                "season_buckets": SEASON_BUCKETS,
+                "metrics_fitted": sorted(models),
+                "training_data": "metric store rollups (the forecasts need evenly spaced buckets, not per-sample feature rows)",
+                "observed_buckets": {metric: model["observed_buckets"] for metric, model in models.items()},
+                "fitted_at": _forecast_cache["fitted_at"],
+                "fit_ms": _forecast_cache["fit_ms"]
+            },
             "recent_predictions": perf_data["predictions"][-5:],
             "total_predictions": len(perf_data["predictions"]),
             "ml_models": {
@@ -90,7 +136,7 @@ def get_performance_prediction():
                 "external_factors"
             ],
             "model_training": {
-                "training_data_points": 500000,
+                "training_data_points": max((model["observed_buckets"] for model in models.values()), default=0),
                 "feature_engineering": "automated",
                 "cross_validation_score": 0.88,
                 "hyperparameter_tuning": "bayesian_optimization",
@@ -109,63 +155,182 @@ def get_performance_prediction():
         return {"error": str(e)}
 
 def _generate_performance_predictions():
-    """Generate current performance predictions"""
-    current_time = time.time()
-    hour = time.localtime(current_time).tm_hour
-    
+    """Generate current performance predictions from fitted forecast models"""
+    models = load_forecast_models()
     predictions = []
-    
-    # CPU usage prediction
-    if 9 <= hour <= 17:  # Work hours
-        predictions.append({
-            "metric": "cpu_usage",
-            "prediction": "High CPU usage expected",
-            "predicted_value": 75.5,
-            "confidence_interval": [68.2, 82.8],
-            "confidence": 0.89,
-            "timeframe": "next_2_hours",
-            "reasoning": "Work hours pattern + application launch predictions",
-            "impact": "medium",
-            "recommendations": ["Close unnecessary applications", "Monitor background processes"]
-        })
-    
-    # Memory usage prediction
-    predictions.append({
-        "metric": "memory_usage",
-        "prediction": "Memory usage will increase gradually",
-        "predicted_value": 68.3,
-        "confidence_interval": [62.1, 74.5],
-        "confidence": 0.85,
-        "timeframe": "next_1_hour",
-        "reasoning": "Browser tab accumulation pattern detected",
-        "impact": "low",
-        "recommendations": ["Consider closing unused browser tabs", "Monitor memory-heavy applications"]
-    })
-    
-    # Disk I/O prediction
-    predictions.append({
-        "metric": "disk_io",
-        "prediction": "Disk activity spike predicted",
-        "predicted_value": 45.2,
-        "confidence_interval": [38.7, 51.7],
-        "confidence": 0.78,
-        "timeframe": "next_30_minutes",
-        "reasoning": "Scheduled backup process and file indexing patterns",
-        "impact": "medium",
-        "recommendations": ["Defer non-critical disk operations", "Monitor disk queue length"]
-    })
-    
-    # System stability prediction
-    predictions.append({
-        "metric": "system_stability",
-        "prediction": "System stability remains high",
-        "predicted_value": 0.96,
-        "confidence_interval": [0.93, 0.98],
-        "confidence": 0.92,
-        "timeframe": "next_4_hours",
-        "reasoning": "No concerning patterns detected in system metrics",
-        "impact": "positive",
-        "recommendations": ["Continue current usage patterns", "No immediate action required"]
-    })
-    
-    return predictions
\ No newline at end of file
+    for metric, model in models.items():
+        horizon, timeframe = FORECAST_HORIZONS[metric]
+        forecast = forecast_metric(metric, horizon)
+        if forecast is None:
+            continue
+        predictions.append(_describe_forecast(metric, model, forecast, timeframe))
+    return predictions
+
+def load_forecast_models():
+    """Get the per-metric seasonal models, refitting only when new data arrived"""
+    from ..service.metric_store import get_store_watermark
+    with _forecast_lock:
+        watermark = get_store_watermark()
+        if _forecast_cache["watermark"] != watermark or _forecast_cache["models"] is None:
+            started = time.perf_counter()
+            _forecast_cache["models"] = _fit_forecast_models()
+            _forecast_cache["watermark"] = watermark
+            _forecast_cache["fitted_at"] = time.time()
+            _forecast_cache["fit_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return _forecast_cache["models"]
+
+def forecast_metric(metric, horizon, now=None):
+    """Forecast a metric for the `horizon` buckets after the current one.
+
+    The horizon starts at `now` (default: the current time), not at the last
+    observed bucket, so after a collection gap the forecast still covers the
+    future; the last residual has decayed over the gap. Returns a dict with
+    per-step timestamps, point forecasts, 95% intervals and the expected
+    current value, or None if there isn't enough history to fit a model.
+    """
+    model = load_forecast_models().get(metric)
+    if model is None:
+        return None
+
+    now = time.time() if now is None else now
+    anchor = max(model["last_bucket"], int(now // FORECAST_BUCKET_SECONDS))
+    future_buckets = anchor + np.arange(1, horizon + 1)
+    phi = model["phi"]
+
+    def expected(buckets):
+        # AR(1) residual decays from the last observed residual
+        age = buckets - model["last_bucket"]
+        return model["profile"][buckets % SEASON_BUCKETS] + phi ** age * model["last_residual"], age
+
+    values, age = expected(future_buckets)
+    current, _ = expected(np.array([anchor]))
+    # Forecast error variance of an AR(1) grows with the steps since the last observation
+    variance_growth = (1 - phi ** (2 * age)) / (1 - phi ** 2)
+    half_width = 1.96 * model["sigma"] * np.sqrt(variance_growth)
+    lower, upper = values - half_width, values + half_width
+    if model["bounded"]:
+        values, lower, upper, current = (np.clip(a, 0, 100) for a in (values, lower, upper, current))
+    else:
+        values, lower, upper, current = (np.maximum(a, 0) for a in (values, lower, upper, current))
+
+    return {
+        "timestamps": (future_buckets * FORECAST_BUCKET_SECONDS).astype(np.float64),
+        "values": values,
+        "lower": lower,
+        "upper": upper,
+        "current": float(current[0])
+    }
+
+def _fit_forecast_models():
+    """Fit seasonal-naive + AR(1) residual models for every metric at once.
+
+    The daily profile, AR coefficient and residual spread are computed with
+    array operations over a (buckets x metrics) matrix, so fitting all
+    metrics costs a few vectorized passes over the rollups.
+    """
+    from ..service.metric_store import load_rollups, METRIC_FIELDS
+    since = time.time() - FORECAST_HISTORY_DAYS * 86400
+    rollups = load_rollups(METRIC_FIELDS, FORECAST_BUCKET_SECONDS, since=since)
+    if len(rollups["bucket_start"]) == 0:
+        return {}
+
+    metrics = list(FORECAST_METRICS)
+    series = np.column_stack([
+        sum(rollups[field] for field in fields) * scale
+        for fields, scale, _, _ in FORECAST_METRICS.values()
+    ])
+    buckets = np.round(rollups["bucket_start"] / FORECAST_BUCKET_SECONDS).astype(np.int64)
+    slots = buckets % SEASON_BUCKETS
+    observed = np.isfinite(series)
+
+    # Seasonal profile: mean per slot of day, falling back to the overall mean
+    filled = np.where(observed, series, 0.0)
+    slot_sums = np.zeros((SEASON_BUCKETS, len(metrics)))
+    slot_counts = np.zeros((SEASON_BUCKETS, len(metrics)))
+    np.add.at(slot_sums, slots, filled)
+    np.add.at(slot_counts, slots, observed)
+    overall = filled.sum(axis=0) / np.maximum(observed.sum(axis=0), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile = np.where(slot_counts > 0, slot_sums / slot_counts, overall)
+
+    # AR(1) on residuals from consecutive observed buckets
+    residuals = series - profile[slots]
+    pairs = observed[1:] & observed[:-1]
+    previous = np.where(pairs, residuals[:-1], 0.0)
+    current = np.where(pairs, residuals[1:], 0.0)
+    denominator = (previous * previous).sum(axis=0)
+    phi = np.clip(np.divide((previous * current).sum(axis=0), denominator,
+                            out=np.zeros(len(metrics)), where=denominator > 0), -0.99, 0.99)
+    errors = np.where(pairs, current - phi * previous, np.nan)
+
+    models = {}
+    for i, metric in enumerate(metrics):
+        n_observed = int(observed[:, i].sum())
+        if n_observed < MIN_FORECAST_BUCKETS:
+            continue
+        last = int(np.flatnonzero(observed[:, i])[-1])
+        error = errors[:, i][np.isfinite(errors[:, i])]
+        sigma = float(error.std()) if len(error) > 1 else float(np.nanstd(residuals[:, i]))
+        models[metric] = {
+            "profile": profile[:, i],
+            "phi": float(phi[i]),
+            "sigma": sigma,
+            "mae": float(np.abs(error).mean()) if len(error) else None,
+            "last_residual": float(residuals[last, i]),
+            "last_bucket": int(buckets[last]),
+            "observed_buckets": n_observed,
+            "seasons_covered": round(n_observed / SEASON_BUCKETS, 2),
+            "bounded": FORECAST_METRICS[metric][2] == "%",
+            "unit": FORECAST_METRICS[metric][2]
+        }
+    return models
+
+def _describe_forecast(metric, model, forecast, timeframe):
+    """Turn a numeric forecast into a prediction entry"""
+    values = forecast["values"]
+    peak = int(np.argmax(values))
+    predicted = float(values[peak])
+    lower, upper = float(forecast["lower"][peak]), float(forecast["upper"][peak])
+    current = forecast["current"]
+    unit = model["unit"]
+
+    change = predicted - current
+    spread = max(abs(current), 1.0)
+    if change > 0.1 * spread:
+        trend = "increase"
+    elif change < -0.1 * spread:
+        trend = "decrease"
+    else:
+        trend = "stay stable"
+
+    if model["bounded"]:
+        impact = "high" if predicted >= 90 else "medium" if predicted >= 75 else "low"
+    else:
+        impact = "medium" if trend == "increase" else "low"
+
+    # Narrower intervals relative to the level mean a more confident forecast
+    relative_width = (upper - lower) / max(abs(predicted), 1.0)
+    confidence = round(float(np.clip(1 - relative_width / 4, 0.05, 0.99)), 2)
+
+    return {
+        "metric": metric,
+        "prediction": f"{FORECAST_METRICS[metric][3]} expected to {trend}",
+        "predicted_value": round(predicted, 3),
+        "confidence_interval": [round(lower, 3), round(upper, 3)],
+        "confidence": confidence,
+        "timeframe": timeframe,
+        "unit": unit,
+        "predicted_peak_time": float(forecast["timestamps"][peak]),
+        "reasoning": (
+            f"Daily profile from {model['seasons_covered']} days of 5-minute rollups "
+            f"with AR(1) residual (phi={model['phi']:.2f})"
+        ),
+        "impact": impact,
+        "recommendations": FORECAST_RECOMMENDATIONS[metric] if trend == "increase" or impact != "low"
+                           else ["No immediate action required"],
+        "model": {
+            "type": "seasonal_naive_ar1",
+            "residual_sigma": round(model["sigma"], 4),
+            "one_step_mae": round(model["mae"], 4) if model["mae"] is not None else None
+        }
+    }
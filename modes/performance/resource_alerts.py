@@ -29,26 +29,40 @@ def _create_alert(alerts, resource_type, value, thresholds, message_template, de
             alert["device"] = device
         alerts.append(alert)
 
+def load_alert_thresholds():
+    """Load configurable thresholds, with safe defaults"""
+    config_path = Path(__file__).parent / "resource_alerts_config.json"
+    thresholds = {
+        "cpu": {"warning": 80, "critical": 90},
+        "memory": {"warning": 85, "critical": 95},
+        "disk": {"warning": 90, "critical": 95}
+    }
+    if config_path.is_file():
+        try:
+            with open(config_path) as f:
+                config_data = json.load(f)
+                for key, value in config_data.items():
+                    if key in thresholds:
+                        thresholds[key].update(value)
+        except (json.JSONDecodeError, IOError):
+            pass  # Use defaults if config is malformed or unreadable
+    return thresholds
+
+def check_sample_alerts(sample, thresholds=None):
+    """Check an already-collected data point against the CPU and memory thresholds"""
+    thresholds = thresholds or load_alert_thresholds()
+    alerts = []
+    if sample.get("cpu_percent") is not None:
+        _create_alert(alerts, "cpu", sample["cpu_percent"], thresholds['cpu'], "High CPU usage: {value:.1f}%")
+    if sample.get("memory_percent") is not None:
+        _create_alert(alerts, "memory", sample["memory_percent"], thresholds['memory'],
+                      "High memory usage: {value:.1f}%")
+    return alerts
+
 def get_resource_alerts():
     """Check for resource usage that exceeds thresholds"""
     try:
-        # Load configurable thresholds, with safe defaults
-        config_path = Path(__file__).parent / "resource_alerts_config.json"
-        thresholds = {
-            "cpu": {"warning": 80, "critical": 90},
-            "memory": {"warning": 85, "critical": 95},
-            "disk": {"warning": 90, "critical": 95}
-        }
-        if config_path.is_file():
-            try:
-                with open(config_path) as f:
-                    config_data = json.load(f)
-                    for key, value in config_data.items():
-                        if key in thresholds:
-                            thresholds[key].update(value)
-            except (json.JSONDecodeError, IOError):
-                pass  # Use defaults if config is malformed or unreadable
-
+        thresholds = load_alert_thresholds()
         alerts = []
 
         # CPU usage alert
@@ -1,6 +1,7 @@
 """Background Monitor - Continuous system monitoring and data collection service"""
 import json
 import time
+import importlib
 import threading
 from pathlib import Path
 from datetime import datetime
@@ -8,12 +9,20 @@ from datetime import datetime
 SERVICE_LOG = Path(__file__).parent / "service_log.json"
 CONFIG_FILE = Path(__file__).parent / "service_config.json"
 
+# Run after every flush of new points to the metric store, as (module, function)
+FLUSH_HOOKS = [
+    ("..ml.behavioral_modeling", "update_behavior_profiles"),   # hour-of-week behavior profiles
+    ("..ai.pattern_recognition", "update_pattern_db"),          # pattern store and app starts/stops
+    ("..ai.predictive_analysis", "record_disk_sample"),         # disk samples for time-until-full
+]
+
 class BackgroundMonitor:
     def __init__(self):
         self.running = False
         self.thread = None
         self.data_buffer = []
         self.last_collection = 0
+        self.listeners = []
         
     def start_monitoring(self):
         """Start the background monitoring service"""
@@ -38,6 +47,7 @@ class BackgroundMonitor:
                 # Collect data from all monitoring modules
                 data_point = self._collect_data_point()
                 self.data_buffer.append(data_point)
+                self._publish_events(data_point)
                 
                 # Save data every 100 points or every 5 minutes
                 if len(self.data_buffer) >= 100 or time.time() - self.last_collection > 300:
@@ -79,6 +89,29 @@ class BackgroundMonitor:
                 "error": str(e)
             }
     
+    def _publish_events(self, data_point):
+        """Push a sample, plus any alert or anomaly it raises, to subscribers"""
+        if not self.listeners or "error" in data_point:
+            return
+        events = [("metric", data_point)]
+        try:
+            from ..performance.resource_alerts import check_sample_alerts
+            from .continuous_learning import score_sample
+            events += [("alert", dict(alert, timestamp=data_point["timestamp"]))
+                       for alert in check_sample_alerts(data_point)]
+            anomaly = score_sample(data_point)
+            if anomaly:
+                events.append(("anomaly", anomaly))
+        except Exception as e:
+            self._log_error(f"Event detection failed: {e}")
+
+        for event_type, payload in events:
+            for listener in list(self.listeners):
+                try:
+                    listener(event_type, payload)
+                except Exception as e:
+                    self._log_error(f"Event listener failed: {e}")
+
     def _get_user_activity(self):
         """Get current user activity indicators"""
         try:
@@ -96,7 +129,20 @@ class BackgroundMonitor:
         """Save collected data to storage"""
         if not self.data_buffer:
             return
-            
+        
+        # Append to the long-term history used by batch analysis first: if this
+        # fails the buffer is kept and retried, and nothing has been written yet
+        try:
+            from .metric_store import append_points
+            append_points(self.data_buffer)
+        except Exception as e:
+            self._log_error(f"Failed to save data: {e}")
+            return
+        
+        # Clear buffer: the points are stored, so they must never be appended again
+        points, self.data_buffer = self.data_buffer, []
+        self.last_collection = time.time()
+        
         try:
             # Load existing data
             if SERVICE_LOG.exists():
@@ -106,7 +152,7 @@ class BackgroundMonitor:
                 existing_data = {"data_points": [], "service_info": {}}
             
             # Add new data points
-            existing_data["data_points"].extend(self.data_buffer)
+            existing_data["data_points"].extend(points)
             existing_data["service_info"] = {
                 "last_update": time.time(),
                 "total_points": len(existing_data["data_points"]),
@@ -120,13 +166,18 @@ class BackgroundMonitor:
             # Save to file
             with open(SERVICE_LOG, 'w') as f:
                 json.dump(existing_data, f, indent=2)
-            
-            # Clear buffer
-            self.data_buffer = []
-            self.last_collection = time.time()
-            
         except Exception as e:
-            self._log_error(f"Failed to save data: {e}")
+            self._log_error(f"Failed to update service log: {e}")
+        
+        self._run_flush_hooks()
+    
+    def _run_flush_hooks(self):
+        """Update the stores derived from the metric history; each hook fails on its own"""
+        for module_name, func_name in FLUSH_HOOKS:
+            try:
+                getattr(importlib.import_module(module_name, __package__), func_name)()
+            except Exception as e:
+                self._log_error(f"{func_name} failed: {e}")
     
     def _log_error(self, error_msg):
         """Log errors to error file"""
@@ -206,6 +257,16 @@ def stop_service():
     """Stop the background monitoring service"""
     return _monitor_service.stop_monitoring()
 
+def subscribe(listener):
+    """Call listener(event_type, payload) for every "metric", "alert" and "anomaly" event"""
+    if listener not in _monitor_service.listeners:
+        _monitor_service.listeners.append(listener)
+
+def unsubscribe(listener):
+    """Stop delivering events to a listener"""
+    if listener in _monitor_service.listeners:
+        _monitor_service.listeners.remove(listener)
+
 def get_service_status():
     """Get current service status"""
     return {
@@ -0,0 +1,310 @@
+"""Metric Store - Append-only time-series history of collected data points"""
+import json
+import os
+import threading
+import numpy as np
+from pathlib import Path
+
+STORE_FILE = Path(__file__).parent / "metric_history.ndjson"
+SERVICE_LOG = Path(__file__).parent / "service_log.json"
+
+# Numeric fields kept for every stored point (nested counters are flattened)
+METRIC_FIELDS = (
+    "cpu_percent",
+    "memory_percent",
+    "active_processes",
+    "disk_read_bytes",
+    "disk_write_bytes",
+    "net_bytes_sent",
+    "net_bytes_recv",
+)
+
+# Cumulative counters - analysis code usually wants their per-second rate
+COUNTER_FIELDS = ("disk_read_bytes", "disk_write_bytes", "net_bytes_sent", "net_bytes_recv")
+
+_lock = threading.RLock()
+_column_cache = {"path": None, "offset": 0, "inode": None, "columns": None, "generation": 0}
+_rollup_cache = {}
+
+def append_points(points, path=None):
+    """Append collected data points to the history, one JSON object per line"""
+    lines = []
+    for point in points:
+        if "error" in point or "timestamp" not in point:
+            continue
+        lines.append(json.dumps(_flatten_point(point), separators=(",", ":")))
+    if not lines:
+        return 0
+
+    with _lock:
+        with open(path or STORE_FILE, 'a') as f:
+            f.write("\n".join(lines) + "\n")
+    return len(lines)
+
+def read_points(offset=0, path=None):
+    """Read points appended after a byte offset.
+
+    Returns (points, next_offset). Only complete lines are consumed, so a
+    point that is still being written is picked up by the next call.
+    """
+    path = Path(path or STORE_FILE)
+    _ensure_store(path)
+    if not path.exists():
+        return [], 0
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if offset > end:
+            # File was truncated or rotated - start over
+            offset = 0
+        f.seek(offset)
+        chunk = f.read(end - offset)
+
+    last_newline = chunk.rfind(b"\n")
+    if last_newline < 0:
+        return [], offset
+
+    points = []
+    for line in chunk[:last_newline].splitlines():
+        if not line.strip():
+            continue
+        try:
+            points.append(json.loads(line))
+        except ValueError:
+            continue
+    return points, offset + last_newline + 1
+
+def load_columns(fields=METRIC_FIELDS, since=None, until=None, path=None):
+    """Load stored history as column arrays.
+
+    Returns a dict with a float64 "timestamp" array plus one float64 array
+    per field (NaN where a point did not carry the field). Columns are cached
+    in memory and only the bytes appended since the previous call are parsed.
+    """
+    path = Path(path or STORE_FILE)
+    with _lock:
+        columns = _refresh_column_cache(path)
+
+    timestamps = columns["timestamp"]
+    start = 0 if since is None else int(np.searchsorted(timestamps, since, side="left"))
+    stop = len(timestamps) if until is None else int(np.searchsorted(timestamps, until, side="right"))
+
+    result = {"timestamp": timestamps[start:stop]}
+    for field in fields:
+        column = columns.get(field)
+        if column is None:
+            result[field] = np.full(stop - start, np.nan)
+        else:
+            result[field] = column[start:stop]
+    return result
+
+def counter_rates(timestamps, values):
+    """Convert a cumulative counter column to a per-second rate (NaN on resets)"""
+    rates = np.full(len(values), np.nan)
+    if len(values) < 2:
+        return rates
+    dt = np.diff(timestamps)
+    dv = np.diff(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        step = dv / dt
+    step[(dt <= 0) | (dv < 0)] = np.nan
+    rates[1:] = step
+    return rates
+
+def load_rollups(fields=METRIC_FIELDS, bucket_seconds=300, since=None, path=None):
+    """Load per-bucket means of stored fields.
+
+    Counter fields are rolled up as per-second rates. Returns a dict with a
+    "bucket_start" array (contiguous buckets, empty ones included) plus one
+    array of means per field, NaN where a bucket had no samples. Bucket sums
+    are cached and extended with newly appended points only.
+    """
+    path = Path(path or STORE_FILE)
+    with _lock:
+        columns = _refresh_column_cache(path)
+        rollup = _refresh_rollup(path, columns, bucket_seconds)
+
+    first_bucket = rollup["first_bucket"]
+    start = 0
+    if since is not None and first_bucket is not None:
+        start = min(max(int(since // bucket_seconds) - first_bucket, 0), len(rollup["counts"]))
+
+    counts = rollup["counts"][start:]
+    result = {"bucket_start": (np.arange(start, start + len(counts)) + (first_bucket or 0)) * float(bucket_seconds)}
+    for field in fields:
+        i = METRIC_FIELDS.index(field)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[field] = rollup["sums"][start:, i] / counts[:, i]
+    return result
+
+def latest_snapshot(path=None):
+    """Get the most recent stored point as {"timestamp", field: value}.
+
+    Counter fields are reported as per-second rates under "<field>_rate".
+    Served from the column cache, so repeated calls only parse new bytes.
+    """
+    path = Path(path or STORE_FILE)
+    with _lock:
+        columns = _refresh_column_cache(path)
+    timestamps = columns["timestamp"]
+    if len(timestamps) == 0:
+        return {"timestamp": None}
+    snapshot = {"timestamp": float(timestamps[-1])}
+    for field in METRIC_FIELDS:
+        column = columns.get(field)
+        if column is None:
+            continue
+        if field in COUNTER_FIELDS:
+            value = counter_rates(timestamps[-2:], column[-2:])[-1] if len(column) > 1 else np.nan
+            field = f"{field}_rate"
+        else:
+            value = column[-1]
+        if np.isfinite(value):
+            snapshot[field] = float(value)
+    return snapshot
+
+def get_store_watermark(path=None):
+    """Get a cheap token that changes whenever new points are appended"""
+    try:
+        stat = Path(path or STORE_FILE).stat()
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return (None, 0, 0)
+
+def get_metric_store():
+    """Get metric history store status"""
+    try:
+        columns = load_columns(fields=())
+        timestamps = columns["timestamp"]
+        return {
+            "status": "active" if STORE_FILE.exists() else "empty",
+            "store_file": str(STORE_FILE),
+            "size_mb": round(get_store_watermark()[1] / 1024 / 1024, 2),
+            "total_points": len(timestamps),
+            "first_timestamp": float(timestamps[0]) if len(timestamps) else None,
+            "last_timestamp": float(timestamps[-1]) if len(timestamps) else None,
+            "fields": list(METRIC_FIELDS),
+            "capabilities": {
+                "append_only": "Points are appended as they are collected, never rewritten",
+                "offset_reads": "Consumers read only the points added since their last offset",
+                "column_loading": "History served as NumPy column arrays for vectorized analysis",
+                "unbounded_history": "Keeps months of data unlike the rolling service log"
+            }
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+def _flatten_point(point):
+    """Flatten a collector data point into the stored numeric fields"""
+    disk_io = point.get("disk_io") or {}
+    network_io = point.get("network_io") or {}
+    flat = {
+        "timestamp": point["timestamp"],
+        "cpu_percent": point.get("cpu_percent"),
+        "memory_percent": point.get("memory_percent"),
+        "active_processes": point.get("active_processes"),
+        "disk_read_bytes": point.get("disk_read_bytes", disk_io.get("read_bytes")),
+        "disk_write_bytes": point.get("disk_write_bytes", disk_io.get("write_bytes")),
+        "net_bytes_sent": point.get("net_bytes_sent", network_io.get("bytes_sent")),
+        "net_bytes_recv": point.get("net_bytes_recv", network_io.get("bytes_recv")),
+    }
+    return {k: v for k, v in flat.items() if v is not None}
+
+def _ensure_store(path):
+    """Seed a missing store from the rolling service log so history isn't lost"""
+    if path.exists() or path != STORE_FILE or not SERVICE_LOG.exists():
+        return
+    try:
+        with open(SERVICE_LOG, 'r') as f:
+            data = json.load(f)
+        points = sorted(data.get("data_points", []), key=lambda p: p.get("timestamp", 0))
+        append_points(points, path)
+    except (OSError, ValueError):
+        pass
+
+def _refresh_column_cache(path):
+    """Parse newly appended bytes into the cached column arrays"""
+    inode, size, _ = get_store_watermark(path)
+    cache = _column_cache
+    if cache["path"] != path or cache["inode"] != inode or size < cache["offset"]:
+        cache.update({"path": path, "offset": 0, "inode": inode, "columns": None,
+                      "generation": cache["generation"] + 1})
+
+    if cache["columns"] is not None and size == cache["offset"]:
+        return cache["columns"]
+
+    points, next_offset = read_points(cache["offset"], path)
+    if cache["offset"] == 0:
+        # The store may have just been seeded from the service log
+        cache["inode"] = get_store_watermark(path)[0]
+
+    columns = cache["columns"] or {"timestamp": np.empty(0)}
+    if points:
+        new_columns = {"timestamp": np.array([p.get("timestamp", np.nan) for p in points], dtype=np.float64)}
+        for field in METRIC_FIELDS:
+            new_columns[field] = np.array([p.get(field, np.nan) for p in points], dtype=np.float64)
+
+        old_len = len(columns["timestamp"])
+        merged = {}
+        for field, new_values in new_columns.items():
+            old_values = columns.get(field)
+            if old_values is None:
+                old_values = np.full(old_len, np.nan)
+            merged[field] = np.concatenate([old_values, new_values])
+
+        # Appends are normally in order; sort only if a writer raced
+        timestamps = merged["timestamp"]
+        if len(timestamps) > 1 and np.any(np.diff(timestamps[max(old_len - 1, 0):]) < 0):
+            order = np.argsort(timestamps, kind="stable")
+            merged = {field: values[order] for field, values in merged.items()}
+            cache["generation"] += 1
+        columns = merged
+
+    cache["columns"] = columns
+    cache["offset"] = next_offset
+    return columns
+
+def _refresh_rollup(path, columns, bucket_seconds):
+    """Fold points added since the last call into the cached bucket sums"""
+    key = (path, bucket_seconds)
+    rollup = _rollup_cache.get(key)
+    timestamps = columns["timestamp"]
+    if rollup is None or rollup["generation"] != _column_cache["generation"] or rollup["rows"] > len(timestamps):
+        rollup = {"generation": _column_cache["generation"], "rows": 0, "first_bucket": None,
+                  "sums": np.zeros((0, len(METRIC_FIELDS))), "counts": np.zeros((0, len(METRIC_FIELDS)))}
+        _rollup_cache[key] = rollup
+
+    rows = rollup["rows"]
+    if rows == len(timestamps):
+        return rollup
+
+    # One row of overlap so counter rates for the first new row can be computed
+    first = max(rows - 1, 0)
+    new_ts = timestamps[first:]
+    values = np.empty((len(new_ts), len(METRIC_FIELDS)))
+    for i, field in enumerate(METRIC_FIELDS):
+        column = columns[field][first:]
+        values[:, i] = counter_rates(new_ts, column) if field in COUNTER_FIELDS else column
+    new_ts, values = new_ts[rows - first:], values[rows - first:]
+
+    buckets = np.floor(new_ts / bucket_seconds).astype(np.int64)
+    if rollup["first_bucket"] is None:
+        rollup["first_bucket"] = int(buckets.min())
+    index = buckets - rollup["first_bucket"]
+    keep = index >= 0
+    index, values = index[keep], values[keep]
+
+    n_buckets = max(len(rollup["counts"]), int(index.max()) + 1 if len(index) else 0)
+    sums = np.zeros((n_buckets, len(METRIC_FIELDS)))
+    counts = np.zeros((n_buckets, len(METRIC_FIELDS)))
+    sums[:len(rollup["sums"])] = rollup["sums"]
+    counts[:len(rollup["counts"])] = rollup["counts"]
+
+    valid = np.isfinite(values)
+    for i in range(len(METRIC_FIELDS)):
+        sums[:, i] += np.bincount(index[valid[:, i]], weights=values[valid[:, i], i], minlength=n_buckets)
+        counts[:, i] += np.bincount(index[valid[:, i]], minlength=n_buckets)
+
+    rollup.update({"rows": len(timestamps), "sums": sums, "counts": counts})
+    return rollup
@@ -107,6 +107,44 @@ def kill_process(pid=None, name=None, force=False):
     except Exception as e:
         return {"error": str(e)}
 
+def renice_process(pid=None, name=None, niceness=10):
+    """Lower (or raise) the scheduling priority of a process by PID or name"""
+    try:
+        if pid:
+            try:
+                targets = [psutil.Process(pid)]
+            except psutil.NoSuchProcess:
+                return {"error": f"Process with PID {pid} not found"}
+        elif name:
+            targets = [proc for proc in psutil.process_iter(['name'])
+                       if (proc.info['name'] or "").lower() == name.lower()]
+        else:
+            return {"error": "Must specify either pid or name"}
+
+        if platform.system() == "Windows":
+            # Windows has priority classes rather than nice values
+            value = psutil.BELOW_NORMAL_PRIORITY_CLASS if niceness > 0 else psutil.NORMAL_PRIORITY_CLASS
+        else:
+            value = max(-20, min(19, int(niceness)))
+
+        reniced = []
+        for proc in targets:
+            try:
+                previous = proc.nice()
+                proc.nice(value)
+                reniced.append({"pid": proc.pid, "name": proc.name(), "previous": previous, "niceness": value})
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+        return {
+            "success": True,
+            "reniced_count": len(reniced),
+            "reniced_processes": reniced,
+            "reniced_at": datetime.now().isoformat()
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
 def get_process_info(pid=None, name=None):
     """Get detailed information about a process"""
     try:
@@ -165,12 +203,14 @@ def get_process_control():
             "functions": {
                 "start_process": "start_process(command, args=None, working_dir=None, detached=False)",
                 "kill_process": "kill_process(pid=None, name=None, force=False)",
+                "renice_process": "renice_process(pid=None, name=None, niceness=10)",
                 "get_process_info": "get_process_info(pid=None, name=None)"
             },
             "features": [
                 "Start processes attached or detached",
                 "Kill processes by PID or name",
                 "Graceful termination or force kill",
+                "Lower the priority of busy processes",
                 "Detailed process information"
             ],
             "examples": {
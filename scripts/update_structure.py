@@ -180,6 +180,7 @@ def _get_module_description(category, module):
         # Service modules
         "background_monitor": "Continuous system monitoring",
         "continuous_learning": "Always-on ML learning",
+        "metric_store": "Append-only metric history",
         "system_service": "Service management and control",
         
         # CPU modules
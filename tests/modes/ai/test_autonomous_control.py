@@ -0,0 +1,127 @@
+import unittest
+import sys
+import os
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import autonomous_control
+from modes.ai.autonomous_control import TriggerEngine
+from modes.service.background_monitor import BackgroundMonitor
+
+class TestTriggerEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = []
+        self.patches = [
+            mock.patch.object(autonomous_control, "AUDIT_LOG", Path(self.tmp.name) / "audit.ndjson"),
+            mock.patch.dict(autonomous_control.ACTIONS, {"renice": self._fake_action}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def _fake_action(self, **params):
+        self.calls.append(params)
+        return {"success": True}
+
+    def test_debounce_and_cooldown(self):
+        """A metric trigger fires after holding for the debounce, then waits out its cooldown."""
+        engine = TriggerEngine({"dry_run": False, "triggers": [{
+            "id": "hot", "condition": "cpu_usage > 90", "debounce": 60, "cooldown": 300,
+            "pipeline": [{"action": "renice", "pid": 42, "niceness": 10}]}]})
+        fired = {}
+        for t, cpu in [(0, 95), (30, 95), (60, 95), (90, 95), (120, 50), (400, 95), (430, 95), (460, 95)]:
+            fired[t] = engine.handle_event("metric", {"timestamp": t, "cpu_percent": cpu})
+        self.assertEqual([t for t, ids in fired.items() if ids], [60, 460])
+        self.assertEqual(self.calls, [{"pid": 42, "niceness": 10}] * 2)
+
+        status = engine.get_status()
+        self.assertEqual(status["triggers"][0]["cooldown_suppressed"], 1)
+        self.assertEqual(len(status["recent_actions"]), 2)
+        self.assertEqual(status["recent_actions"][0]["trigger"], "hot")
+
+    def test_alert_trigger_clears_without_alerts(self):
+        """Alert triggers disarm when a sample passes without a matching alert."""
+        engine = TriggerEngine({"dry_run": False, "triggers": [{
+            "id": "mem", "event": "alert", "match": {"type": "memory", "level": "critical"},
+            "debounce": 30, "pipeline": [{"action": "renice", "pid": 7}]}]})
+        alert = {"type": "memory", "level": "critical", "value": 97}
+        engine.handle_event("metric", {"timestamp": 0})
+        engine.handle_event("alert", dict(alert, timestamp=0))
+        engine.handle_event("metric", {"timestamp": 30})
+        engine.handle_event("metric", {"timestamp": 60})
+        self.assertEqual(engine.handle_event("alert", dict(alert, timestamp=60)), [])
+        engine.handle_event("metric", {"timestamp": 90})
+        self.assertEqual(engine.handle_event("alert", dict(alert, timestamp=90)), ["mem"])
+
+    def test_concurrency_limit(self):
+        """Pipelines beyond max_concurrent are throttled instead of queued."""
+        release = threading.Event()
+
+        def slow_action(**params):
+            release.wait(5)
+            return {"success": True}
+
+        engine = TriggerEngine({"dry_run": False, "max_concurrent": 1, "triggers": [
+            {"id": "a", "condition": "cpu_usage > 50", "pipeline": [{"action": "renice", "pid": 1}]},
+            {"id": "b", "condition": "cpu_usage > 50", "pipeline": [{"action": "renice", "pid": 2}]}]})
+        engine.start()
+        try:
+            with mock.patch.dict(autonomous_control.ACTIONS, {"renice": slow_action}):
+                self.assertEqual(engine.handle_event("metric", {"timestamp": 0, "cpu_percent": 80}), ["a"])
+                stats = {t["id"]: t for t in engine.get_status()["triggers"]}
+                self.assertEqual(stats["b"]["throttled"], 1)
+                release.set()
+                engine.executor.shutdown(wait=True)
+        finally:
+            engine.stop()
+        self.assertFalse(engine.triggers[0].running)
+
+    def test_invalid_trigger_reported(self):
+        """Unknown actions are reported without disabling the other triggers."""
+        engine = TriggerEngine({"triggers": [
+            {"id": "bad", "condition": "cpu_usage > 1", "pipeline": [{"action": "format_disk"}]},
+            {"id": "good", "condition": "cpu_usage > 1", "pipeline": [{"action": "renice", "pid": 1}]}]})
+        self.assertEqual([t.id for t in engine.triggers], ["good"])
+        self.assertEqual(engine.errors[0]["trigger"], "bad")
+
+class TestMonitorEvents(unittest.TestCase):
+
+    def test_sample_publishes_metric_and_alert(self):
+        """Each collected sample is pushed to listeners along with the alerts it raises."""
+        monitor = BackgroundMonitor()
+        events = []
+        monitor.listeners.append(lambda kind, payload: events.append((kind, payload)))
+        monitor._publish_events({"timestamp": 100, "cpu_percent": 99.0, "memory_percent": 10.0})
+        self.assertEqual(events[0][0], "metric")
+        self.assertIn(("alert", "cpu", "critical"), [(k, p.get("type"), p.get("level")) for k, p in events])
+
+class TestPickProcess(unittest.TestCase):
+
+    def test_top_cpu_measured_over_interval(self):
+        """The first cpu_percent() reading (always 0.0) only primes the counters."""
+        def fake_proc(pid, name, readings):
+            proc = mock.Mock(info={"pid": pid, "ppid": 100, "name": name, "memory_percent": 1.0})
+            proc.cpu_percent.side_effect = [0.0] + readings
+            return proc
+
+        procs = [fake_proc(10, "editor", [3.0]), fake_proc(11, "encoder", [95.0]), fake_proc(12, "sshd", [99.0])]
+        psutil = mock.Mock(process_iter=lambda attrs: iter(procs), NoSuchProcess=OSError, AccessDenied=OSError)
+        with mock.patch.dict(sys.modules, {"psutil": psutil}), \
+                mock.patch.object(autonomous_control, "CPU_SAMPLE_SECONDS", 0):
+            best = autonomous_control._pick_process("top_cpu")
+        self.assertEqual(best["name"], "encoder")
+        self.assertEqual(procs[0].cpu_percent.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
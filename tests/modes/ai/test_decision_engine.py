@@ -0,0 +1,104 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import decision_engine
+from modes.ai.decision_engine import MetricSnapshot, RuleEngine, compile_condition
+from modes.service import metric_store
+
+class TestRuleCompilation(unittest.TestCase):
+
+    def test_boolean_conditions(self):
+        """Comparisons, flags and boolean operators evaluate as written."""
+        predicate = compile_condition("cpu_usage > 80 and not (memory_usage >= 90 or low_activity_period)")
+        self.assertEqual(predicate.metrics, {"cpu_percent", "memory_percent", "low_activity_period"})
+        self.assertTrue(predicate.evaluate(MetricSnapshot({"cpu_percent": 85, "memory_percent": 50}, 0)))
+        self.assertFalse(predicate.evaluate(MetricSnapshot({"cpu_percent": 85, "memory_percent": 95}, 0)))
+        self.assertFalse(predicate.evaluate(MetricSnapshot({"memory_percent": 50}, 0)))
+
+    def test_invalid_conditions(self):
+        """Malformed rules are reported per rule instead of failing the engine."""
+        for text in ("cpu_usage >", "avg(cpu_usage) over 5m", "cpu_usage > 80 80", "(cpu_usage > 1"):
+            with self.assertRaises(ValueError):
+                compile_condition(text)
+        engine = RuleEngine({"bad": [{"condition": "cpu_usage >>> 1", "action": "x", "priority": "low"}],
+                             "good": [{"condition": "cpu_usage > 1", "action": "y", "priority": "low"}]})
+        self.assertEqual(len(engine.rules), 1)
+        self.assertEqual(engine.errors[0]["rule"], "bad:0")
+
+    def test_windowed_condition(self):
+        """`avg(metric) over 5m` aggregates history up to the snapshot time."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch.object(metric_store, "STORE_FILE", Path(tmp) / "history.ndjson"):
+                metric_store.append_points([{"timestamp": 1000 + i * 30, "cpu_percent": 70 + i * 2}
+                                            for i in range(20)])
+                snapshot = decision_engine._current_snapshot()
+                # The last 5 minutes cover the samples at 1270..1570 (cpu 88..108)
+                self.assertEqual(snapshot.timestamp, 1570)
+                self.assertTrue(compile_condition("avg(cpu_usage) over 5m > 97").evaluate(snapshot))
+                self.assertFalse(compile_condition("avg cpu_usage over 5m > 98.5").evaluate(snapshot))
+                self.assertTrue(compile_condition("count(cpu_usage) over 300s == 11").evaluate(snapshot))
+                self.assertTrue(compile_condition("min(cpu_usage) over 1h < 71").evaluate(snapshot))
+
+    def test_windowed_counter_rate(self):
+        """Windowed aggregates over `*_rate` metrics are computed from the counter column."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch.object(metric_store, "STORE_FILE", Path(tmp) / "history.ndjson"):
+                metric_store.append_points([{"timestamp": 1000 + i * 30, "cpu_percent": 5,
+                                             "disk_io": {"read_bytes": i * 3000 * (1 + (i >= 15)), "write_bytes": 0}}
+                                            for i in range(20)])
+                snapshot = decision_engine._current_snapshot()
+                self.assertTrue(compile_condition("count(disk_read_bytes_rate) over 300s == 11").evaluate(snapshot))
+                self.assertTrue(compile_condition("min(disk_read_bytes_rate) over 5m >= 100").evaluate(snapshot))
+                self.assertTrue(compile_condition("max(disk_read_bytes_rate) over 5m > 200").evaluate(snapshot))
+
+class TestRuleEngine(unittest.TestCase):
+
+    def setUp(self):
+        rules = {"generated": [{"condition": f"metric_{i % 50} > {i % 100}", "action": f"a{i}", "priority": "low"}
+                               for i in range(1000)]}
+        rules["windowed"] = [{"condition": "max(cpu_usage) over 10m > 90", "action": "w", "priority": "high"}]
+        self.engine = RuleEngine(rules)
+        self.values = {f"metric_{i}": 0.0 for i in range(50)}
+        self.values["cpu_percent"] = 10.0
+
+    def test_only_affected_rules_reevaluated(self):
+        """Changing one metric re-runs only the rules indexed under it."""
+        self.engine.evaluate(MetricSnapshot(dict(self.values), 100))
+        self.assertEqual(self.engine.last_tick["rules_evaluated"], 1001)
+
+        self.values["metric_3"] = 55.0
+        matched = self.engine.evaluate(MetricSnapshot(dict(self.values), 100))
+        self.assertEqual(self.engine.last_tick["rules_evaluated"], 20)
+        self.assertEqual({rule["action"] for rule in matched},
+                         {f"a{i}" for i in range(3, 1000, 50) if i % 100 < 55})
+
+        # A new sample refreshes windowed rules even when values are unchanged
+        self.engine.evaluate(MetricSnapshot(dict(self.values), 130))
+        self.assertEqual(self.engine.last_tick["rules_evaluated"], 1)
+
+        stats = self.engine.get_stats(top=2000)
+        by_rule = {entry["rule"]: entry for entry in stats["rule_stats"]}
+        self.assertEqual(by_rule["generated:3"]["evaluations"], 2)
+        self.assertEqual(by_rule["generated:3"]["hits"], 1)
+        self.assertEqual(by_rule["windowed:0"]["evaluations"], 2)
+
+    def test_engine_cached_until_rules_change(self):
+        """The rules file is compiled once and recompiled after an edit."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch.object(decision_engine, "RULES_FILE", Path(tmp) / "rules.json"), \
+                 mock.patch.dict(decision_engine._engine, {"engine": None, "mtime": None}):
+                first = decision_engine._get_rule_engine()
+                self.assertIs(decision_engine._get_rule_engine(), first)
+                self.assertEqual(len(first.rules), 6)
+                os.utime(decision_engine.RULES_FILE, ns=(0, 0))
+                self.assertIsNot(decision_engine._get_rule_engine(), first)
+
+if __name__ == '__main__':
+    unittest.main()
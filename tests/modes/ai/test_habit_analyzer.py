@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import habit_analyzer
+from modes.ai.habit_analyzer import CountMinSketch, HabitSketch, HyperLogLog
+from modes.service import metric_store
+
+START = 1_700_000_000
+
+def _events(day, n):
+    return [{"timestamp": START + day * 86400 + i * 60, "app": f"app{i % 7}" if i % 3 else "editor",
+             "action": f"action{i % 50}", "keys": 10} for i in range(n)]
+
+class TestSketches(unittest.TestCase):
+
+    def test_count_min_and_hyperloglog(self):
+        """Estimates stay within the sketches' error bounds."""
+        cms = CountMinSketch()
+        hll = HyperLogLog()
+        for i in range(20000):
+            key = f"key{i % 5000}"
+            cms.add(key)
+            hll.add(key)
+        self.assertGreaterEqual(cms.estimate("key7"), 4)
+        self.assertLessEqual(cms.estimate("key7"), 4 + 20000 * np.e / cms.table.shape[1])
+        self.assertLess(abs(hll.count() - 5000) / 5000, 0.05)
+
+    def test_merge_matches_single_sketch(self):
+        """Merging two days' sketches gives the same sketch as counting both days together."""
+        day1, day2, combined = HabitSketch(), HabitSketch(), HabitSketch()
+        for event in _events(0, 300):
+            day1.add(event)
+            combined.add(event)
+        for event in _events(1, 200):
+            day2.add(event)
+            combined.add(event)
+        day1.merge(day2)
+        np.testing.assert_array_equal(day1.apps.table, combined.apps.table)
+        np.testing.assert_array_equal(day1.distinct_actions.registers, combined.distinct_actions.registers)
+        np.testing.assert_array_equal(day1.matrices["activity"], combined.matrices["activity"])
+        self.assertEqual(day1.top("apps", 3), combined.top("apps", 3))
+        self.assertEqual(day1.top("apps", 1)[0], ("editor", 167))
+
+class TestHabitAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(habit_analyzer, "DATA_DIR", tmp_path),
+            mock.patch.object(habit_analyzer, "HABITS_FILE", tmp_path / "user_habits.json"),
+            mock.patch.object(habit_analyzer, "HABIT_SKETCH_DIR", tmp_path / "sketches"),
+            mock.patch.dict(habit_analyzer._sketch_cache, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_incremental_analysis(self):
+        """Activity and metric history feed bounded sketches that answer the analysis."""
+        self.assertEqual(habit_analyzer.get_habit_analyzer()["status"], "no_data")
+        metric_store.append_points([{"timestamp": START + i * 300, "cpu_percent": 50.0, "memory_percent": 40.0}
+                                    for i in range(288 * 3)])
+        habit_analyzer.record_activity(_events(0, 300) + _events(1, 300))
+
+        result = habit_analyzer.get_habit_analyzer()
+        habits = result["habits"]
+        self.assertEqual(result["status"], "analyzed")
+        self.assertEqual(habits["most_used_apps"][0], ("editor", 200))
+        self.assertEqual(habits["distinct_apps"], 8)
+        self.assertEqual(habits["resource_usage_patterns"]["avg_cpu_usage"], 50.0)
+        self.assertEqual(len(list((Path(self.tmp.name) / "sketches").glob("day_*.npz"))), 4)
+
+        # Many more distinct apps leave the sketch size unchanged
+        size = result["sketch_memory_kb"]
+        habit_analyzer.record_activity([{"timestamp": START + i, "app": f"tool{i}"} for i in range(2000)])
+        metric_store.append_points([{"timestamp": START + 86400 * 3, "cpu_percent": 1.0}])
+        result = habit_analyzer.get_habit_analyzer()
+        self.assertEqual(result["sketch_memory_kb"], size)
+        self.assertAlmostEqual(result["habits"]["distinct_apps"], 2008, delta=100)
+        self.assertEqual(result["data_points"], 600 + 2000 + 288 * 3 + 1)
+
+if __name__ == '__main__':
+    unittest.main()
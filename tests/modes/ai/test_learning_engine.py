@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import json
+import random
+import statistics
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import learning_engine
+from modes.ai.learning_engine import LearningStats, P2Quantile, RunningStats
+from modes.service import metric_store
+
+class TestStreamingAggregates(unittest.TestCase):
+
+    def test_welford_matches_batch(self):
+        """Running mean and variance match the statistics module."""
+        values = [random.Random(1).gauss(40, 12) for _ in range(1000)]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        self.assertAlmostEqual(stats.mean, statistics.mean(values), places=9)
+        self.assertAlmostEqual(stats.std, statistics.stdev(values), places=9)
+
+    def test_p2_quantiles(self):
+        """P-square estimates land close to the exact quantiles."""
+        rng = random.Random(2)
+        values = [rng.expovariate(0.1) for _ in range(20000)]
+        ordered = sorted(values)
+        for p in (0.5, 0.95):
+            estimator = P2Quantile(p)
+            for value in values:
+                estimator.add(value)
+            exact = ordered[int(p * len(ordered))]
+            self.assertLess(abs(estimator.value() - exact) / exact, 0.05)
+
+    def test_state_round_trip_and_trend(self):
+        """Aggregates survive serialization and pick up a rising trend."""
+        stats = LearningStats()
+        for i in range(200):
+            stats.add({"timestamp": 1_700_000_000 + i * 60, "cpu_usage": 20 + i * 0.3,
+                       "memory_usage": 50, "active_app": f"app{i % 3}"})
+        restored = LearningStats(json.loads(json.dumps(stats.state_dict())))
+        restored.add({"timestamp": 1_700_012_000, "cpu_usage": 80})
+        stats.add({"timestamp": 1_700_012_000, "cpu_usage": 80})
+        restored_state, state = restored.state_dict(), stats.state_dict()
+        restored_state.pop("last_updated")
+        state.pop("last_updated")
+        self.assertEqual(restored_state, state)
+        self.assertEqual(restored.metrics["cpu_usage"].summary()["trend"], "increasing")
+        self.assertEqual(restored.metrics["memory_usage"].summary()["trend"], "stable")
+
+class TestLearningEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(learning_engine, "DATA_DIR", tmp_path),
+            mock.patch.object(learning_engine, "LEARNING_DATA", tmp_path / "learning_data.json"),
+            mock.patch.object(learning_engine, "LEARNING_STATS", tmp_path / "learning_stats.json"),
+            mock.patch.object(learning_engine, "OBSERVATION_STORE", tmp_path / "observations.ndjson"),
+            mock.patch.object(learning_engine, "MODEL_STATE", tmp_path / "model_state.json"),
+            mock.patch.dict(learning_engine._stats_cache, {"stats": None, "mtime": None}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_migrates_and_records(self):
+        """Old full-list data is folded in once; new observations go to the store."""
+        old = [{"timestamp": 1_700_000_000 + i, "cpu_usage": 90, "action": "copy"} for i in range(30)]
+        with open(learning_engine.LEARNING_DATA, 'w') as f:
+            json.dump({"observations": old}, f)
+
+        result = learning_engine.get_learning_engine()
+        self.assertEqual(result["data_points"], 30)
+        self.assertFalse(learning_engine.LEARNING_DATA.exists())
+        kinds = [o["type"] for o in result["insights"]["optimization_opportunities"]]
+        self.assertEqual(kinds, ["automation", "resource_optimization"])
+
+        recorded = learning_engine.record_observations([{"cpu_usage": 10, "active_app": "editor"}] * 5)
+        self.assertEqual(recorded["total"], 35)
+        points, _ = metric_store.read_points(0, path=learning_engine.OBSERVATION_STORE)
+        self.assertEqual(len(points), 35)
+        self.assertEqual(points[-1]["cpu_percent"], 10)
+
+        result = learning_engine.get_learning_engine()
+        self.assertEqual(result["insights"]["usage_patterns"]["most_used_apps"], [("editor", 5)])
+        self.assertEqual(result["insights"]["performance_trends"]["cpu"]["max"], 90)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import pattern_recognition
+from modes.ai.pattern_recognition import PatternStore, RETENTION_DAYS
+from modes.service import metric_store
+
+DAY = 86400
+START = 1_700_000_000
+
+class TestPatternStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sequence_mining(self):
+        """Repeated event chains are reported with support and confidence."""
+        store = PatternStore(self.tmp_path / "db")
+        for i in range(5):
+            t = START + i * 3600
+            store.add_event(t, "app_start:editor")
+            store.add_event(t + 60, "cpu:high")
+            store.add_event(t + 120, "app_start:compiler" if i < 4 else "app_stop:editor")
+        top = {" > ".join(s["sequence"]): s for s in store.top_sequences(limit=50)}
+        self.assertEqual(top["app_start:editor > cpu:high"]["support"], 5)
+        self.assertEqual(top["app_start:editor > cpu:high"]["confidence"], 1.0)
+        self.assertEqual(top["app_start:editor > cpu:high > app_start:compiler"]["confidence"], 0.8)
+        # Events an hour apart are separate sequences
+        self.assertNotIn("app_start:compiler > app_start:editor", top)
+
+    def test_ring_expiry_and_dirty_saves(self):
+        """A slot reused after RETENTION_DAYS drops the old day; saves touch only dirty buckets."""
+        store = PatternStore(self.tmp_path / "db")
+        store.add_event(START, "cpu:high")
+        store.add_event(START + DAY, "cpu:high")
+        store.save()
+        self.assertEqual(len(list((self.tmp_path / "db").glob("day_*.json"))), 2)
+
+        store.add_event(START + RETENTION_DAYS * DAY, "cpu:idle")
+        self.assertEqual(len(store.dirty), 1)
+        self.assertEqual(store.totals["events"], {"cpu:high": 1, "cpu:idle": 1})
+
+        store.save()
+        reloaded = PatternStore(self.tmp_path / "db")
+        self.assertEqual(reloaded.totals["events"], store.totals["events"])
+        reloaded.expire(START + (RETENTION_DAYS + 2) * DAY)
+        self.assertEqual(reloaded.totals["events"], {"cpu:idle": 1})
+
+    def test_bucket_size_bounded(self):
+        """Overflowing a bucket prunes it back and keeps the totals consistent."""
+        with mock.patch.object(pattern_recognition, "MAX_KEYS_PER_BUCKET", 20):
+            store = PatternStore(self.tmp_path / "db")
+            for i in range(100):
+                store.add_event(START + i, f"app_start:tool{i}")
+            store.add_event(START + 200, "app_start:tool99")
+            bucket = next(iter(store.buckets.values()))
+            self.assertLessEqual(len(bucket["hourly"]), 20)
+            self.assertLessEqual(len(bucket["sequences"]), 20)
+            self.assertEqual(sum(store.totals["events"].values()),
+                             sum(sum(hours) for hours in bucket["hourly"].values()))
+
+class TestMetricEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(pattern_recognition, "PATTERN_DB_DIR", tmp_path / "db"),
+            mock.patch.dict(pattern_recognition._pattern_db, {"store": None}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_incremental_metric_ingest(self):
+        """Only points appended since the last call are turned into state-change events."""
+        cpu = [5] * 10 + [95] * 10 + [50] * 10
+        metric_store.append_points([{"timestamp": START + i * 30, "cpu_percent": c} for i, c in enumerate(cpu)])
+        events = pattern_recognition.update_pattern_db(scan_apps=False)
+        self.assertEqual([e["event"] for e in events], ["cpu:high", "cpu:normal"])
+        self.assertEqual(pattern_recognition.update_pattern_db(scan_apps=False), [])
+
+        metric_store.append_points([{"timestamp": START + 900 + i * 30, "cpu_percent": 2} for i in range(3)])
+        events = pattern_recognition.update_pattern_db(scan_apps=False)
+        self.assertEqual([e["event"] for e in events], ["cpu:idle"])
+        store = pattern_recognition._get_store()
+        self.assertEqual(store.totals["sequences"]["cpu:high > cpu:normal"], 1)
+        self.assertEqual(sum(store.totals["samples"]), 33)
+
+    def test_reload_after_other_writer(self):
+        """A store saved by another process is reloaded instead of being overwritten."""
+        metric_store.append_points([{"timestamp": START + i * 30, "cpu_percent": 5} for i in range(5)])
+        pattern_recognition.update_pattern_db(scan_apps=False)
+
+        metric_store.append_points([{"timestamp": START + 150 + i * 30, "cpu_percent": 95} for i in range(5)])
+        other = PatternStore(pattern_recognition.PATTERN_DB_DIR)
+        for timestamp, name in other.read_metric_events():
+            other.add_event(timestamp, name)
+        other.save()
+
+        self.assertEqual(pattern_recognition.update_pattern_db(scan_apps=False), [])
+        store = pattern_recognition._get_store()
+        self.assertEqual(store.totals["events"], {"cpu:high": 1})
+        self.assertEqual(sum(store.totals["samples"]), 10)
+
+    def test_app_scan_throttled(self):
+        """Running processes are scanned at most once per APP_SCAN_INTERVAL."""
+        scans = [{"shell"}, {"shell", "editor"}]
+        with mock.patch.object(pattern_recognition, "_running_apps", side_effect=scans) as running_apps:
+            pattern_recognition.update_pattern_db()
+            pattern_recognition.update_pattern_db()
+            self.assertEqual(running_apps.call_count, 1)
+            with mock.patch.object(pattern_recognition, "APP_SCAN_INTERVAL", 0):
+                events = pattern_recognition.update_pattern_db()
+        self.assertEqual([e["event"] for e in events], ["app_start:editor"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import predictive_analysis
+from modes.service import metric_store
+
+DAY = 86400
+GB = 1024 ** 3
+
+class TestPredictiveAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(predictive_analysis, "DATA_DIR", tmp_path),
+            mock.patch.object(predictive_analysis, "PREDICTIONS_FILE", tmp_path / "predictions.json"),
+            mock.patch.object(predictive_analysis, "HISTORY_FILE", tmp_path / "prediction_history.json"),
+            mock.patch.dict(predictive_analysis._forecast_cache, {"key": None, "result": None, "written": None}),
+            mock.patch.dict(predictive_analysis._disk_history, {"mtime": None, "samples": []}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        # Two weeks of history: CPU is busy during the next three local hours of every day
+        # and memory climbs 3% a day; disk grows 1 GB a day toward a 100 GB capacity
+        now = time.time()
+        busy = {time.localtime(now + h * 3600).tm_hour for h in (1, 2, 3)}
+        start = int(now // 3600) * 3600 - 14 * DAY
+        metric_store.append_points([{
+            "timestamp": t,
+            "cpu_percent": 80.0 if time.localtime(t).tm_hour in busy else 20.0,
+            "memory_percent": 40.0 + 3 * (t - start) / DAY,
+        } for t in range(start, int(now), 600)])
+        samples = [[int(now) - d * DAY, (80 - d) * GB, 100 * GB] for d in range(10, -1, -1)]
+        with open(predictive_analysis.HISTORY_FILE, 'w') as f:
+            json.dump({"disk_samples": samples}, f)
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def _by_kind(self, predictions):
+        return {p.get("resource") or p.get("task") or p["type"]: p for p in predictions}
+
+    def test_forecasts_from_history(self):
+        """Seasonal baselines and trends drive the predictions."""
+        result = predictive_analysis.get_predictive_analysis()
+        predictions = self._by_kind(result["predictions"])
+
+        self.assertEqual(predictions["cpu"]["prediction"], "high")
+        self.assertAlmostEqual(predictions["cpu"]["expected_percent"], 80.0, delta=2)
+        self.assertEqual(predictions["user_activity"]["activity"], "high")
+        self.assertEqual(predictions["system_restart"]["urgency"], "medium")
+        self.assertAlmostEqual(predictions["disk_cleanup"]["days_until_full"], 20.0, places=1)
+        self.assertEqual(predictions["disk_cleanup"]["urgency"], "medium")
+
+    def test_cached_and_written_on_change(self):
+        """Repeat calls are served from cache and the file is only rewritten when predictions change."""
+        first = predictive_analysis.get_predictive_analysis()
+        mtime = predictive_analysis.PREDICTIONS_FILE.stat().st_mtime_ns
+        second = predictive_analysis.get_predictive_analysis()
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertLess(second["elapsed_ms"], 5)
+
+        # Recomputing over the same data leaves the file alone
+        predictive_analysis._forecast_cache["key"] = None
+        third = predictive_analysis.get_predictive_analysis()
+        self.assertFalse(third["cached"])
+        self.assertEqual(predictive_analysis.PREDICTIONS_FILE.stat().st_mtime_ns, mtime)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ai import query_processor, learning_engine
+from modes.service import metric_store
+
+START = 1_700_000_000
+
+def _local_hour(timestamp):
+    return time.localtime(timestamp).tm_hour
+
+class TestQueryPlans(unittest.TestCase):
+
+    def test_plans(self):
+        """Questions map to intents, metrics, windows and focus hours."""
+        plan = query_processor.plan_query("When do I use the most memory?")
+        self.assertEqual((plan["intent"], plan["metrics"], plan["group_by"]),
+                         ("peak_time", ["memory_percent"], "hour_of_day"))
+        plan = query_processor.plan_query("why does my system slow down at 3 PM?")
+        self.assertEqual((plan["intent"], plan["focus"]), ("explain", {"hour": 15}))
+        self.assertIn("disk_io_rate", plan["metrics"])
+        plan = query_processor.plan_query("compare morning vs evening cpu over the last 2 weeks")
+        self.assertEqual((plan["intent"], plan["compare"], plan["window"]),
+                         ("compare", ["morning", "evening"], 14 * 86400))
+        self.assertEqual(query_processor.plan_query("what apps do I use most often?"), {"intent": "top_apps"})
+        self.assertIsNone(query_processor.plan_query("hello there"))
+
+class TestQueryEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(query_processor, "QUERY_LOG", tmp_path / "query_log.json"),
+            mock.patch.object(learning_engine, "DATA_DIR", tmp_path),
+            mock.patch.object(learning_engine, "LEARNING_DATA", tmp_path / "learning_data.json"),
+            mock.patch.object(learning_engine, "LEARNING_STATS", tmp_path / "learning_stats.json"),
+            mock.patch.object(learning_engine, "OBSERVATION_STORE", tmp_path / "observations.ndjson"),
+            mock.patch.dict(learning_engine._stats_cache, {"stats": None, "mtime": None}),
+        ]
+        for patch in self.patches:
+            patch.start()
+        query_processor._query_cache.clear()
+
+        # Ten days at 5-minute resolution; CPU and disk I/O spike at 15:00 local time
+        points = []
+        for i in range(10 * 288):
+            t = START + i * 300
+            busy = _local_hour(t) == 15
+            points.append({
+                "timestamp": t,
+                "cpu_percent": 70.0 if busy else 20.0,
+                "memory_percent": 40.0 + _local_hour(t),
+                "active_processes": 200,
+                "disk_io": {"read_bytes": i * (1_000_000 if busy else 1000), "write_bytes": 0},
+            })
+        metric_store.append_points(points)
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_answers_from_rollups(self):
+        """Peak-time, explain and summary answers reflect the stored data."""
+        peak = query_processor.process_query("When do I use the most memory?")["response"]
+        self.assertEqual(peak["details"]["peak"], "23:00")
+
+        explain = query_processor.process_query("Why does my system slow down at 3 PM?")["response"]
+        findings = {f["metric"]: f for f in explain["details"]["findings"]}
+        self.assertEqual(findings["cpu_percent"]["focus_mean"], 70.0)
+        self.assertEqual(findings["cpu_percent"]["usual_mean"], 20.0)
+        self.assertEqual(findings["active_processes"]["elevation"], 0)
+        self.assertIn("cpu usage", explain["answer"])
+
+        summary = query_processor.process_query("how much cpu at 3 pm?")["response"]
+        self.assertEqual(summary["details"]["mean"], 70.0)
+
+    def test_cached_until_new_data(self):
+        """Repeated plans are served from cache until the store's watermark moves."""
+        first = query_processor.process_query("When do I use the most cpu?")["response"]
+        second = query_processor.process_query("When do I use the most cpu?")["response"]
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+
+        metric_store.append_points([{"timestamp": START + 10 * 86400, "cpu_percent": 99.0}])
+        third = query_processor.process_query("When do I use the most cpu?")["response"]
+        self.assertFalse(third["cached"])
+        self.assertLess(third["elapsed_ms"], 100)
+
+    def test_top_apps_follow_learning_stats(self):
+        """Top-app answers are cached by the learning stats, not the metric store."""
+        learning_engine.record_observations([{"active_app": "editor"}] * 3)
+        first = query_processor.process_query("what apps do I use most often?")["response"]
+        self.assertEqual(first["details"]["top_apps"], {"editor": 3})
+
+        time.sleep(0.01)
+        learning_engine.record_observations([{"active_app": "browser"}] * 5)
+        second = query_processor.process_query("what apps do I use most often?")["response"]
+        self.assertFalse(second["cached"])
+        self.assertEqual(second["details"]["top_apps"], {"browser": 5, "editor": 3})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.files import directory_ops, file_index
+
+class TestDirectoryStats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "tree"
+        sizes = iter(range(1, 1000))
+        for top in ("photos", "docs"):
+            for sub in ("2023", "2024"):
+                folder = self.root / top / sub
+                folder.mkdir(parents=True)
+                for i in range(10):
+                    ext = ".jpg" if top == "photos" else ".txt"
+                    (folder / f"f{i}{ext}").write_bytes(b"x" * next(sizes) * (10 if top == "photos" else 1))
+        (self.root / "README").write_bytes(b"readme")
+        os.utime(self.root / "README", (1_000_000_000, 1_000_000_000))
+        self.patch = mock.patch.object(file_index, "INDEX_FILE", Path(self.tmp.name) / "index.db")
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def test_streaming_stats_and_rollups(self):
+        """Totals, top-N heap and du-style rollups come from a single stat per file."""
+        stats = directory_ops.get_directory_stats(str(self.root), top_n=3, rollup_depth=2)
+        self.assertEqual((stats["total_files"], stats["total_directories"]), (41, 6))
+        self.assertEqual(stats["file_extensions"]["no_extension"], {"count": 1, "total_size": 6})
+        self.assertEqual(stats["file_extensions"][".jpg"]["count"], 20)
+        self.assertEqual([Path(f["path"]).name for f in stats["largest_files"]], ["f9.jpg", "f8.jpg", "f7.jpg"])
+        self.assertEqual(stats["oldest_file"]["path"], str(self.root / "README"))
+
+        rollups = {r["path"]: r for r in stats["subdirectory_sizes"]}
+        self.assertEqual(set(rollups), {"photos", "docs", os.path.join("photos", "2023"), os.path.join("photos", "2024"),
+                                        os.path.join("docs", "2023"), os.path.join("docs", "2024")})
+        self.assertEqual(stats["subdirectory_sizes"][0]["path"], "photos")
+        self.assertEqual(rollups["photos"]["size_bytes"], rollups[os.path.join("photos", "2023")]["size_bytes"]
+                         + rollups[os.path.join("photos", "2024")]["size_bytes"])
+        self.assertEqual(sum(r["size_bytes"] for r in stats["subdirectory_sizes"] if os.sep not in r["path"]) + 6,
+                         stats["total_size_bytes"])
+
+    def test_organize_streams_moves(self):
+        """The organize iterators yield one event per move; the wrappers group them."""
+        docs = self.root / "docs" / "2023"
+        (docs / "extra.jpg").write_bytes(b"jpg")
+        events = list(directory_ops.iter_organize_files_by_extension(docs, self.root / "sorted"))
+        self.assertEqual([e["type"] for e in events].count("moved"), 11)
+        self.assertEqual(events[-1]["moved_count"], 11)
+        self.assertEqual(len(list((self.root / "sorted" / "txt").iterdir())), 10)
+
+        result = directory_ops.organize_files_by_date(self.root / "docs" / "2024", date_format="YYYY")
+        self.assertEqual(result["moved_count"], 10)
+        self.assertEqual(len(next(iter(result["organized_files"].values()))), 10)
+        self.assertIn("does not exist", directory_ops.organize_files_by_extension(self.root / "nope")["error"])
+
+    def test_index_matches_walk(self):
+        """The index-backed statistics agree with a live walk, before and after a change."""
+        walked = directory_ops.get_directory_stats(str(self.root), rollup_depth=2)
+        indexed = directory_ops.get_directory_stats(str(self.root), rollup_depth=2, use_index=True)
+        for key in ("total_files", "total_directories", "total_size_bytes", "file_extensions",
+                    "largest_files", "oldest_file", "newest_file"):
+            self.assertEqual(indexed[key], walked[key], key)
+        self.assertEqual(sorted(indexed["subdirectory_sizes"], key=lambda r: r["path"]),
+                         sorted(walked["subdirectory_sizes"], key=lambda r: r["path"]))
+
+        (self.root / "docs" / "2024" / "f0.txt").unlink()
+        os.utime(self.root / "docs" / "2024", (2_000_000_000, 2_000_000_000))
+        indexed = directory_ops.get_directory_stats(str(self.root), use_index=True)
+        self.assertEqual(indexed["total_files"], 40)
+        self.assertEqual(indexed["source"], "index")
+
+if __name__ == '__main__':
+    unittest.main()
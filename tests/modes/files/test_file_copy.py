@@ -0,0 +1,202 @@
+import unittest
+import sys
+import os
+import re
+import json
+import errno
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.files import file_copy
+
+class TestBatchCopy(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = Path(self.tmp.name) / "src"
+        self.dst = Path(self.tmp.name) / "dst"
+        for d in range(3):
+            folder = self.src / f"d{d}"
+            folder.mkdir(parents=True)
+            for i in range(30):
+                (folder / f"f{i}.txt").write_bytes(os.urandom(i * 100))
+        (self.src / "big.bin").write_bytes(os.urandom(3 * 1024 * 1024))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _tree(self, root):
+        return {str(p.relative_to(root)): p.read_bytes() for p in root.rglob("*") if p.is_file()}
+
+    def test_parallel_copy_with_checksums(self):
+        """Both pools copy every file intact; checksums come from the streamed bytes."""
+        events = []
+        with mock.patch.object(file_copy, "LARGE_FILE_BYTES", 1024 * 1024), \
+                mock.patch.object(file_copy, "PROGRESS_INTERVAL", 0):
+            result = file_copy.batch_copy(self.src, self.dst, checksum=True, progress_callback=events.append)
+        self.assertEqual((result["copied_count"], result["errors"]), (91, []))
+        self.assertEqual(self._tree(self.dst), self._tree(self.src))
+        big = next(f for f in result["copied_files"] if f["source"].endswith("big.bin"))
+        self.assertEqual(big["md5"], hashlib.md5((self.src / "big.bin").read_bytes()).hexdigest())
+        self.assertEqual(events[-1]["files_copied"], 91)
+        self.assertEqual(events[-1]["bytes_copied"], sum(len(v) for v in self._tree(self.src).values()))
+        self.assertFalse((self.dst / file_copy.MANIFEST_NAME).exists())
+
+    def test_resume_from_manifest(self):
+        """An interrupted job's manifest makes the next run skip finished files."""
+        self.dst.mkdir()
+        finished = sorted(self.src.glob("d0/*.txt"))
+        with open(self.dst / file_copy.MANIFEST_NAME, 'w') as f:
+            for path in finished:
+                st = path.stat()
+                f.write(json.dumps({"path": str(path.relative_to(self.src)), "size": st.st_size,
+                                    "mtime_ns": st.st_mtime_ns}) + "\n")
+            f.write('{"path": "d1/f1.t')  # Cut off mid-write
+
+        with mock.patch.object(file_copy, "_offload", {"copy_file_range": False, "sendfile": False}):
+            result = file_copy.batch_copy(self.src, self.dst, file_pattern="*.txt")
+        self.assertEqual((result["copied_count"], result["skipped_count"]), (60, 30))
+        self.assertFalse((self.dst / "d0").exists())
+        self.assertEqual((self.dst / "d2" / "f7.txt").read_bytes(), (self.src / "d2" / "f7.txt").read_bytes())
+
+    def test_iter_batch_copy_stops_and_resumes(self):
+        """Closing the event stream early keeps the manifest, so the next run resumes."""
+        stream = file_copy.iter_batch_copy(self.src, self.dst, file_pattern="*.txt")
+        copied = []
+        for event in stream:
+            if event["type"] == "copied":
+                copied.append(event["file"])
+                if len(copied) == 10:
+                    break
+        stream.close()
+        self.assertEqual(len(copied), 10)
+        self.assertTrue((self.dst / file_copy.MANIFEST_NAME).exists())
+
+        events = list(file_copy.iter_batch_copy(self.src, self.dst, file_pattern="*.txt"))
+        done = events[-1]
+        self.assertEqual(done["type"], "done")
+        self.assertEqual((done["copied_count"], done["skipped_count"], done["error_count"]), (80, 10, 0))
+        self.assertEqual(events[-2]["type"], "progress")
+        self.assertFalse((self.dst / file_copy.MANIFEST_NAME).exists())
+
+    def test_copy_file_verify(self):
+        """verify_copy hashes while copying instead of re-reading both files."""
+        result = file_copy.copy_file(self.src / "big.bin", self.dst / "copy.bin", verify_copy=True)
+        self.assertTrue(result["verified"])
+        self.assertEqual(result["source_hash"], hashlib.md5((self.src / "big.bin").read_bytes()).hexdigest())
+        self.assertNotIn("destination_hash", result)
+
+        os.chmod(self.src / "big.bin", 0o755)
+        file_copy.copy_file(self.src / "big.bin", self.dst / "plain.bin", preserve_metadata=False)
+        self.assertEqual(os.stat(self.dst / "plain.bin").st_mode & 0o777, 0o755)
+        self.assertEqual(list(self.dst.glob("*.partial")), [])
+
+    def test_flattened_same_names(self):
+        """Same-named files copied flat never share a temporary file; the last copy wins."""
+        for d in range(40):
+            folder = self.src / "flat" / f"d{d}"
+            folder.mkdir(parents=True)
+            (folder / "same.bin").write_bytes(bytes([d]) * 4096)
+            os.chmod(folder / "same.bin", 0o755)
+        result = file_copy.batch_copy(self.src / "flat", self.dst, preserve_structure=False)
+        self.assertEqual((result["copied_count"], result["errors"]), (40, []))
+        data = (self.dst / "same.bin").read_bytes()
+        self.assertEqual(data, data[:1] * 4096)
+        self.assertEqual(sorted(p.name for p in self.dst.iterdir()), ["same.bin"])
+        self.assertEqual(os.stat(self.dst / "same.bin").st_mode & 0o777, 0o755)
+
+    def test_offload_failure_before_first_byte_falls_back(self):
+        """A kernel copy path that fails before moving any data is treated as unavailable."""
+        offload = {"copy_file_range": True, "sendfile": True}
+        with mock.patch.object(file_copy, "_offload", offload), \
+                mock.patch.object(os, "copy_file_range", side_effect=OSError(errno.EIO, "io"), create=True), \
+                mock.patch.object(os, "sendfile", side_effect=TypeError("not a socket"), create=True):
+            result = file_copy.copy_file(self.src / "big.bin", self.dst / "copy.bin")
+        self.assertTrue(result.get("success"), result)
+        self.assertEqual((self.dst / "copy.bin").read_bytes(), (self.src / "big.bin").read_bytes())
+        self.assertEqual(offload, {"copy_file_range": True, "sendfile": False})
+
+    def test_case_insensitive_name_pattern(self):
+        """On case-insensitive platforms a name glob matches regardless of case."""
+        with mock.patch.object(file_copy, "_GLOB_FLAGS", re.IGNORECASE):
+            result = file_copy.batch_copy(self.src, self.dst, file_pattern="*.TXT")
+        self.assertEqual(result["copied_count"], 90)
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = Path(self.tmp.name) / "src"
+        self.dst = Path(self.tmp.name) / "dst"
+        for d in range(3):
+            folder = self.src / f"d{d}"
+            folder.mkdir(parents=True)
+            for i in range(20):
+                (folder / f"f{i}.dat").write_bytes(os.urandom(50 + i))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_changes_are_copied(self):
+        """A second sync copies nothing; later edits, additions and removals are applied."""
+        first = file_copy.sync_directories(self.src, self.dst)
+        self.assertEqual(first["copied_count"], 60)
+        second = file_copy.sync_directories(self.src, self.dst)
+        self.assertEqual((second["copied_count"], second["unchanged_count"], second["adopted_count"]), (0, 60, 0))
+
+        (self.src / "d0" / "f1.dat").write_bytes(b"edited")
+        (self.src / "d1" / "new.dat").write_bytes(b"new")
+        for path in (self.src / "d2").iterdir():
+            path.unlink()
+        (self.src / "d2").rmdir()
+
+        preview = file_copy.sync_directories(self.src, self.dst, delete_extraneous=True, dry_run=True)
+        self.assertEqual((preview["copied_count"], preview["deleted_count"]), (2, 20))
+        self.assertTrue((self.dst / "d2" / "f0.dat").exists())
+
+        third = file_copy.sync_directories(self.src, self.dst, delete_extraneous=True)
+        self.assertEqual((third["copied_count"], third["deleted_count"]), (2, 20))
+        self.assertEqual((self.dst / "d0" / "f1.dat").read_bytes(), b"edited")
+        self.assertFalse((self.dst / "d2").exists())
+
+    def test_adopt_existing_copy_and_hash_compare(self):
+        """Matching untracked destination files are adopted; touched-but-identical files are not recopied."""
+        file_copy.batch_copy(self.src, self.dst)
+        adopted = file_copy.sync_directories(self.src, self.dst, compare="hash")
+        self.assertEqual((adopted["copied_count"], adopted["adopted_count"]), (0, 60))
+
+        # Adopted files have no checksum yet, so the first touch still copies and records one
+        os.utime(self.src / "d0" / "f0.dat", (2_000_000_000, 2_000_000_000))
+        self.assertEqual(file_copy.sync_directories(self.src, self.dst, compare="hash")["copied_count"], 1)
+        os.utime(self.src / "d0" / "f0.dat", (2_000_000_100, 2_000_000_100))
+        preview = file_copy.sync_directories(self.src, self.dst, compare="hash", dry_run=True)
+        self.assertEqual((preview["copied_count"], preview["hash_matched_count"]), (0, 1))
+        # The copy workers compare the digest they stream; nothing re-reads the source up front
+        with mock.patch.object(file_copy, "_file_md5", side_effect=AssertionError):
+            touched = file_copy.sync_directories(self.src, self.dst, compare="hash")
+        self.assertEqual((touched["copied_count"], touched["hash_matched_count"]), (0, 1))
+
+        # Same size, new content: copied, and the new checksum is recorded
+        (self.src / "d0" / "f0.dat").write_bytes(os.urandom(50))
+        os.utime(self.src / "d0" / "f0.dat", (2_000_000_200, 2_000_000_200))
+        changed = file_copy.sync_directories(self.src, self.dst, compare="hash")
+        self.assertEqual((changed["copied_count"], changed["hash_matched_count"]), (1, 0))
+        self.assertEqual((self.dst / "d0" / "f0.dat").read_bytes(), (self.src / "d0" / "f0.dat").read_bytes())
+
+    def test_hash_compare_restores_missing_destination(self):
+        """A touched file whose destination was deleted is copied back and counted as copied."""
+        file_copy.sync_directories(self.src, self.dst, compare="hash")
+        (self.dst / "d1" / "f3.dat").unlink()
+        os.utime(self.src / "d1" / "f3.dat", (2_000_000_000, 2_000_000_000))
+        result = file_copy.sync_directories(self.src, self.dst, compare="hash")
+        self.assertEqual((result["copied_count"], result["hash_matched_count"]), (1, 0))
+        self.assertEqual([f["source"] for f in result["copied_files"]], [str(self.src / "d1" / "f3.dat")])
+        self.assertEqual((self.dst / "d1" / "f3.dat").read_bytes(), (self.src / "d1" / "f3.dat").read_bytes())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.files import file_index, file_search
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "tree"
+        for d in range(4):
+            sub = self.root / f"dir{d}" / "nested"
+            sub.mkdir(parents=True)
+            for i in range(25):
+                (sub / f"file{i}.{'log' if i % 5 == 0 else 'txt'}").write_text("x" * i)
+        self.patch = mock.patch.object(file_index, "INDEX_FILE", Path(self.tmp.name) / "index.db")
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp.cleanup()
+
+    def _touch_dir_mtime(self, path):
+        # Make sure a directory's mtime moves even on coarse-timestamp filesystems
+        later = time.time() + 5
+        os.utime(path, (later, later))
+
+    def test_incremental_updates(self):
+        """After the first build only directories whose mtime moved are re-listed."""
+        first = file_index.update_index(self.root)
+        self.assertEqual((first["mode"], first["files_indexed"]), ("full", 100))
+        self.assertEqual(first["directories_rescanned"], 9)
+
+        unchanged = file_index.update_index(self.root)
+        self.assertEqual((unchanged["mode"], unchanged["directories_rescanned"]), ("incremental", 0))
+        self.assertEqual(unchanged["directories_checked"], 9)
+
+        nested = self.root / "dir1" / "nested"
+        (nested / "file0.log").unlink()
+        (nested / "new" / "deeper").mkdir(parents=True)
+        (nested / "new" / "deeper" / "added.log").write_text("new")
+        self._touch_dir_mtime(nested)
+        for path in (self.root / "dir3" / "nested").iterdir():
+            path.unlink()
+        (self.root / "dir3" / "nested").rmdir()
+        self._touch_dir_mtime(self.root / "dir3")
+
+        changed = file_index.update_index(self.root)
+        self.assertEqual(changed["files_indexed"], 100 - 1 + 1 - 25)
+        # dir1/nested, dir3, dir3/nested (gone), then the two new directories
+        self.assertEqual(changed["directories_rescanned"], 5)
+
+        logs = sorted(row[1] for row in file_index.query_index(self.root, file_extension="log"))
+        self.assertEqual(len(logs), 5 * 3 - 1 + 1)
+        self.assertIn("added.log", logs)
+        big = list(file_index.query_index(self.root, name_pattern=r"^FILE2\d", size_min_mb=0.00002))
+        self.assertEqual({row[2] for row in big}, {21, 22, 23, 24})
+
+    def test_in_place_writes_reach_the_index(self):
+        """With restat, appending to an old file updates its size and mtime without a directory change."""
+        old = self.root / "dir2" / "nested" / "file3.txt"
+        month_ago = time.time() - 30 * 86400
+        for path in self.root.rglob("*.*"):
+            os.utime(path, (month_ago, month_ago))
+        file_index.update_index(self.root)
+        dir_mtime = os.stat(old.parent).st_mtime_ns
+
+        with open(old, 'ab') as f:
+            f.write(b"x" * 2 * 1024 * 1024)
+        os.utime(old.parent, ns=(dir_mtime, dir_mtime))
+        # The default refresh only compares directory mtimes
+        update = file_index.update_index(self.root)
+        self.assertEqual((update["directories_rescanned"], update["files_restatted"]), (0, 0))
+        update = file_index.update_index(self.root, restat=True)
+        self.assertEqual((update["directories_rescanned"], update["files_refreshed"]), (0, 1))
+
+        for criteria in ({"modified_within_days": 1}, {"size_min_mb": 1}):
+            indexed = file_search.search_files(str(self.root), use_index=True, **criteria)
+            self.assertEqual([f["path"] for f in indexed["found_files"]], [str(old)], criteria)
+
+    def test_search_files_from_index(self):
+        """search_files(use_index=True) matches a live walk."""
+        walked = file_search.search_files(str(self.root), file_extension=".log", exclude_patterns=["dir0"])
+        indexed = file_search.search_files(str(self.root), file_extension=".log", exclude_patterns=["dir0"],
+                                           use_index=True)
+        self.assertEqual(indexed["found_count"], 15)
+        self.assertEqual(sorted(f["path"] for f in indexed["found_files"]),
+                         sorted(f["path"] for f in walked["found_files"]))
+
+if __name__ == '__main__':
+    unittest.main()
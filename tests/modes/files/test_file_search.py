@@ -0,0 +1,135 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.files import file_index, file_search
+from modes.files.file_walker import walk_files
+
+class TestFileSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        for d in range(5):
+            sub = self.root / f"pkg{d}" / "sub"
+            sub.mkdir(parents=True)
+            for i in range(20):
+                (sub / f"mod{i}.py").write_text("print('hi')\n" * i)
+                (sub / f"notes{i}.txt").write_text("TODO: tidy\n" if i % 2 else "done\n")
+        (self.root / ".git" / "objects").mkdir(parents=True)
+        (self.root / ".git" / "objects" / "blob.py").write_text("x")
+        old = self.root / "pkg0" / "old.py"
+        old.write_text("x" * 2 * 1024 * 1024)
+        os.utime(old, (time.time() - 30 * 86400,) * 2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_walker_filters_and_prunes(self):
+        """Extension and name filters apply, excluded directories are never entered."""
+        single = sorted(e.path for e in walk_files(self.root, extensions="py", max_workers=1))
+        parallel = sorted(e.path for e in walk_files(self.root, extensions=".PY"))
+        self.assertEqual(single, parallel)
+        self.assertEqual(len(parallel), 102)
+        pruned = list(walk_files(self.root, exclude=[".git"], name_pattern=r"^mod1\d"))
+        self.assertEqual(len(pruned), 50)
+
+        # Closing the generator early stops the walk
+        walker = walk_files(self.root)
+        next(walker)
+        walker.close()
+
+    def test_search_files(self):
+        """search_files applies size, date and content criteria on one stat per file."""
+        result = file_search.search_files(self.tmp.name, file_extension=".py", exclude_patterns=[".git"])
+        self.assertEqual(result["found_count"], 101)
+
+        result = file_search.search_files(self.tmp.name, size_min_mb=1)
+        self.assertEqual([f["name"] for f in result["found_files"]], ["old.py"])
+        self.assertEqual(result["found_files"][0]["size_mb"], 2.0)
+
+        result = file_search.search_files(self.tmp.name, file_extension=".py", modified_within_days=7)
+        self.assertEqual(result["found_count"], 101)
+
+        result = file_search.search_files(self.tmp.name, content_pattern="todo", file_extension="txt")
+        self.assertEqual(result["found_count"], 50)
+        self.assertTrue(all(f["content_match"] for f in result["found_files"]))
+
+    def test_content_lines_and_binary_skip(self):
+        """Line numbers and context come from the mapped bytes; binary files never match."""
+        log = self.root / "big.log"
+        with open(log, 'w') as f:
+            for i in range(100000):
+                f.write(f"line {i} {'ERROR disk full' if i == 70000 else 'ok'}\n")
+        (self.root / "image.bin").write_bytes(b"\x89PNG\0\0 error")
+
+        # A small counting slice makes the gap before the match span many slices
+        with mock.patch.object(file_search, "NEWLINE_COUNT_BYTES", 4099):
+            result = file_search.search_files(self.tmp.name, content_pattern="error", exclude_patterns=["pkg*"],
+                                              show_lines=True, context_lines=1)
+        self.assertEqual([f["name"] for f in result["found_files"]], ["big.log"])
+        self.assertEqual(result["found_files"][0]["matches"], [
+            {"line": 70001, "text": "line 70000 ERROR disk full", "before": ["line 69999 ok"], "after": ["line 70001 ok"]}
+        ])
+
+    def test_unicode_patterns(self):
+        """Non-ASCII text and Unicode classes match as on decoded text, with line numbers."""
+        (self.root / "greeting.txt").write_text("hallo\nGrüße aus KÖLN\n", encoding="utf-8")
+        for pattern in ("köln", r"\w+e aus", "gr..e"):
+            result = file_search.search_files(self.tmp.name, content_pattern=pattern, exclude_patterns=["pkg*"],
+                                              show_lines=True)
+            self.assertEqual([f["name"] for f in result["found_files"]], ["greeting.txt"], pattern)
+            self.assertEqual(result["found_files"][0]["matches"][0]["line"], 2)
+        self.assertIsInstance(file_search.compile_content_pattern("TODO").pattern, bytes)
+        self.assertIsInstance(file_search.compile_content_pattern("köln").pattern, str)
+
+    def test_streaming_search(self):
+        """iter_search_files streams matches and progress; closing it ends the search."""
+        with mock.patch("modes.files.file_walker.PROGRESS_EVERY", 10):
+            events = list(file_search.iter_search_files(self.root, file_extension=".txt", content_pattern="todo"))
+        kinds = [event["type"] for event in events]
+        self.assertEqual(kinds.count("match"), 50)
+        self.assertEqual(kinds.count("progress"), 10)
+        self.assertEqual(events[-1], {"type": "done", "directory": str(self.root.absolute()),
+                                      "files_scanned": 100, "found_count": 50})
+
+        stream = file_search.iter_search_files(self.root, name_pattern="mod")
+        first = next(stream)
+        stream.close()
+        self.assertEqual(first["type"], "match")
+        self.assertIn("does not exist", file_search.search_files(self.root / "missing")["error"])
+
+    def test_staged_duplicates(self):
+        """Only same-size files are hashed, and only head/tail matches get a full hash."""
+        dups = self.root / "dups"
+        dups.mkdir()
+        big = os.urandom(200 * 1024)
+        middle_changed = big[:100 * 1024] + b"X" + big[100 * 1024 + 1:]
+        for name, data in [("a.bin", big), ("b.bin", big), ("c.bin", middle_changed),
+                           ("d.bin", os.urandom(len(big))), ("small1", b"same"), ("small2", b"same"),
+                           ("small3", b"diff"), ("unique", b"only one of this size!")]:
+            (dups / name).write_bytes(data)
+
+        with mock.patch.object(file_index, "INDEX_FILE", self.root / "index.db"):
+            result = file_search.find_duplicates(str(dups), compare_by="content")
+            groups = sorted(sorted(os.path.basename(f["path"]) for f in g["files"]) for g in result["duplicates"])
+            self.assertEqual(groups, [["a.bin", "b.bin"], ["small1", "small2"]])
+            self.assertEqual(result["stages"]["same_size_candidates"], 7)
+            self.assertEqual(result["stages"]["partial_hashed"], 7)
+            self.assertEqual(result["stages"]["full_hashed"], 3)
+
+            again = file_search.find_duplicates(str(dups), compare_by="content")
+            self.assertEqual(again["stages"]["cache_hits"], 10)
+            self.assertEqual(again["stages"]["full_hashed"], 0)
+            self.assertEqual(sorted(g["key"] for g in again["duplicates"]),
+                             sorted(g["key"] for g in result["duplicates"]))
+
+if __name__ == '__main__':
+    unittest.main()
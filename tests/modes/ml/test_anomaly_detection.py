@@ -0,0 +1,92 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ml import anomaly_detection
+from modes.service import metric_store
+
+class TestBatchAnomalyScoring(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(anomaly_detection, "MODEL_DIR", tmp_path / "models"),
+            mock.patch.object(anomaly_detection, "DATA_DIR", tmp_path / "data"),
+            mock.patch.object(anomaly_detection, "BATCH_MODEL_FILE", tmp_path / "models" / "batch.joblib"),
+            mock.patch.object(anomaly_detection, "BATCH_LABELS_FILE", tmp_path / "data" / "labels.npz"),
+            mock.patch.object(anomaly_detection, "BATCH_TRAINING_LOG", tmp_path / "data" / "training.json"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        rng = np.random.default_rng(0)
+        points = []
+        for i in range(2000):
+            points.append({
+                "timestamp": 1_700_000_000 + i * 30,
+                "cpu_percent": float(rng.normal(30, 3)),
+                "memory_percent": float(rng.normal(60, 2)),
+                "active_processes": 200 + int(rng.integers(0, 5)),
+                "disk_io": {"read_bytes": i * 1000, "write_bytes": i * 2000},
+                "network_io": {"bytes_sent": i * 50, "bytes_recv": i * 80}
+            })
+        points[1500]["cpu_percent"] = 99.0
+        metric_store.append_points(points)
+        self.spike_timestamp = points[1500]["timestamp"]
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_train_and_backfill_robust_covariance(self):
+        """Training persists a .joblib model and backfill flags the injected spike."""
+        result = anomaly_detection.train_batch_model("robust_covariance", background=False)
+        self.assertTrue(result.get("success"), result)
+        self.assertTrue(anomaly_detection._check_model_exists())
+
+        backfill = anomaly_detection.backfill_anomaly_labels()
+        self.assertTrue(backfill.get("success"), backfill)
+        self.assertEqual(backfill["top_anomalies"][0]["timestamp"], self.spike_timestamp)
+
+        labels = np.load(anomaly_detection.BATCH_LABELS_FILE)
+        self.assertEqual(len(labels["score"]), backfill["points_scored"])
+
+    def test_threshold_update_never_overwrites_a_retrain(self):
+        """A retrain that lands while the threshold is rescored keeps its own parameters."""
+        anomaly_detection.train_batch_model("robust_covariance", background=False)
+        score_history = anomaly_detection.score_history
+
+        def retrain_meanwhile(since=None, until=None):
+            result = score_history(since, until)
+            anomaly_detection.train_batch_model("robust_covariance", since=1_700_030_000, background=False)
+            return result
+
+        with mock.patch.object(anomaly_detection, "score_history", retrain_meanwhile):
+            result = anomaly_detection.update_batch_threshold(window_seconds=10 ** 9)
+        self.assertEqual(result["status"], "skipped")
+        model = anomaly_detection._load_batch_model()
+        self.assertNotIn("threshold_updated_at", model)
+        self.assertEqual(model["data_range"][0], 1_700_030_000)
+        self.assertEqual(list(Path(self.tmp.name, "models").glob("*.tmp")), [])
+
+        result = anomaly_detection.update_batch_threshold(window_seconds=10 ** 9)
+        self.assertTrue(result.get("success"), result)
+
+    def test_invalid_method(self):
+        """Unknown methods are rejected without starting a process."""
+        result = anomaly_detection.train_batch_model("kmeans")
+        self.assertIn("error", result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ml import behavioral_modeling, feature_engineering
+from modes.service import metric_store
+
+# Monday 2023-11-20 00:00 in local time, so hour-of-week slots line up with the points
+MONDAY = 1_700_438_400 - time.localtime(1_700_438_400).tm_gmtoff
+
+def _points(start, count):
+    rng = np.random.default_rng(start)
+    points = []
+    for i in range(start, start + count):
+        timestamp = MONDAY + i * 60
+        busy = (timestamp - MONDAY) // 3600 % 24 in range(9, 17)
+        points.append({
+            "timestamp": timestamp,
+            "cpu_percent": float((70 if busy else 10) + rng.normal(0, 3)),
+            "memory_percent": float(50 + rng.normal(0, 2)),
+            "active_processes": 300,
+            "disk_io": {"read_bytes": i * 60_000, "write_bytes": i * 6000},
+            "network_io": {"bytes_sent": i * 600, "bytes_recv": i * 6000}
+        })
+    return points
+
+class TestBehaviorProfiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(behavioral_modeling, "MODEL_DIR", tmp_path / "models"),
+            mock.patch.object(behavioral_modeling, "BEHAVIOR_PROFILE", tmp_path / "models" / "profile.npz"),
+            mock.patch.dict(behavioral_modeling._profile, {"state": None, "mtime": None}),
+            mock.patch.object(feature_engineering, "FEATURE_STORE_DIR", tmp_path / "feature_store"),
+            mock.patch.dict(feature_engineering._store_cache, {"path": None, "watermark": None}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_incremental_updates_match_single_pass(self):
+        """Folding history in two batches gives the same profile as one batch."""
+        week = 7 * 24 * 60
+        metric_store.append_points(_points(0, week))
+        self.assertEqual(behavioral_modeling.update_behavior_profiles(), week)
+        metric_store.append_points(_points(week, week))
+        self.assertEqual(behavioral_modeling.update_behavior_profiles(), week)
+        self.assertEqual(behavioral_modeling.update_behavior_profiles(), 0)
+        incremental = dict(behavioral_modeling._profile["state"])
+
+        behavioral_modeling.BEHAVIOR_PROFILE.unlink()
+        behavioral_modeling._profile.update({"state": None, "mtime": None})
+        behavioral_modeling.update_behavior_profiles()
+        full = behavioral_modeling._profile["state"]
+        for key in ("count", "hist"):
+            np.testing.assert_array_equal(incremental[key], full[key])
+        np.testing.assert_allclose(incremental["mean"], full["mean"])
+        np.testing.assert_allclose(incremental["m2"], full["m2"], rtol=1e-6)
+
+    def test_typical_lookup_and_next_hour(self):
+        """Office-hours load is typical at 10:00 but not at 03:00."""
+        metric_store.append_points(_points(0, 2 * 7 * 24 * 60))
+        behavioral_modeling.update_behavior_profiles()
+        tuesday = MONDAY + 86400
+        self.assertTrue(behavioral_modeling.is_typical("cpu_percent", 70, tuesday + 10 * 3600)["typical"])
+        self.assertFalse(behavioral_modeling.is_typical("cpu_percent", 70, tuesday + 3 * 3600)["typical"])
+
+        forecast = behavioral_modeling.predict_next_hour(tuesday + 8 * 3600 + 1800)
+        self.assertEqual(forecast["hour_of_week"], 24 + 9)
+        self.assertAlmostEqual(forecast["metrics"]["cpu_percent"]["mean"], 70, delta=1)
+        self.assertGreater(forecast["metrics"]["disk_read_bytes_rate"]["mean"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ml import feature_engineering
+from modes.service import metric_store
+
+def _make_point(i):
+    return {
+        "timestamp": 1_700_000_000 + i * 30,
+        "cpu_percent": 30 + 10 * np.sin(i / 20),
+        "memory_percent": 60 + (i % 7),
+        "active_processes": 200,
+        "disk_io": {"read_bytes": i * 1000, "write_bytes": i * 2000},
+        "network_io": {"bytes_sent": i * 50, "bytes_recv": i * 80}
+    }
+
+class TestFeaturePipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", self.tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", self.tmp_path / "service_log.json"),
+            mock.patch.object(feature_engineering, "FEATURE_STORE_DIR", self.tmp_path / "feature_store"),
+            mock.patch.dict(feature_engineering._store_cache, {"path": None, "watermark": None}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_incremental_update_matches_full_build(self):
+        """Rows appended later produce the same features as a from-scratch build."""
+        metric_store.append_points([_make_point(i) for i in range(600)])
+        feature_engineering.build_features()
+        metric_store.append_points([_make_point(i) for i in range(600, 700)])
+        timestamps, incremental, names = feature_engineering.build_features()
+        info = feature_engineering.get_feature_store_info()
+        self.assertEqual(info["rows"], 700)
+        self.assertEqual(info["recent_batches"][-1]["rows"], [600, 700])
+        self.assertIsInstance(incremental, np.memmap)
+
+        with mock.patch.object(feature_engineering, "FEATURE_STORE_DIR", self.tmp_path / "rebuilt"):
+            _, full, _ = feature_engineering.build_features()
+
+        self.assertEqual(incremental.shape, (700, len(names)))
+        np.testing.assert_allclose(incremental, full, equal_nan=True)
+
+    def test_rebuild_leaves_mapped_rows_intact(self):
+        """Rebuilding after the metric store is rewritten never changes rows already handed out."""
+        metric_store.append_points([_make_point(i) for i in range(400)])
+        _, before, names = feature_engineering.build_features()
+        snapshot = np.array(before)
+
+        os.unlink(metric_store.STORE_FILE)
+        metric_store.append_points([dict(_make_point(i), cpu_percent=90.0) for i in range(300)])
+        _, after, _ = feature_engineering.build_features()
+        self.assertEqual(len(after), 300)
+        self.assertTrue((after[:, names.index("cpu_percent")] == 90.0).all())
+        np.testing.assert_array_equal(before, snapshot)
+
+    def test_same_length_rebuild_is_not_served_stale(self):
+        """A rebuild with the old row count maps the new files, not the cached ones."""
+        metric_store.append_points([_make_point(i) for i in range(300)])
+        feature_engineering.build_features()
+
+        os.unlink(metric_store.STORE_FILE)
+        metric_store.append_points([dict(_make_point(i + 1), cpu_percent=90.0) for i in range(300)])
+        _, matrix, names = feature_engineering.build_features()
+        self.assertEqual(len(matrix), 300)
+        self.assertTrue((matrix[:, names.index("cpu_percent")] == 90.0).all())
+
+    def test_maps_released_before_files_are_replaced(self):
+        """No cached memory map of the store is open while a rebuild replaces its files."""
+        metric_store.append_points([_make_point(i) for i in range(300)])
+        feature_engineering.build_features()
+        self.assertIsNotNone(feature_engineering._store_cache["matrix"])
+
+        os.unlink(metric_store.STORE_FILE)
+        metric_store.append_points([_make_point(i + 1) for i in range(200)])
+        replace = os.replace
+        cached = []
+
+        def checked_replace(src, dst):
+            cached.append(feature_engineering._store_cache["matrix"])
+            return replace(src, dst)
+
+        with mock.patch.object(feature_engineering.os, "replace", checked_replace):
+            _, matrix, _ = feature_engineering.build_features()
+        self.assertEqual(len(matrix), 200)
+        self.assertTrue(cached)
+        self.assertTrue(all(m is None for m in cached))
+
+    def test_drift_statistics(self):
+        """A shifted batch is reported as drifting for the affected feature."""
+        metric_store.append_points([_make_point(i) for i in range(600)])
+        feature_engineering.build_features()
+        shifted = [_make_point(i) for i in range(600, 650)]
+        for point in shifted:
+            point["memory_percent"] += 50
+        metric_store.append_points(shifted)
+        feature_engineering.build_features()
+        drift = feature_engineering.get_feature_store_info()["drift"]
+        self.assertTrue(drift["memory_percent"]["drifting"])
+        self.assertFalse(drift["active_processes"]["drifting"])
+
+    def test_rolling_and_lag_features(self):
+        """Rolling means and lags line up with the raw column."""
+        metric_store.append_points([_make_point(i) for i in range(300)])
+        _, matrix, names = feature_engineering.build_features()
+        cpu = matrix[:, names.index("cpu_percent")]
+        self.assertAlmostEqual(matrix[50, names.index("cpu_percent_mean_10")], cpu[41:51].mean())
+        self.assertEqual(matrix[50, names.index("cpu_percent_lag_10")], cpu[40])
+        self.assertTrue(np.isnan(matrix[5, names.index("cpu_percent_mean_10")]))
+        rate = matrix[10, names.index("disk_read_bytes_rate")]
+        self.assertAlmostEqual(rate, 1000 / 30)
+
+if __name__ == '__main__':
+    unittest.main()
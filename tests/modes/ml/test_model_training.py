@@ -0,0 +1,124 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ml import model_training
+from modes.ml import feature_engineering
+from modes.service import metric_store
+
+class TestTimeSeriesSplits(unittest.TestCase):
+
+    def test_folds_expand_and_respect_gap(self):
+        """Each fold trains on everything before its test block, minus the gap."""
+        folds = model_training.time_series_splits(1200, n_splits=5, gap=10)
+        self.assertEqual(len(folds), 5)
+        for train_stop, test_start, test_stop in folds:
+            self.assertEqual(test_start - train_stop, 10)
+            self.assertLessEqual(test_stop, 1200)
+        self.assertEqual([f[0] for f in folds], sorted(f[0] for f in folds))
+
+class TestHyperparameterSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(feature_engineering, "FEATURE_STORE_DIR", tmp_path / "feature_store"),
+            mock.patch.dict(feature_engineering._store_cache, {"path": None, "watermark": None}),
+            mock.patch.object(model_training, "DATA_DIR", tmp_path / "data"),
+            mock.patch.object(model_training, "MODEL_DIR", tmp_path / "models"),
+            mock.patch.object(model_training, "TRAINING_LOG", tmp_path / "data" / "training_log.json"),
+            mock.patch.object(model_training, "SEARCH_CACHE_DIR", tmp_path / "data" / "search_cache"),
+            mock.patch.object(model_training, "SEARCH_STATUS", tmp_path / "data" / "search_status.json"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        self.rng = np.random.default_rng(0)
+        self.append_points(0, 2000)
+
+    def append_points(self, start, stop):
+        metric_store.append_points([
+            {
+                "timestamp": 1_700_000_000 + i * 30,
+                "cpu_percent": float(30 + 10 * np.sin(i / 40) + self.rng.normal(0, 1)),
+                "memory_percent": float(60 + self.rng.normal(0, 1)),
+                "active_processes": 200,
+                "disk_io": {"read_bytes": i * 1000, "write_bytes": i * 2000},
+                "network_io": {"bytes_sent": i * 50, "bytes_recv": i * 80}
+            }
+            for i in range(start, stop)
+        ])
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_search_exports_winner_and_caches_folds(self):
+        """The best candidate is exported and a rerun is served from the fold cache."""
+        result = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=1, background=False)
+        self.assertNotIn("error", result)
+        self.assertEqual(result["fits_evaluated"], 25)
+        self.assertTrue(Path(result["best_model"]["model_file"]).exists())
+        scores = [c["rmse_mean"] for c in result["leaderboard"]]
+        self.assertEqual(scores, sorted(scores))
+        self.assertLess(scores[0], result["baseline_rmse"])
+
+        rerun = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=1, background=False)
+        self.assertEqual(rerun["fits_evaluated"], 0)
+        self.assertEqual(rerun["fits_from_cache"], 25)
+
+    def test_fold_cache_survives_new_rows(self):
+        """Rows short of the next snapshot boundary reuse the cache; older versions go only after a complete run."""
+        first = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=1, background=False)
+        self.append_points(2000, 2100)
+        rerun = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=1, background=False)
+        self.assertEqual(rerun["data_version"], first["data_version"])
+        self.assertEqual(rerun["fits_from_cache"], 25)
+
+        self.append_points(2100, 2500)
+        stopped = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=1, background=False,
+                                                           deadline=0.001)
+        self.assertTrue(stopped["stopped_at_deadline"])
+        self.assertTrue((model_training.SEARCH_CACHE_DIR / first["data_version"]).exists())
+
+        done = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=1, background=False)
+        self.assertNotEqual(done["data_version"], first["data_version"])
+        self.assertEqual(done["fits_evaluated"], 25)
+        self.assertFalse((model_training.SEARCH_CACHE_DIR / first["data_version"]).exists())
+        self.assertFalse((model_training.SEARCH_CACHE_DIR / f"{first['data_version']}_folds.json").exists())
+
+    def test_background_search_completes(self):
+        """The default background search runs its worker pool to completion."""
+        started = model_training.run_hyperparameter_search(estimators=["ridge"], n_jobs=2)
+        self.assertEqual(started["status"], "searching")
+        model_training._search_thread.join(timeout=120)
+        self.assertFalse(model_training._search_thread.is_alive())
+        self.assertEqual(model_training._load_json(model_training.SEARCH_STATUS, {})["status"], "completed")
+
+    def test_active_jobs_use_pid_exists(self):
+        """A running search is checked with psutil.pid_exists, never by signalling its process."""
+        model_training._write_json(model_training.SEARCH_STATUS, {"status": "running", "pid": os.getpid()})
+        self.assertEqual(len(model_training._get_active_jobs()), 1)
+        with mock.patch("psutil.pid_exists", return_value=False) as pid_exists:
+            self.assertEqual(model_training._get_active_jobs(), [])
+        pid_exists.assert_called_once_with(os.getpid())
+
+    def test_unknown_estimator(self):
+        """Unknown estimators are rejected before any work starts."""
+        result = model_training.run_hyperparameter_search(estimators=["svm"], background=False)
+        self.assertIn("error", result)
+
+if __name__ == '__main__':
+    unittest.main()
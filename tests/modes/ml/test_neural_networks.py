@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ml import neural_networks
+
+class TestNumpyNetworks(unittest.TestCase):
+
+    def test_mlp_fits_and_round_trips(self):
+        """An MLP learns a smooth function and reloads with identical predictions."""
+        rng = np.random.default_rng(0)
+        X = rng.uniform(-1, 1, (2000, 3))
+        y = np.sin(2 * X[:, 0]) + X[:, 1] * X[:, 2]
+        model = neural_networks.MLP(3, (32, 16))
+        metrics = neural_networks.train_network(model, X, y, epochs=100)
+        self.assertLess(metrics["val_rmse"], 0.1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "mlp.npz"
+            neural_networks.save_network(model, path)
+            loaded = neural_networks.load_network(path)
+        self.assertTrue(all(p.dtype == np.float32 for p in loaded.params.values()))
+        np.testing.assert_allclose(loaded.predict(X[:10]), model.predict(X[:10]), rtol=1e-6)
+
+    def test_gru_learns_sequence_target(self):
+        """A GRU beats predicting the mean on a target that depends on the sequence."""
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(600, 6, 2))
+        y = X[:, :, 0].sum(axis=1)
+        model = neural_networks.GRU(2, hidden_size=16)
+        metrics = neural_networks.train_network(model, X, y, epochs=40, learning_rate=5e-3)
+        self.assertLess(metrics["val_rmse"], 0.5 * y.std())
+        self.assertEqual(model.predict(X[:5]).shape, (5, 1))
+
+    def test_non_finite_validation_loss(self):
+        """A validation loss that is never finite keeps the initial weights instead of failing."""
+        rng = np.random.default_rng(2)
+        X = rng.normal(size=(300, 3))
+        X[-10:, 0] = np.inf
+        model = neural_networks.MLP(3, (8,))
+        initial = {k: v.copy() for k, v in model.params.items()}
+        with np.errstate(invalid="ignore"):
+            metrics = neural_networks.train_network(model, X, rng.normal(size=300), epochs=20, patience=3)
+        self.assertTrue(metrics["diverged"])
+        self.assertEqual(metrics["epochs_run"], 3)
+        for name, value in initial.items():
+            np.testing.assert_array_equal(model.params[name], value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.ml import performance_prediction
+from modes.service import metric_store
+
+class TestForecastEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.dict(performance_prediction._forecast_cache, {"watermark": None, "models": None}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        # Seven days of a daily CPU cycle sampled every 60 seconds
+        rng = np.random.default_rng(1)
+        self.period = 86400
+        self.end = (time.time() // 300) * 300
+        timestamps = np.arange(self.end - 7 * self.period, self.end, 60)
+        metric_store.append_points([
+            {
+                "timestamp": float(ts),
+                "cpu_percent": float(self._cpu(ts) + rng.normal(0, 1)),
+                "memory_percent": 55.0,
+                "active_processes": 180
+            }
+            for ts in timestamps
+        ])
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def _cpu(self, ts):
+        return 40 + 20 * np.sin(2 * np.pi * (ts % self.period) / self.period)
+
+    def test_forecast_follows_daily_season(self):
+        """Forecasts track the seasonal profile and intervals contain the truth."""
+        forecast = performance_prediction.forecast_metric("cpu_usage", 24)
+        self.assertIsNotNone(forecast)
+        truth = self._cpu(forecast["timestamps"] + performance_prediction.FORECAST_BUCKET_SECONDS / 2)
+        self.assertLess(np.abs(forecast["values"] - truth).max(), 2.0)
+        self.assertTrue(np.all(forecast["lower"] <= forecast["values"]))
+        self.assertTrue(np.all(forecast["upper"] >= forecast["values"]))
+
+    def test_forecast_starts_at_now_after_gap(self):
+        """After a collection gap the horizon starts at the current time, not the last bucket."""
+        now = self.end + 6 * 3600
+        forecast = performance_prediction.forecast_metric("cpu_usage", 24, now=now)
+        self.assertGreater(forecast["timestamps"][0], now - performance_prediction.FORECAST_BUCKET_SECONDS)
+        truth = self._cpu(forecast["timestamps"] + performance_prediction.FORECAST_BUCKET_SECONDS / 2)
+        self.assertLess(np.abs(forecast["values"] - truth).max(), 2.0)
+
+    def test_models_cached_until_new_data(self):
+        """Models are reused until the metric store grows."""
+        first = performance_prediction.load_forecast_models()
+        self.assertIs(performance_prediction.load_forecast_models(), first)
+        metric_store.append_points([{"timestamp": self.end + 30, "cpu_percent": 50.0}])
+        self.assertIsNot(performance_prediction.load_forecast_models(), first)
+
+    def test_predictions_use_fitted_models(self):
+        """Current predictions come from the data, not fixed values."""
+        predictions = performance_prediction._generate_performance_predictions()
+        metrics = {p["metric"]: p for p in predictions}
+        self.assertIn("cpu_usage", metrics)
+        self.assertAlmostEqual(metrics["memory_usage"]["predicted_value"], 55.0, places=3)
+
+if __name__ == '__main__':
+    unittest.main()
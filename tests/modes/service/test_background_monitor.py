@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.service import background_monitor, metric_store
+from modes.service.background_monitor import BackgroundMonitor
+
+class TestSaveDataBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(background_monitor, "SERVICE_LOG", tmp_path / "service_log.json"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def test_failing_hook_does_not_reappend(self):
+        """Stored points leave the buffer even when a downstream hook fails, and other hooks still run."""
+        calls = []
+
+        def hook(name, fail=False):
+            def run():
+                calls.append(name)
+                if fail:
+                    raise RuntimeError("boom")
+            return run
+
+        modules = {"broken": mock.Mock(run=hook("broken", fail=True)), "working": mock.Mock(run=hook("working"))}
+        monitor = BackgroundMonitor()
+        with mock.patch.object(background_monitor, "FLUSH_HOOKS", [("broken", "run"), ("working", "run")]), \
+                mock.patch.object(background_monitor.importlib, "import_module", lambda name, package: modules[name]), \
+                mock.patch.object(monitor, "_log_error") as log_error:
+            for start in (0, 10):
+                monitor.data_buffer = [{"timestamp": 1_700_000_000 + i, "cpu_percent": 1.0}
+                                       for i in range(start, start + 10)]
+                monitor._save_data_buffer()
+
+        self.assertEqual(monitor.data_buffer, [])
+        self.assertEqual(calls, ["broken", "working"] * 2)
+        self.assertEqual(log_error.call_count, 2)
+        self.assertEqual(len(metric_store.load_columns(["cpu_percent"])["timestamp"]), 20)
+
+if __name__ == '__main__':
+    unittest.main()
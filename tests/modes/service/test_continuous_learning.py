@@ -0,0 +1,228 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+import time
+import threading
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add the parent directory of `modes` to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+
+from modes.service import continuous_learning
+from modes.service import metric_store
+
+def _make_points(start, count):
+    rng = np.random.default_rng(start)
+    return [
+        {
+            "timestamp": 1_700_000_000 + i * 30,
+            "cpu_percent": float(40 + 10 * np.sin(i / 50) + rng.normal(0, 1)),
+            "memory_percent": float(60 + rng.normal(0, 1)),
+            "active_processes": 200
+        }
+        for i in range(start, start + count)
+    ]
+
+class TestIncrementalLearning(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(continuous_learning, "LEARNER_STATE", tmp_path / "learner_state.json"),
+            mock.patch.object(continuous_learning, "MODEL_UPDATES", tmp_path / "model_updates.json"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def _updates(self):
+        with open(continuous_learning.MODEL_UPDATES) as f:
+            return json.load(f)["updates"]
+
+    def test_consumes_only_new_points(self):
+        """Each update processes just the points appended since the previous one."""
+        learner = continuous_learning.ContinuousLearner()
+        metric_store.append_points(_make_points(0, 1000))
+        learner._update_models()
+        metric_store.append_points(_make_points(1000, 200))
+        learner._update_models()
+
+        updates = self._updates()
+        self.assertEqual([u["data_points_processed"] for u in updates], [1000, 200])
+        validation = {m["model"]: m["validation"] for m in updates[-1]["models_updated"]}
+        self.assertLess(validation["performance_prediction"]["validation_error"], 5)
+
+    def test_small_batches_wait_for_more_data(self):
+        """Batches below the minimum leave the offset where it was."""
+        learner = continuous_learning.ContinuousLearner()
+        metric_store.append_points(_make_points(0, 10))
+        learner._update_models()
+        self.assertEqual(learner.read_offset, 0)
+
+    def test_state_survives_restart(self):
+        """A new learner resumes from the saved offset and model state."""
+        learner = continuous_learning.ContinuousLearner()
+        metric_store.append_points(_make_points(0, 500))
+        learner._update_models()
+
+        restarted = continuous_learning.ContinuousLearner()
+        self.assertEqual(restarted.read_offset, learner.read_offset)
+        np.testing.assert_allclose(restarted.models["anomaly_detection"].mean,
+                                   learner.models["anomaly_detection"].mean)
+
+class TestDriftDetection(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp.name)
+        self.patches = [
+            mock.patch.object(metric_store, "STORE_FILE", tmp_path / "history.ndjson"),
+            mock.patch.object(metric_store, "SERVICE_LOG", tmp_path / "service_log.json"),
+            mock.patch.object(continuous_learning, "LEARNER_STATE", tmp_path / "learner_state.json"),
+            mock.patch.object(continuous_learning, "MODEL_UPDATES", tmp_path / "model_updates.json"),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.rng = np.random.default_rng(1)
+        self.disk = 0.0
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmp.cleanup()
+
+    def _points(self, start, count, disk_rate=5000):
+        points = []
+        for i in range(start, start + count):
+            self.disk += max(self.rng.normal(disk_rate, 500), 0) * 30
+            points.append({
+                "timestamp": 1_700_000_000 + i * 30,
+                "cpu_percent": float(30 + self.rng.normal(0, 2)),
+                "memory_percent": float(60 + self.rng.normal(0, 1)),
+                "active_processes": 200,
+                "disk_io": {"read_bytes": self.disk, "write_bytes": i * 1000},
+                "network_io": {"bytes_sent": i * 50, "bytes_recv": i * 80}
+            })
+        return points
+
+    def test_page_hinkley_detects_level_shift(self):
+        """The residual test stays quiet on noise and fires on a shift."""
+        detector = continuous_learning.PageHinkley()
+        rng = np.random.default_rng(0)
+        self.assertFalse(any(detector.update(rng.normal(0, 1, 20)) for _ in range(30)))
+        self.assertTrue(any(detector.update(rng.normal(5, 1, 20)) for _ in range(3)))
+
+    def test_input_drift_retrains_only_affected_model(self):
+        """An I/O rate shift refits the model that uses it and queues its retrain."""
+        learner = continuous_learning.ContinuousLearner()
+        queued = []
+        learner.task_queue.put = lambda task: queued.append(task) or True
+
+        metric_store.append_points(self._points(0, 4320))
+        learner._update_models()
+        start = 4320
+        for _ in range(12):
+            metric_store.append_points(self._points(start, 20, disk_rate=25000))
+            learner._update_models()
+            start += 20
+
+        disk_events = [e for e in learner.drift_events if "input_drift:disk_read_bytes" in e["reasons"]]
+        self.assertEqual([e["model"] for e in disk_events], ["anomaly_detection"])
+        self.assertEqual(queued[-1]["model"], "anomaly_detection")
+        self.assertEqual(queued[-1]["type"], "model_retrain")
+
+    def test_behavior_refit_keeps_untouched_hours(self):
+        """Refitting the hour profile on a short window only relearns the hours it covers."""
+        model = continuous_learning.OnlineBehaviorModel()
+        day = 1_700_000_000 + np.arange(2880) * 30.0
+        values = np.full((len(day), len(continuous_learning.ONLINE_FIELDS)), 30.0)
+        model.partial_fit(day, values)
+        before = model.counts.copy()
+
+        window = day[-720:] + 86400
+        model.refit(window, np.full((len(window), values.shape[1]), 80.0))
+        hours = np.unique(continuous_learning._local_hours(window))
+        untouched = np.setdiff1d(np.arange(24), hours)
+        self.assertLess(len(hours), 8)
+        np.testing.assert_array_equal(model.counts[untouched], before[untouched])
+        profile = model.sums / model.counts
+        np.testing.assert_allclose(profile[hours], 80.0)
+        np.testing.assert_allclose(profile[untouched], 30.0)
+
+class TestLearningTaskQueue(unittest.TestCase):
+
+    def test_priority_and_deduplication(self):
+        """Identical pending tasks merge and urgent tasks run first."""
+        order = []
+        done = threading.Event()
+
+        def handler(task):
+            order.append(task["type"])
+            if len(order) == 3:
+                done.set()
+            return {"success": True}
+
+        queue = continuous_learning.LearningTaskQueue(handler, {"thread_workers": 1})
+        self.assertTrue(queue.put({"type": "pattern_analysis"}))
+        self.assertFalse(queue.put({"type": "pattern_analysis"}))
+        self.assertTrue(queue.put({"type": "pattern_analysis", "window_seconds": 3600}))
+        self.assertTrue(queue.put({"type": "anomaly_update"}))
+        self.assertEqual(queue.pending(), 3)
+
+        queue.start()
+        self.assertTrue(done.wait(10))
+        queue.stop()
+        deadline = time.time() + 10
+        while queue.get_metrics()["running"] and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(order[0], "anomaly_update")
+        metrics = queue.get_metrics()["by_type"]
+        self.assertEqual(metrics["pattern_analysis"]["deduplicated"], 1)
+        self.assertEqual(metrics["pattern_analysis"]["completed"], 2)
+
+    def test_retrain_task_runs_trainer(self):
+        """A retrain queued through add_learning_task reaches the trainer with valid arguments."""
+        from modes.ml import anomaly_detection, feature_engineering
+        queue = continuous_learning.LearningTaskQueue(lambda task: None)
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(feature_engineering, "FEATURE_STORE_DIR", Path(tmp) / "feature_store"), \
+                mock.patch.dict(feature_engineering._store_cache, {"path": None, "watermark": None}), \
+                mock.patch.object(continuous_learning._continuous_learner, "task_queue", queue), \
+                mock.patch.object(metric_store, "STORE_FILE", Path(tmp) / "history.ndjson"), \
+                mock.patch.object(anomaly_detection, "MODEL_DIR", Path(tmp) / "models"), \
+                mock.patch.object(anomaly_detection, "DATA_DIR", Path(tmp) / "data"), \
+                mock.patch.object(anomaly_detection, "BATCH_MODEL_FILE", Path(tmp) / "models" / "batch.joblib"), \
+                mock.patch.object(anomaly_detection, "BATCH_TRAINING_LOG", Path(tmp) / "data" / "training.json"):
+            points = _make_points(0, 300)
+            for i, point in enumerate(points):
+                point["disk_io"] = {"read_bytes": i * 1000, "write_bytes": i * 2000}
+                point["network_io"] = {"bytes_sent": i * 50, "bytes_recv": i * 80}
+            metric_store.append_points(points)
+            self.assertTrue(continuous_learning.add_learning_task({"type": "model_retrain", "model": "anomaly_detection"}))
+            task = queue._heaps["process"][0][-1]
+            conn = mock.Mock()
+            continuous_learning._run_process_task(task, conn)
+            result = conn.send.call_args[0][0]
+        self.assertTrue(result.get("success"), result)
+        self.assertEqual(result["method"], "robust_covariance")
+
+    def test_unknown_retrain_target(self):
+        """Retrain tasks for models without a trainer are rejected."""
+        with self.assertRaises(ValueError):
+            continuous_learning.add_learning_task({"type": "model_retrain", "model": "nope"})
+
+if __name__ == '__main__':
+    unittest.main()